@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rprimerl.proto\x12\x07primerl\"a\n\x08StartReq\x12\x0e\n\x06\x65nv_id\x18\x01 \x01(\t\x12\r\n\x05model\x18\x02 \x01(\t\x12\x11\n\tprompt_fp\x18\x03 \x01(\x0c\x12\x0e\n\x06prompt\x18\x04 \x01(\t\x12\x13\n\x0bpin_prefill\x18\x05 \x01(\x08\"2\n\tStartResp\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x11\n\tcache_hit\x18\x02 \x01(\x08\"k\n\x07StepReq\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x0b\n\x03obs\x18\x02 \x01(\t\x12\x16\n\x0emax_new_tokens\x18\x03 \x01(\x05\x12\x12\n\ngrammar_id\x18\x04 \x01(\t\x12\x13\n\x0bspeculative\x18\x05 \x01(\x08\"]\n\x08StepResp\x12\r\n\x05token\x18\x01 \x01(\t\x12\x0c\n\x04t_us\x18\x02 \x01(\x03\x12\x10\n\x08kv_bytes\x18\x03 \x01(\x03\x12\x10\n\x08\x62oundary\x18\x04 \x01(\x08\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x05 \x01(\x08\"\x1c\n\x06\x45ndReq\x12\x12\n\nsession_id\x18\x01 \x01(\t\"\x1a\n\x07\x45ndResp\x12\x0f\n\x07\x65victed\x18\x01 \x01(\x08\x32\xa2\x01\n\x07PrimeRL\x12\x35\n\x0cStartEpisode\x12\x11.primerl.StartReq\x1a\x12.primerl.StartResp\x12/\n\x04Step\x12\x10.primerl.StepReq\x1a\x11.primerl.StepResp(\x01\x30\x01\x12/\n\nEndEpisode\x12\x0f.primerl.EndReq\x1a\x10.primerl.EndRespb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rprimerl.proto\x12\x07primerl\"a\n\x08StartReq\x12\x0e\n\x06\x65nv_id\x18\x01 \x01(\t\x12\r\n\x05model\x18\x02 \x01(\t\x12\x11\n\tprompt_fp\x18\x03 \x01(\x0c\x12\x0e\n\x06prompt\x18\x04 \x01(\t\x12\x13\n\x0bpin_prefill\x18\x05 \x01(\x08\"L\n\tStartResp\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x11\n\tcache_hit\x18\x02 \x01(\x08\x12\x18\n\x10\x63\x61\x63he_hit_tokens\x18\x03 \x01(\x05\"\xa8\x01\n\x07StepReq\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x0b\n\x03obs\x18\x02 \x01(\t\x12\x16\n\x0emax_new_tokens\x18\x03 \x01(\x05\x12\x12\n\ngrammar_id\x18\x04 \x01(\t\x12\x13\n\x0bspeculative\x18\x05 \x01(\x08\x12\x13\n\x0b\x64\x65\x61\x64line_ms\x18\x06 \x01(\x05\x12\x10\n\x08priority\x18\x07 \x01(\t\x12\x14\n\x0c\x63hunk_tokens\x18\x08 \x01(\x05\"\xf6\x02\n\x08StepResp\x12\r\n\x05token\x18\x01 \x01(\t\x12\x0c\n\x04t_us\x18\x02 \x01(\x03\x12\x10\n\x08kv_bytes\x18\x03 \x01(\x03\x12\x10\n\x08\x62oundary\x18\x04 \x01(\x08\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x05 \x01(\x08\x12\x12\n\nsession_id\x18\x06 \x01(\t\x12\x11\n\ttoken_ids\x18\x07 \x03(\x05\x12\x13\n\x0btoken_texts\x18\x08 \x03(\t\x12\x12\n\ntoken_t_us\x18\t \x03(\x03\x12\x16\n\x0etoken_accepted\x18\n \x03(\x08\x12\x16\n\x0etoken_boundary\x18\x0b \x03(\x08\x12\x15\n\x08token_id\x18\x0c \x01(\x05H\x00\x88\x01\x01\x12\x14\n\x07logprob\x18\r \x01(\x02H\x01\x88\x01\x01\x12\x16\n\x0etoken_logprobs\x18\x0e \x03(\x02\x12\r\n\x05\x65rror\x18\x0f \x01(\t\x12\x12\n\nerror_code\x18\x10 \x01(\x05\x12\x16\n\x0eretry_after_ms\x18\x11 \x01(\x03\x42\x0b\n\t_token_idB\n\n\x08_logprob\"\x1c\n\x06\x45ndReq\x12\x12\n\nsession_id\x18\x01 \x01(\t\")\n\x07\x45ndResp\x12\x0f\n\x07\x65victed\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t\"4\n\rStartBatchReq\x12#\n\x08\x65pisodes\x18\x01 \x03(\x0b\x32\x11.primerl.StartReq\"6\n\x0eStartBatchResp\x12$\n\x08sessions\x18\x01 \x03(\x0b\x32\x12.primerl.StartResp\"\"\n\x0b\x45ndBatchReq\x12\x13\n\x0bsession_ids\x18\x01 \x03(\t\"1\n\x0c\x45ndBatchResp\x12!\n\x07results\x18\x01 \x03(\x0b\x32\x10.primerl.EndResp\"\x1f\n\tVerifyReq\x12\x12\n\nsession_id\x18\x01 \x01(\t\"A\n\nVerifyResp\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0e\n\x06reward\x18\x02 \x01(\x01\x12\x13\n\x0bresult_json\x18\x03 \x01(\t\"\xb2\x01\n\x0eSampleGroupReq\x12\x0e\n\x06\x65nv_id\x18\x01 \x01(\t\x12\r\n\x05model\x18\x02 \x01(\t\x12\x0e\n\x06prompt\x18\x03 \x01(\t\x12\t\n\x01k\x18\x04 \x01(\x05\x12\x16\n\x0emax_new_tokens\x18\x05 \x01(\x05\x12\x12\n\ngrammar_id\x18\x06 \x01(\t\x12\x13\n\x0bspeculative\x18\x07 \x01(\x08\x12\x13\n\x0b\x64\x65\x61\x64line_ms\x18\x08 \x01(\x05\x12\x10\n\x08priority\x18\t \x01(\t\"\xc2\x01\n\nSampleResp\x12\r\n\x05index\x18\x01 \x01(\x05\x12\r\n\x05token\x18\x02 \x01(\t\x12\x0c\n\x04t_us\x18\x03 \x01(\x03\x12\x10\n\x08kv_bytes\x18\x04 \x01(\x03\x12\x10\n\x08\x62oundary\x18\x05 \x01(\x08\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x06 \x01(\x08\x12\x0c\n\x04\x64one\x18\x07 \x01(\x08\x12\x15\n\x08token_id\x18\x08 \x01(\x05H\x00\x88\x01\x01\x12\x14\n\x07logprob\x18\t \x01(\x02H\x01\x88\x01\x01\x42\x0b\n\t_token_idB\n\n\x08_logprob2\xa3\x03\n\x07PrimeRL\x12\x35\n\x0cStartEpisode\x12\x11.primerl.StartReq\x1a\x12.primerl.StartResp\x12/\n\x04Step\x12\x10.primerl.StepReq\x1a\x11.primerl.StepResp(\x01\x30\x01\x12/\n\nEndEpisode\x12\x0f.primerl.EndReq\x1a\x10.primerl.EndResp\x12:\n\x0fGetVerification\x12\x12.primerl.VerifyReq\x1a\x13.primerl.VerifyResp\x12=\n\x0bSampleGroup\x12\x17.primerl.SampleGroupReq\x1a\x13.primerl.SampleResp0\x01\x12\x44\n\x11StartEpisodeBatch\x12\x16.primerl.StartBatchReq\x1a\x17.primerl.StartBatchResp\x12>\n\x0f\x45ndEpisodeBatch\x12\x14.primerl.EndBatchReq\x1a\x15.primerl.EndBatchRespb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,15 +34,31 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_STARTREQ']._serialized_start=26
   _globals['_STARTREQ']._serialized_end=123
   _globals['_STARTRESP']._serialized_start=125
-  _globals['_STARTRESP']._serialized_end=175
-  _globals['_STEPREQ']._serialized_start=177
-  _globals['_STEPREQ']._serialized_end=284
-  _globals['_STEPRESP']._serialized_start=286
-  _globals['_STEPRESP']._serialized_end=379
-  _globals['_ENDREQ']._serialized_start=381
-  _globals['_ENDREQ']._serialized_end=409
-  _globals['_ENDRESP']._serialized_start=411
-  _globals['_ENDRESP']._serialized_end=437
-  _globals['_PRIMERL']._serialized_start=440
-  _globals['_PRIMERL']._serialized_end=602
+  _globals['_STARTRESP']._serialized_end=201
+  _globals['_STEPREQ']._serialized_start=204
+  _globals['_STEPREQ']._serialized_end=372
+  _globals['_STEPRESP']._serialized_start=375
+  _globals['_STEPRESP']._serialized_end=749
+  _globals['_ENDREQ']._serialized_start=751
+  _globals['_ENDREQ']._serialized_end=779
+  _globals['_ENDRESP']._serialized_start=781
+  _globals['_ENDRESP']._serialized_end=822
+  _globals['_STARTBATCHREQ']._serialized_start=824
+  _globals['_STARTBATCHREQ']._serialized_end=876
+  _globals['_STARTBATCHRESP']._serialized_start=878
+  _globals['_STARTBATCHRESP']._serialized_end=932
+  _globals['_ENDBATCHREQ']._serialized_start=934
+  _globals['_ENDBATCHREQ']._serialized_end=968
+  _globals['_ENDBATCHRESP']._serialized_start=970
+  _globals['_ENDBATCHRESP']._serialized_end=1019
+  _globals['_VERIFYREQ']._serialized_start=1021
+  _globals['_VERIFYREQ']._serialized_end=1052
+  _globals['_VERIFYRESP']._serialized_start=1054
+  _globals['_VERIFYRESP']._serialized_end=1119
+  _globals['_SAMPLEGROUPREQ']._serialized_start=1122
+  _globals['_SAMPLEGROUPREQ']._serialized_end=1300
+  _globals['_SAMPLERESP']._serialized_start=1303
+  _globals['_SAMPLERESP']._serialized_end=1497
+  _globals['_PRIMERL']._serialized_start=1500
+  _globals['_PRIMERL']._serialized_end=1919
 # @@protoc_insertion_point(module_scope)
@@ -49,6 +49,26 @@ class PrimeRLStub(object):
                 request_serializer=primerl__pb2.EndReq.SerializeToString,
                 response_deserializer=primerl__pb2.EndResp.FromString,
                 _registered_method=True)
+        self.GetVerification = channel.unary_unary(
+                '/primerl.PrimeRL/GetVerification',
+                request_serializer=primerl__pb2.VerifyReq.SerializeToString,
+                response_deserializer=primerl__pb2.VerifyResp.FromString,
+                _registered_method=True)
+        self.SampleGroup = channel.unary_stream(
+                '/primerl.PrimeRL/SampleGroup',
+                request_serializer=primerl__pb2.SampleGroupReq.SerializeToString,
+                response_deserializer=primerl__pb2.SampleResp.FromString,
+                _registered_method=True)
+        self.StartEpisodeBatch = channel.unary_unary(
+                '/primerl.PrimeRL/StartEpisodeBatch',
+                request_serializer=primerl__pb2.StartBatchReq.SerializeToString,
+                response_deserializer=primerl__pb2.StartBatchResp.FromString,
+                _registered_method=True)
+        self.EndEpisodeBatch = channel.unary_unary(
+                '/primerl.PrimeRL/EndEpisodeBatch',
+                request_serializer=primerl__pb2.EndBatchReq.SerializeToString,
+                response_deserializer=primerl__pb2.EndBatchResp.FromString,
+                _registered_method=True)
 
 
 class PrimeRLServicer(object):
@@ -72,6 +92,30 @@ class PrimeRLServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetVerification(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SampleGroup(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StartEpisodeBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def EndEpisodeBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_PrimeRLServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -90,6 +134,26 @@ def add_PrimeRLServicer_to_server(servicer, server):
                     request_deserializer=primerl__pb2.EndReq.FromString,
                     response_serializer=primerl__pb2.EndResp.SerializeToString,
             ),
+            'GetVerification': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetVerification,
+                    request_deserializer=primerl__pb2.VerifyReq.FromString,
+                    response_serializer=primerl__pb2.VerifyResp.SerializeToString,
+            ),
+            'SampleGroup': grpc.unary_stream_rpc_method_handler(
+                    servicer.SampleGroup,
+                    request_deserializer=primerl__pb2.SampleGroupReq.FromString,
+                    response_serializer=primerl__pb2.SampleResp.SerializeToString,
+            ),
+            'StartEpisodeBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.StartEpisodeBatch,
+                    request_deserializer=primerl__pb2.StartBatchReq.FromString,
+                    response_serializer=primerl__pb2.StartBatchResp.SerializeToString,
+            ),
+            'EndEpisodeBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.EndEpisodeBatch,
+                    request_deserializer=primerl__pb2.EndBatchReq.FromString,
+                    response_serializer=primerl__pb2.EndBatchResp.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'primerl.PrimeRL', rpc_method_handlers)
@@ -181,3 +245,111 @@ class PrimeRL(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetVerification(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/primerl.PrimeRL/GetVerification',
+            primerl__pb2.VerifyReq.SerializeToString,
+            primerl__pb2.VerifyResp.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SampleGroup(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/primerl.PrimeRL/SampleGroup',
+            primerl__pb2.SampleGroupReq.SerializeToString,
+            primerl__pb2.SampleResp.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StartEpisodeBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/primerl.PrimeRL/StartEpisodeBatch',
+            primerl__pb2.StartBatchReq.SerializeToString,
+            primerl__pb2.StartBatchResp.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def EndEpisodeBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/primerl.PrimeRL/EndEpisodeBatch',
+            primerl__pb2.EndBatchReq.SerializeToString,
+            primerl__pb2.EndBatchResp.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -1,49 +1,223 @@
+import logging
+import threading
 import time
-from typing import Optional
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
 
 import orjson
 import redis
 from redis.exceptions import RedisError
 
+from cache.local_cache import MISSING, LocalCache
+from perf import exporters
+
+logger = logging.getLogger(__name__)
+
+# Writers publish the keys they changed here; every process drops them from its L1.
+INVALIDATE_CHANNEL = "pf:invalidate"
+# Each node holding a prefix is its own ``node:<id>`` hash field, so concurrent
+# writers add to the set instead of replacing it.
+NODE_FIELD = b"node:"
+
 
 class GlobalPrefixCache:
-    """Redis-backed prefix cache storing prompt metadata."""
+    """Redis-backed prefix cache storing prompt metadata.
 
-    def __init__(self, url: str = "redis://localhost:6379/0"):
+    Lookups go through an in-process L1 (``LocalCache``: LRU with TinyLFU
+    admission and a ``l1_ttl_s`` TTL; ``l1_size=0`` disables it) before Redis,
+    so hot prefixes cost no round-trip. Writes drop the keys from the local L1
+    and publish them on ``INVALIDATE_CHANNEL``; the thread started by ``start()``
+    applies other processes' invalidations, and without it remote writes show up
+    once the TTL expires. Hit counts accumulate locally and are written back in
+    one pipeline every ``hit_flush_s``.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        l1_size: int = 8192,
+        l1_ttl_s: float = 5.0,
+        hit_flush_s: float = 1.0,
+    ):
         self.redis = redis.Redis.from_url(url)
+        self.l1 = LocalCache(l1_size, l1_ttl_s) if l1_size else None
+        self.hit_flush_s = hit_flush_s
+        self._hits: Counter[str] = Counter()
+        self._hits_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
 
     def put(self, fingerprint: bytes, meta: dict, node_id: str | None = None, tier: str = "hbm") -> None:
-        key = f"pf:{fingerprint.hex()}"
-        payload = {
-            "meta": orjson.dumps(meta),
-            "ts": time.time(),
-            "tier": tier,
-        }
+        self.put_blocks([fingerprint], meta, node_id=node_id, tier=tier)
+
+    def put_blocks(
+        self, blocks: List[bytes], meta: dict, node_id: str | None = None, tier: str = "hbm"
+    ) -> None:
+        """``put`` every prefix of a block chain (``block_hashes``) in one pipelined call.
+
+        ``node_id`` joins the nodes already recorded for each block.
+        """
+        if not blocks:
+            return
+        payload = {"meta": orjson.dumps(meta), "ts": time.time(), "tier": tier}
         if node_id:
-            payload["nodes"] = orjson.dumps([node_id])
+            payload[NODE_FIELD + node_id.encode()] = b"1"
+        keys = [f"pf:{fingerprint.hex()}" for fingerprint in blocks]
         try:
-            self.redis.hset(key, mapping=payload)
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.hset(key, mapping=payload)
+            self._invalidate(pipe, keys)
+            pipe.execute()
         except RedisError:
             return
 
     def get(self, fingerprint: bytes) -> Optional[dict]:
-        key = f"pf:{fingerprint.hex()}"
-        try:
-            result = self.redis.hgetall(key)
-        except RedisError:
-            return None
-        if not result:
-            return None
+        return self.get_many([fingerprint])[0]
+
+    def get_many(self, fingerprints: List[bytes]) -> List[Optional[dict]]:
+        """Bulk ``get``: L1 first, then one pipelined round-trip for the keys it lacks."""
+        if not fingerprints:
+            return []
+        keys = [f"pf:{fingerprint.hex()}" for fingerprint in fingerprints]
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self.l1.get(key) if self.l1 is not None else MISSING
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if self.l1 is not None:
+            exporters.child(exporters.prefix_lookups, "l1", "hit").inc(len(found))
+            exporters.child(exporters.prefix_lookups, "l1", "miss").inc(len(missing))
+        if missing:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key in missing:
+                    pipe.hgetall(key)
+                results = pipe.execute()
+            except RedisError:
+                results = None
+            if results is not None:
+                for key, result in zip(missing, results):
+                    # A hash holding only a written-back hit count has no entry.
+                    value = self._decode(result) if result and b"meta" in result else None
+                    found[key] = value
+                    if self.l1 is not None:
+                        self.l1.put(key, value)
+                hits = sum(found[key] is not None for key in missing)
+                exporters.child(exporters.prefix_lookups, "l2", "hit").inc(hits)
+                exporters.child(exporters.prefix_lookups, "l2", "miss").inc(len(missing) - hits)
+        metas = [found.get(key) for key in keys]
+        self._count_hits(key for key, meta in zip(keys, metas) if meta is not None)
+        return [dict(meta) if meta is not None else None for meta in metas]
+
+    def longest_prefix_many(self, chains: List[List[bytes]]) -> List[Tuple[int, Optional[dict]]]:
+        """Longest cached prefix of each block chain: ``(blocks matched, meta of the last one)``.
+
+        Every block of every chain is looked up in one ``get_many`` round-trip;
+        a chain's match stops at its first uncached block.
+        """
+        unique = list(dict.fromkeys(block for chain in chains for block in chain))
+        found = dict(zip(unique, self.get_many(unique)))
+        results = []
+        for chain in chains:
+            depth, meta = 0, None
+            for block in chain:
+                if found[block] is None:
+                    break
+                depth, meta = depth + 1, found[block]
+            results.append((depth, meta))
+        return results
+
+    @staticmethod
+    def _decode(result: dict) -> dict:
         meta = orjson.loads(result[b"meta"])
         meta["tier"] = result.get(b"tier", b"").decode() if result.get(b"tier") else None
-        if b"nodes" in result:
-            meta["nodes"] = orjson.loads(result[b"nodes"])
-        self.redis.hincrby(key, "hits", 1)
+        nodes = sorted(
+            field[len(NODE_FIELD) :].decode() for field in result if field.startswith(NODE_FIELD)
+        )
+        if nodes:
+            meta["nodes"] = nodes
         return meta
 
     def register_node(self, fingerprint: bytes, node_id: str):
         key = f"pf:{fingerprint.hex()}"
         try:
-            self.redis.hset(key, "nodes", orjson.dumps([node_id]))
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(key, mapping={NODE_FIELD + node_id.encode(): b"1"})
+            self._invalidate(pipe, [key])
+            pipe.execute()
         except RedisError:
             return
+
+    def _invalidate(self, pipe, keys: List[str]) -> None:
+        if self.l1 is not None:
+            self.l1.invalidate(keys)
+        pipe.publish(INVALIDATE_CHANNEL, orjson.dumps(keys))
+
+    def _count_hits(self, keys: Iterable[str]) -> None:
+        with self._hits_lock:
+            self._hits.update(keys)
+        # Without the background thread, write back from the lookup path once due.
+        if self._thread is None and time.monotonic() - self._last_flush >= self.hit_flush_s:
+            self.flush_hits()
+
+    def flush_hits(self) -> None:
+        """Write accumulated hit counts back to Redis in one pipeline."""
+        with self._hits_lock:
+            pending, self._hits = self._hits, Counter()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, count in pending.items():
+                pipe.hincrby(key, "hits", count)
+            pipe.execute()
+        except RedisError:
+            with self._hits_lock:
+                self._hits.update(pending)
+
+    def start(self) -> None:
+        """Start the thread applying remote invalidations and writing back hit counts."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="prefix-cache", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        pubsub = None
+        while not self._stop.is_set():
+            try:
+                if pubsub is None and self.l1 is not None:
+                    pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(INVALIDATE_CHANNEL)
+                    # Invalidations published while unsubscribed were missed.
+                    self.l1.clear()
+                if pubsub is None:
+                    self._stop.wait(self.hit_flush_s)
+                else:
+                    message = pubsub.get_message(timeout=self.hit_flush_s)
+                    if message and message["type"] == "message":
+                        self.l1.invalidate(orjson.loads(message["data"]))
+                if time.monotonic() - self._last_flush >= self.hit_flush_s:
+                    self.flush_hits()
+            except RedisError:
+                logger.warning("Prefix cache invalidation listener lost Redis; reconnecting")
+                if pubsub is not None:
+                    pubsub.close()
+                    pubsub = None
+                self._stop.wait(self.hit_flush_s)
+        if pubsub is not None:
+            pubsub.close()
+
+    def close(self) -> None:
+        """Stop the background thread and write back pending hit counts."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush_hits()
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable
+
+MISSING = object()
+
+_M64 = (1 << 64) - 1
+_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5)
+_HALVE = bytes(count >> 1 for count in range(256))
+
+
+class FrequencySketch:
+    """Count-min sketch of recent access frequencies (TinyLFU).
+
+    Counters saturate at 15 and are all halved after ``10 * capacity``
+    increments, so the sketch tracks recent popularity in a few KB.
+    """
+
+    def __init__(self, capacity: int):
+        self._bits = max(4, (capacity - 1).bit_length() + 1)
+        self._rows = [bytearray(1 << self._bits) for _ in _SEEDS]
+        self._sample = 10 * max(capacity, 1)
+        self._additions = 0
+
+    def _slots(self, key: Hashable):
+        h = hash(key) & _M64
+        shift = 64 - self._bits
+        return [((h * seed) & _M64) >> shift for seed in _SEEDS]
+
+    def increment(self, key: Hashable) -> None:
+        for row, slot in zip(self._rows, self._slots(key)):
+            if row[slot] < 15:
+                row[slot] += 1
+        self._additions += 1
+        if self._additions >= self._sample:
+            self._additions //= 2
+            for row in self._rows:
+                row[:] = row.translate(_HALVE)
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[slot] for row, slot in zip(self._rows, self._slots(key)))
+
+
+class LocalCache:
+    """Bounded in-process LRU with a per-entry TTL and TinyLFU admission.
+
+    When full, a new key only displaces the least recently used entry if the
+    frequency sketch has seen it more often, so one-off lookups cannot flush
+    hot entries. ``get`` returns ``MISSING`` for absent or expired keys (``None``
+    is a valid cached value). Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 8192,
+        ttl_s: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self._sketch = FrequencySketch(max_entries)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> object:
+        with self._lock:
+            self._sketch.increment(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, value: object) -> None:
+        with self._lock:
+            expires = self.clock() + self.ttl_s
+            if key in self._entries or len(self._entries) < self.max_entries:
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+                return
+            victim, (victim_expires, _) = next(iter(self._entries.items()))
+            if victim_expires > self.clock() and (
+                self._sketch.estimate(key) <= self._sketch.estimate(victim)
+            ):
+                return
+            del self._entries[victim]
+            self._entries[key] = (expires, value)
+
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
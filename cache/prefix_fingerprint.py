@@ -1,4 +1,8 @@
 import hashlib
+from typing import List
+
+# Prompt words per prefix block; words stand in for tokens (the server has no tokenizer).
+BLOCK_TOKENS = 64
 
 
 def normalize(text: str) -> str:
@@ -13,3 +17,22 @@ def rolling_hash(text: str, n: int = 5) -> bytes:
     for gram in grams:
         digest.update(gram.encode())
     return digest.digest()
+
+
+def block_hashes(text: str, block_tokens: int = BLOCK_TOKENS) -> List[bytes]:
+    """Chained fingerprints of ``text`` cut into blocks of ``block_tokens`` words.
+
+    Each digest hashes its parent's digest together with the block, so digest
+    ``i`` identifies the whole prefix up to block ``i`` and two prompts share
+    exactly the digests of their common leading blocks. The last block may be
+    partial; whitespace is normalized.
+    """
+    words = text.split()
+    hashes: List[bytes] = []
+    parent = b""
+    for start in range(0, len(words), block_tokens):
+        digest = hashlib.blake2b(parent, digest_size=16)
+        digest.update(" ".join(words[start : start + block_tokens]).encode())
+        parent = digest.digest()
+        hashes.append(parent)
+    return hashes
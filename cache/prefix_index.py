@@ -0,0 +1,83 @@
+from typing import Dict, Sequence, Set, Tuple
+
+
+class _RadixNode:
+    __slots__ = ("label", "children", "holders")
+
+    def __init__(self, label: Tuple[bytes, ...] = (), holders: Set[str] = frozenset()):
+        self.label = label
+        # Keyed by the first block of the child's label.
+        self.children: Dict[bytes, "_RadixNode"] = {}
+        self.holders: Set[str] = set(holders)
+
+
+def _matched(label: Tuple[bytes, ...], blocks: Sequence[bytes], pos: int) -> int:
+    """Common run length of ``label`` and ``blocks[pos:]``, whose first blocks are known equal."""
+    limit = min(len(label), len(blocks) - pos)
+    matched = 1
+    while matched < limit and label[matched] == blocks[pos + matched]:
+        matched += 1
+    return matched
+
+
+class PrefixIndex:
+    """Radix tree over block-hash chains (``block_hashes``) mapping prefixes to engine nodes.
+
+    Edges are labelled with runs of block hashes and split where chains
+    diverge, so prompts sharing a long system prompt share one edge. A node that
+    registers a chain holds every prefix of it (engines cache KV block-wise), so
+    each tree node records the engine nodes whose chains cover its whole edge and
+    ``longest`` answers "longest cached prefix, and who holds it" in one walk.
+    """
+
+    def __init__(self):
+        self._root = _RadixNode()
+
+    def insert(self, blocks: Sequence[bytes], node_id: str) -> None:
+        node, pos = self._root, 0
+        while pos < len(blocks):
+            child = node.children.get(blocks[pos])
+            if child is None:
+                node.children[blocks[pos]] = _RadixNode(tuple(blocks[pos:]), {node_id})
+                return
+            matched = _matched(child.label, blocks, pos)
+            if matched < len(child.label):
+                child = self._split(node, child, matched)
+            child.holders.add(node_id)
+            node, pos = child, pos + matched
+
+    @staticmethod
+    def _split(parent: _RadixNode, child: _RadixNode, at: int) -> _RadixNode:
+        head = _RadixNode(child.label[:at], child.holders)
+        child.label = child.label[at:]
+        head.children[child.label[0]] = child
+        parent.children[head.label[0]] = head
+        return head
+
+    def longest(self, blocks: Sequence[bytes]) -> Tuple[int, Set[str]]:
+        """``(blocks matched, engine nodes holding that prefix)``; ``(0, set())`` on a miss."""
+        node, pos, holders = self._root, 0, set()
+        while pos < len(blocks):
+            child = node.children.get(blocks[pos])
+            if child is None:
+                break
+            matched = _matched(child.label, blocks, pos)
+            pos += matched
+            holders = child.holders
+            if matched < len(child.label):
+                break
+            node = child
+        return pos, set(holders)
+
+    def remove_node(self, node_id: str) -> None:
+        """Forget everything ``node_id`` holds, pruning prefixes nobody holds any more."""
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            for key, child in list(node.children.items()):
+                child.holders.discard(node_id)
+                # Holders only shrink with depth, so an empty edge has an empty subtree.
+                if child.holders:
+                    stack.append(child)
+                else:
+                    del node.children[key]
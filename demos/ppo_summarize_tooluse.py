@@ -59,6 +59,8 @@ async def run_episode(args: argparse.Namespace):
             tokens.append(resp.token)
             accepted.append(resp.accepted)
             if resp.boundary:
+                # Cancel so the server aborts the rest of the engine decode.
+                call.cancel()
                 break
         if tokens and tokens[-1].endswith("</tool>"):
             break
@@ -13,6 +13,10 @@ class DummyAdapter:
         await asyncio.sleep(0.01)
         return {"session_id": f"dummy-{next(self._counter)}", "tokens": len(prompt.split())}
 
+    async def fork_session(self, session_id: str, n: int) -> list[str]:
+        await asyncio.sleep(0)
+        return [f"{session_id}-fork-{next(self._counter)}" for _ in range(n)]
+
     async def continue_decode(
         self,
         session_id: str,
@@ -20,15 +24,39 @@ class DummyAdapter:
         max_new: int,
         grammar: str | None,
         speculative: bool,
+        prompt: str | None = None,
+        model: str | None = None,
     ):
         for idx in range(max_new):
             await asyncio.sleep(0.005)
             yield {
                 "token": f"tok-{idx}",
+                "token_id": idx,
+                "logprob": -0.5,
                 "t_us": int(time.time() * 1e6),
                 "kv_bytes": (idx + 1) * 1024,
                 "boundary": idx == max_new - 1,
             }
 
+    async def continue_decode_batch(self, requests: list[dict]):
+        """Decode a group in lockstep; yields ``(index, token)`` and ``(index, None)`` on finish."""
+        steps = max((req["max_new"] for req in requests), default=0)
+        for idx in range(steps):
+            await asyncio.sleep(0.005)
+            for member, req in enumerate(requests):
+                max_new = req["max_new"]
+                if idx >= max_new:
+                    continue
+                yield member, {
+                    "token": f"tok-{idx}",
+                    "token_id": idx,
+                    "logprob": -0.5,
+                    "t_us": int(time.time() * 1e6),
+                    "kv_bytes": (idx + 1) * 1024,
+                    "boundary": idx == max_new - 1,
+                }
+                if idx == max_new - 1:
+                    yield member, None
+
     async def close_session(self, session_id: str):
         await asyncio.sleep(0)
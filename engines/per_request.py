@@ -0,0 +1,93 @@
+import asyncio
+
+# Tokens buffered across members before their decode streams wait for the consumer.
+_BUFFER = 256
+
+
+class SeparateDecodes:
+    """Decode a group as one ``continue_decode`` stream per member.
+
+    Iterating yields ``(index, token)`` and ``(index, None)`` in arrival order, like
+    ``continue_decode_batch``; the fallback for engines without a batched route.
+    ``abort(index)`` stops one member's stream while the others keep decoding.
+    """
+
+    def __init__(self, adapter, requests: list[dict]):
+        self.adapter = adapter
+        self.requests = requests
+        self.tasks: list[asyncio.Task] = []
+        self.started: set[int] = set()
+        self.aborted: set[int] = set()
+        self.closed = False
+
+    def abort(self, index: int) -> None:
+        self.aborted.add(index)
+        # A task cancelled before its first step never enters ``member``; those
+        # see ``aborted`` when they start instead.
+        if index in self.started:
+            self.tasks[index].cancel()
+
+    async def __aiter__(self):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_BUFFER)
+
+        async def member(index: int, request: dict):
+            self.started.add(index)
+            try:
+                if index in self.aborted:
+                    raise asyncio.CancelledError
+                async for token in self.adapter.continue_decode(**request):
+                    await queue.put((index, token))
+            except asyncio.CancelledError:
+                if self.closed:
+                    raise
+                # Aborted on its own: close the member so the group can still finish.
+            except Exception as exc:  # noqa: BLE001
+                await queue.put(exc)
+                return
+            await queue.put((index, None))
+
+        self.tasks = [
+            asyncio.create_task(member(index, req)) for index, req in enumerate(self.requests)
+        ]
+        try:
+            remaining = len(self.requests)
+            while remaining:
+                item = await queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                if item[1] is None:
+                    remaining -= 1
+                yield item
+        finally:
+            self.closed = True
+            for task in self.tasks:
+                task.cancel()
+
+
+class PerRequestFallback:
+    """``continue_decode_batch`` fallback shared by adapters with an optional batch route.
+
+    Adapters set ``self._separate = {}`` to track their running fallback groups.
+    """
+
+    def decode_separately(self, requests: list[dict]):
+        decodes = SeparateDecodes(self, requests)
+        self._separate[id(requests)] = decodes
+        return self._drain(requests, decodes)
+
+    async def _drain(self, requests: list[dict], decodes: SeparateDecodes):
+        try:
+            async for item in decodes:
+                yield item
+        finally:
+            self._separate.pop(id(requests), None)
+
+    def abort_member(self, requests: list[dict], index: int) -> None:
+        """Stop one member of a running ``continue_decode_batch(requests)`` group.
+
+        Only per-member fallback decodes can be stopped; a shared ``/decode_batch``
+        stream runs until every member is done or the whole group is cancelled.
+        """
+        decodes = self._separate.get(id(requests))
+        if decodes is not None:
+            decodes.abort(index)
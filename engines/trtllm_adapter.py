@@ -1,12 +1,17 @@
 import httpx
 import orjson
 
+from engines.per_request import PerRequestFallback
 
-class TRTLLMAdapter:
+
+class TRTLLMAdapter(PerRequestFallback):
     """Adapter for TensorRT-LLM HTTP/GRPC bridge supporting streaming decode."""
 
     def __init__(self, base_url: str):
         self.client = httpx.AsyncClient(base_url=base_url, timeout=None)
+        # Cleared once the engine answers /decode_batch with 404/405 (older builds).
+        self.batch_route = True
+        self._separate = {}
 
     async def prefill(self, model: str, prompt: str, grammar: str | None):
         resp = await self.client.post(
@@ -16,6 +21,12 @@ class TRTLLMAdapter:
         resp.raise_for_status()
         return resp.json()
 
+    async def fork_session(self, session_id: str, n: int) -> list[str]:
+        """Clone a prefilled session ``n`` times; the forks share its KV prefix."""
+        resp = await self.client.post("/fork", json={"session_id": session_id, "n": n})
+        resp.raise_for_status()
+        return resp.json()["session_ids"]
+
     async def continue_decode(
         self,
         session_id: str,
@@ -23,6 +34,8 @@ class TRTLLMAdapter:
         max_new: int,
         grammar: str | None,
         speculative: bool,
+        prompt: str | None = None,
+        model: str | None = None,
     ):
         payload = {
             "session_id": session_id,
@@ -37,3 +50,42 @@ class TRTLLMAdapter:
                 if not line:
                     continue
                 yield orjson.loads(line)
+
+    async def continue_decode_batch(self, requests: list[dict]):
+        """Decode a group over one ``/decode_batch`` stream.
+
+        The engine streams NDJSON lines tagged with the member ``index``; a line with
+        ``"done": true`` closes that member. Yields ``(index, token)`` pairs and
+        ``(index, None)`` when a member finishes. Engines without the route get one
+        ``continue_decode`` per member.
+        """
+        if not self.batch_route:
+            async for item in self.decode_separately(requests):
+                yield item
+            return
+        payload = {
+            "requests": [
+                {
+                    "session_id": req["session_id"],
+                    "obs": req["obs"],
+                    "max_new_tokens": req["max_new"],
+                    "grammar": req.get("grammar"),
+                    "speculative": req.get("speculative", False),
+                }
+                for req in requests
+            ]
+        }
+        async with self.client.stream("POST", "/decode_batch", json=payload) as response:
+            if response.status_code in (404, 405):
+                self.batch_route = False
+            else:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    token = orjson.loads(line)
+                    idx = token.pop("index")
+                    yield idx, None if token.get("done") else token
+                return
+        async for item in self.decode_separately(requests):
+            yield item
@@ -6,8 +6,9 @@ import orjson
 
 
 class VLLMAdapter:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, logprobs: bool = True):
         self.client = httpx.AsyncClient(base_url=base_url, timeout=None)
+        self.logprobs = logprobs
 
     async def prefill(self, model: str, prompt: str, grammar: str | None):
         # OpenAI-compatible vLLM endpoints do not expose a dedicated prefill API.
@@ -33,6 +34,7 @@ class VLLMAdapter:
             "max_tokens": max_new,
             "stream": True,
             "temperature": 0.0,
+            **self._logprob_args(),
         }
         async with self.client.stream("POST", "/v1/completions", json=payload) as response:
             response.raise_for_status()
@@ -47,9 +49,87 @@ class VLLMAdapter:
                 text = choice.get("text") or ""
                 if not text:
                     continue
-                yield {
-                    "token": text,
-                    "t_us": int(time.time() * 1e6),
-                    "kv_bytes": 0,
-                    "boundary": choice.get("finish_reason") is not None,
-                }
+                for token in _tokens(choice, text, choice.get("finish_reason") is not None):
+                    yield token
+
+    async def continue_decode_batch(self, requests: list[dict]):
+        """Decode a group as one multi-prompt completions request.
+
+        vLLM applies a single ``max_tokens`` to every prompt, so the largest budget is
+        requested and each member is closed once it reaches its own ``max_new``.
+        Yields ``(index, token)`` pairs and ``(index, None)`` when a member finishes.
+        """
+        if any(req.get("prompt") is None for req in requests):
+            raise ValueError("prompt is required for vLLMAdapter.continue_decode_batch")
+
+        payload = {
+            "model": requests[0].get("model") or "",
+            "prompt": [req["prompt"] for req in requests],
+            "max_tokens": max(req["max_new"] for req in requests),
+            "stream": True,
+            "temperature": 0.0,
+            **self._logprob_args(),
+        }
+        emitted = [0] * len(requests)
+        finished = [False] * len(requests)
+        async with self.client.stream("POST", "/v1/completions", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = orjson.loads(data)
+                for choice in chunk["choices"]:
+                    idx = choice.get("index", 0)
+                    if finished[idx]:
+                        continue
+                    text = choice.get("text") or ""
+                    done = choice.get("finish_reason") is not None
+                    if text:
+                        emitted[idx] += 1
+                        done = done or emitted[idx] >= requests[idx]["max_new"]
+                        for token in _tokens(choice, text, done):
+                            yield idx, token
+                    if done:
+                        finished[idx] = True
+                        yield idx, None
+                if all(finished):
+                    break
+
+    def _logprob_args(self) -> dict:
+        # Token ids plus the sampled token's logprob let trainers skip a recompute pass.
+        if not self.logprobs:
+            return {}
+        return {"logprobs": 1, "return_tokens_as_token_ids": True}
+
+
+def _tokens(choice: dict, text: str, boundary: bool) -> list[dict]:
+    """Split a streamed completion choice into one entry per sampled token.
+
+    With ``return_tokens_as_token_ids`` vLLM reports tokens as ``"token_id:<id>"``.
+    A chunk normally holds one token; when it holds several, the chunk text goes on
+    the last one so the concatenated text is unchanged.
+    """
+    t_us = int(time.time() * 1e6)
+    logprobs = choice.get("logprobs") or {}
+    ids = [
+        int(token.rsplit(":", 1)[1]) if token.startswith("token_id:") else None
+        for token in logprobs.get("tokens") or []
+    ]
+    if not ids:
+        return [{"token": text, "t_us": t_us, "kv_bytes": 0, "boundary": boundary}]
+    values = logprobs.get("token_logprobs") or [None] * len(ids)
+    last = len(ids) - 1
+    return [
+        {
+            "token": text if idx == last else "",
+            "token_id": token_id,
+            "logprob": logprob,
+            "t_us": t_us,
+            "kv_bytes": 0,
+            "boundary": boundary and idx == last,
+        }
+        for idx, (token_id, logprob) in enumerate(zip(ids, values))
+    ]
@@ -9,6 +9,8 @@ class Experience:
     reward: float
     advantage: float
     accepted_mask: list | None = None
+    token_ids: list | None = None
+    logprobs: list | None = None
 
 
 class ExperienceBuffer:
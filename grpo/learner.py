@@ -78,6 +78,8 @@ async def run(cfg: LearnerConfig):
                             reward=reward,
                             advantage=adv,
                             accepted_mask=[tok.get("accepted", True) for tok in sample["tokens"]],
+                            token_ids=[tok.get("token_id") for tok in sample["tokens"]],
+                            logprobs=[tok.get("logprob") for tok in sample["tokens"]],
                         )
                     ]
                 )
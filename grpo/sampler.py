@@ -13,30 +13,29 @@ class GRPOSampler:
         self.speculative = speculative
 
     async def sample_group(self, prompt: str, max_new: int, model: str):
-        resp = await self.client.start_episode(
-            env_id="grpo", model=model, prompt=prompt, pin_prefill=True
+        """Sample the group with one SampleGroup call: one prefill, k concurrent decodes."""
+        groups = await self.client.sample_group(
+            env_id="grpo",
+            model=model,
+            prompt=prompt,
+            k=self.k,
+            max_new_tokens=max_new,
+            grammar_id=self.grammar or "",
+            speculative=self.speculative,
         )
-        session_id = resp.session_id
-        samples = []
-        for _ in range(self.k):
-            responses = await self.client.step(
-                {
-                    "session_id": session_id,
-                    "obs": "",
-                    "max_new_tokens": max_new,
-                    "grammar_id": self.grammar or "",
-                    "speculative": self.speculative,
-                }
-            )
-            tokens = [
-                {
-                    "token": r.token,
-                    "accepted": r.accepted,
-                    "boundary": r.boundary,
-                    "kv_bytes": r.kv_bytes,
-                }
-                for r in responses
-            ]
-            samples.append({"tokens": tokens})
-        await self.client.end_episode(session_id)
-        return samples
+        return [
+            {
+                "tokens": [
+                    {
+                        "token": r.token,
+                        "accepted": r.accepted,
+                        "boundary": r.boundary,
+                        "kv_bytes": r.kv_bytes,
+                        "token_id": r.token_id if r.HasField("token_id") else None,
+                        "logprob": r.logprob if r.HasField("logprob") else None,
+                    }
+                    for r in responses
+                ]
+            }
+            for responses in groups
+        ]
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import random
 import time
 
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 app = FastAPI(title="Mock LLM Engine")
@@ -24,6 +26,15 @@ class DecodeReq(BaseModel):
     speculative: bool = False
 
 
+class DecodeBatchReq(BaseModel):
+    requests: list[DecodeReq]
+
+
+class ForkReq(BaseModel):
+    session_id: str
+    n: int
+
+
 @app.post("/prefill")
 async def prefill(req: PrefillReq):
     await asyncio.sleep(0.01)
@@ -31,6 +42,11 @@ async def prefill(req: PrefillReq):
     return {"session_id": f"mock-{hash(req.prompt) & 0xFFFF:X}", "tokens": tokens}
 
 
+@app.post("/fork")
+async def fork(req: ForkReq):
+    return {"session_ids": [f"{req.session_id}-{idx}" for idx in range(req.n)]}
+
+
 @app.post("/decode")
 async def decode(req: DecodeReq):
     async def generator():
@@ -39,9 +55,39 @@ async def decode(req: DecodeReq):
             token = f"tok_{idx}" if not req.speculative else f"draft_{idx}"
             yield {
                 "token": token,
+                "token_id": idx,
+                "logprob": -0.1 * (idx % 10),
                 "t_us": int(time.time() * 1e6),
                 "kv_bytes": (idx + 1) * 2048,
                 "boundary": (idx + 1) % 5 == 0,
             }
 
     return [token async for token in generator()]
+
+
+@app.post("/decode_batch")
+async def decode_batch(req: DecodeBatchReq):
+    """Decode a group in lockstep, streaming NDJSON lines tagged with the member index."""
+
+    async def generator():
+        steps = max((item.max_new_tokens for item in req.requests), default=0)
+        for idx in range(steps):
+            await asyncio.sleep(0.005)
+            for member, item in enumerate(req.requests):
+                if idx >= item.max_new_tokens:
+                    continue
+                token = f"tok_{idx}" if not item.speculative else f"draft_{idx}"
+                line = {
+                    "index": member,
+                    "token": token,
+                    "token_id": idx,
+                    "logprob": -0.1 * (idx % 10),
+                    "t_us": int(time.time() * 1e6),
+                    "kv_bytes": (idx + 1) * 2048,
+                    "boundary": (idx + 1) % 5 == 0,
+                }
+                yield json.dumps(line) + "\n"
+                if idx == item.max_new_tokens - 1:
+                    yield json.dumps({"index": member, "done": True}) + "\n"
+
+    return StreamingResponse(generator(), media_type="application/x-ndjson")
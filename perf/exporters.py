@@ -1,3 +1,6 @@
+import time
+from bisect import bisect_left
+
 from prometheus_client import Counter, Gauge, Histogram
 
 __all__ = [
@@ -6,16 +9,215 @@ __all__ = [
     "queue_depth",
     "cache_hit",
     "cache_miss",
+    "cache_tokens",
+    "prefix_lookups",
     "kv_bytes",
+    "batch_inflight",
+    "decode_tokens_per_sec",
+    "decode_p95_ms",
+    "slo_violations",
+    "batch_queued",
+    "admission_shed",
+    "cancel_saved_tokens",
+    "queue_wait",
+    "ttft",
+    "inter_token",
+    "prefill",
+    "verifier_rtt",
+    "verifier_queue_depth",
+    "verifier_results",
+    "failover",
+    "failover_replay_tokens",
+    "sessions_resident",
+    "session_kv_resident",
+    "session_evictions",
+    "child",
+    "observe_binned",
+    "StepMetrics",
 ]
 
 tokens = Counter("primerl_tokens_total", "Tokens generated", ["phase", "model"])
+# Buckets sized for ms-scale decode phases (1 ms .. 10 s).
+MS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
 latency = Histogram(
     "primerl_request_latency_seconds",
     "Request latency by route/model",
     ["route", "model"],
+    buckets=MS_BUCKETS,
 )
 queue_depth = Gauge("primerl_queue_depth", "Requests queued", ["model"])
 cache_hit = Counter("primerl_prefix_cache_hits_total", "Prefix cache hits", ["model"])
 cache_miss = Counter("primerl_prefix_cache_misses_total", "Prefix cache misses", ["model"])
+cache_tokens = Counter(
+    "primerl_prefix_cache_tokens_total",
+    "Prompt tokens looked up in the prefix cache, by whether a cached prefix covered them",
+    ["model", "result"],
+)
+prefix_lookups = Counter(
+    "primerl_prefix_cache_lookups_total",
+    "Prefix cache key lookups by tier (l1 in-process, l2 Redis) and result",
+    ["tier", "result"],
+)
 kv_bytes = Gauge("primerl_kv_resident_bytes", "Resident KV bytes", ["model"])
+batch_inflight = Gauge(
+    "primerl_batch_inflight", "Decode requests in flight in the Batcher", ["node"]
+)
+decode_tokens_per_sec = Gauge(
+    "primerl_decode_tokens_per_second", "Batcher decode throughput", ["node"]
+)
+decode_p95_ms = Gauge("primerl_decode_p95_ms", "Batcher p95 request latency (ms)", ["node"])
+slo_violations = Counter(
+    "primerl_slo_violations_total",
+    "Decode requests that missed their deadline",
+    ["priority", "action"],
+)
+batch_queued = Gauge(
+    "primerl_batch_queued", "Decode requests waiting for a Batcher slot", ["node"]
+)
+admission_shed = Counter(
+    "primerl_admission_shed_total",
+    "Step requests rejected by admission control",
+    ["model", "reason"],
+)
+cancel_saved_tokens = Counter(
+    "primerl_cancel_saved_tokens_total",
+    "Decode tokens not generated because the caller cancelled early",
+    ["model"],
+)
+
+queue_wait = Histogram(
+    "primerl_queue_wait_seconds",
+    "Time a decode request waits in the Batcher before dispatch",
+    ["model", "priority"],
+    buckets=MS_BUCKETS,
+)
+ttft = Histogram(
+    "primerl_ttft_seconds",
+    "Engine time from decode dispatch to first token",
+    ["model"],
+    buckets=MS_BUCKETS,
+)
+inter_token = Histogram(
+    "primerl_inter_token_seconds",
+    "Gap between consecutive tokens delivered by Step",
+    ["model"],
+    buckets=MS_BUCKETS,
+)
+prefill = Histogram(
+    "primerl_prefill_seconds",
+    "Engine prefill duration",
+    ["model"],
+    buckets=MS_BUCKETS,
+)
+verifier_rtt = Histogram(
+    "primerl_verifier_rtt_seconds",
+    "Verifier /verify round-trip time",
+    ["outcome"],
+    buckets=MS_BUCKETS,
+)
+verifier_queue_depth = Gauge("primerl_verifier_queue_depth", "Traces waiting for background verification")
+verifier_results = Counter(
+    "primerl_verifier_results_total",
+    "Background verification outcomes",
+    ["status"],
+)
+failover = Histogram(
+    "primerl_failover_seconds",
+    "Decode failover duration (transcript re-prefill plus replayed decode)",
+    ["model", "warm"],
+    buckets=MS_BUCKETS,
+)
+failover_replay_tokens = Counter(
+    "primerl_failover_replay_tokens_total",
+    "Transcript tokens replayed on failover, split by whether the target node had them warm",
+    ["model", "source"],
+)
+sessions_resident = Gauge("primerl_sessions_resident", "Sessions held by the SessionManager")
+session_kv_resident = Gauge(
+    "primerl_session_kv_resident_bytes", "KV bytes attributed to resident sessions"
+)
+session_evictions = Counter(
+    "primerl_session_evictions_total",
+    "Sessions closed by the reaper without EndEpisode",
+    ["reason"],
+)
+
+_children: dict = {}
+
+
+def child(metric, *labelvalues):
+    """Return ``metric.labels(*labelvalues)``, memoised to skip label validation and locking."""
+    key = (metric, labelvalues)
+    found = _children.get(key)
+    if found is None:
+        found = _children[key] = metric.labels(*labelvalues)
+    return found
+
+
+def observe_binned(histogram, counts: list[int], total: float) -> None:
+    """Apply observations already binned against ``histogram``'s buckets in one update.
+
+    ``counts[i]`` values fell in bucket ``i`` (per bucket, not cumulative; ``+Inf``
+    last) and summed to ``total``; the result matches ``observe()``-ing each value.
+    """
+    histogram._sum.inc(total)
+    for bucket, count in zip(histogram._buckets, counts):
+        if count:
+            bucket.inc(count)
+
+
+class StepMetrics:
+    """Accumulates per-token decode metrics locally and flushes them in bulk.
+
+    Call ``token()`` on the hot path and ``flush()`` when the Step ends; long Steps
+    also flush every ``flush_interval_s`` so dashboards stay current. Inter-token
+    gaps are measured between consecutive ``token()`` calls and binned against
+    ``MS_BUCKETS`` locally, so a flush is one histogram update however many
+    tokens it covers.
+    """
+
+    __slots__ = (
+        "model",
+        "kv_bytes",
+        "flush_interval_s",
+        "_tokens",
+        "_gap_counts",
+        "_gap_sum",
+        "_last_flush",
+        "_last_token",
+    )
+
+    def __init__(self, model: str, flush_interval_s: float = 0.25):
+        self.model = model
+        self.kv_bytes = 0
+        self.flush_interval_s = flush_interval_s
+        self._tokens = 0
+        self._gap_counts = [0] * (len(MS_BUCKETS) + 1)
+        self._gap_sum = 0.0
+        self._last_flush = time.monotonic()
+        self._last_token: float | None = None
+
+    def token(self, kv_bytes: int):
+        now = time.monotonic()
+        if self._last_token is not None:
+            gap = now - self._last_token
+            self._gap_counts[bisect_left(MS_BUCKETS, gap)] += 1
+            self._gap_sum += gap
+        self._last_token = now
+        self._tokens += 1
+        self.kv_bytes = kv_bytes
+        if now - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._tokens:
+            return
+        child(tokens, "decode", self.model).inc(self._tokens)
+        child(kv_bytes, self.model).set(self.kv_bytes)
+        if any(self._gap_counts):
+            observe_binned(child(inter_token, self.model), self._gap_counts, self._gap_sum)
+            self._gap_counts = [0] * len(self._gap_counts)
+            self._gap_sum = 0.0
+        self._tokens = 0
@@ -4,6 +4,8 @@ import random
 from dataclasses import dataclass
 from typing import Iterable, Optional
 
+from cache.prefix_index import PrefixIndex
+
 
 @dataclass
 class RoutingRequest:
@@ -11,6 +13,8 @@ class RoutingRequest:
     kv_estimate: int
     slo_latency_ms: int
     model: str
+    # Chained block fingerprints of the prompt; warm nodes are those holding its longest prefix.
+    prefix_blocks: list[bytes] | None = None
 
 
 @dataclass
@@ -31,7 +35,10 @@ class Router:
         self.registry = registry
 
     def route(self, req: RoutingRequest) -> Optional[str]:
-        warm_nodes = self.cache_index.lookup(req.prompt_fp) if req.prompt_fp else []
+        if req.prefix_blocks:
+            _, warm_nodes = self.cache_index.longest(req.prefix_blocks)
+        else:
+            warm_nodes = self.cache_index.lookup(req.prompt_fp) if req.prompt_fp else []
         candidates = self.registry.nodes_for_model(req.model)
 
         scored = []
@@ -59,13 +66,27 @@ class CacheIndex:
 
     def __init__(self):
         self._index: dict[bytes, set[str]] = {}
+        self._prefixes = PrefixIndex()
 
     def register(self, prefix: bytes, node_id: str):
         self._index.setdefault(prefix, set()).add(node_id)
 
+    def register_blocks(self, blocks: list[bytes], node_id: str):
+        """Record that ``node_id`` holds the block chain ``blocks`` and all its prefixes."""
+        if blocks:
+            self._prefixes.insert(blocks, node_id)
+            # The last block identifies the whole chain for exact ``lookup``s.
+            self.register(blocks[-1], node_id)
+
     def unregister_node(self, node_id: str):
         for nodes in self._index.values():
             nodes.discard(node_id)
+        self._prefixes.remove_node(node_id)
+
+    def longest(self, blocks: list[bytes]) -> tuple[int, list[str]]:
+        """``(blocks matched, nodes holding them)`` for the longest registered prefix."""
+        depth, nodes = self._prefixes.longest(blocks)
+        return depth, sorted(nodes)
 
     def lookup(self, prefix: bytes | None) -> Iterable[str]:
         if prefix is None:
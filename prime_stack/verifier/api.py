@@ -34,3 +34,8 @@ def verify(trace: dict):
         "merkle_root": root,
         "signature": signature,
     }
+
+
+@app.post("/verify_batch")
+def verify_batch(traces: list[dict]):
+    return [verify(trace) for trace in traces]
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import collections
+import time
+from typing import Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a decode request is shed; carries a retry-after hint."""
+
+    def __init__(self, reason: str, retry_after_s: float):
+        super().__init__(f"{reason}; retry after {retry_after_s:.3f}s")
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class TokenBucket:
+    """Classic token bucket refilled at ``rate`` tokens/s up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: Optional[float] = None) -> float:
+        """Consume one token; returns 0 on success, else seconds until one is available."""
+        now = now or time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Bounds queued decode work per model and tenant and rate-limits clients.
+
+    Limits of 0 disable the corresponding check. ``model_limits`` / ``tenant_limits``
+    override the defaults for specific names. Client buckets idle long enough to
+    refill are dropped (they would be recreated full), and at most ``max_clients``
+    are kept, least recently used first out.
+    """
+
+    def __init__(
+        self,
+        max_per_model: int = 512,
+        max_per_tenant: int = 128,
+        client_rate: float = 0.0,
+        client_burst: float = 32.0,
+        model_limits: Optional[Dict[str, int]] = None,
+        tenant_limits: Optional[Dict[str, int]] = None,
+        max_clients: int = 65536,
+    ):
+        self.max_per_model = max_per_model
+        self.max_per_tenant = max_per_tenant
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.model_limits = model_limits or {}
+        self.tenant_limits = tenant_limits or {}
+        self.model_depth: collections.Counter[str] = collections.Counter()
+        self.tenant_depth: collections.Counter[str] = collections.Counter()
+        self.max_clients = max_clients
+        self.buckets: collections.OrderedDict[str, TokenBucket] = collections.OrderedDict()
+
+    def admit(
+        self,
+        model: str,
+        tenant: str,
+        client: str,
+        est_wait_ms: float = 0.0,
+        budget_ms: float = 0.0,
+        slot_ms: float = 0.0,
+    ) -> None:
+        """Admit one request or raise ``AdmissionRejected``.
+
+        ``est_wait_ms`` is the expected queueing delay, shed once it exceeds the
+        request's ``budget_ms``; ``slot_ms`` (typical request latency) scales the
+        retry hint for full queues.
+        """
+        if self.client_rate > 0:
+            bucket = self._bucket(client)
+            wait_s = bucket.take()
+            if wait_s:
+                raise AdmissionRejected("client rate limit", wait_s)
+
+        model_limit = self.model_limits.get(model, self.max_per_model)
+        if model_limit and self.model_depth[model] >= model_limit:
+            raise AdmissionRejected("model queue full", max(slot_ms, 1.0) / 1000)
+        tenant_limit = self.tenant_limits.get(tenant, self.max_per_tenant)
+        if tenant_limit and self.tenant_depth[tenant] >= tenant_limit:
+            raise AdmissionRejected("tenant queue full", max(slot_ms, 1.0) / 1000)
+        if budget_ms and est_wait_ms > budget_ms:
+            raise AdmissionRejected("estimated queue wait exceeds SLO", (est_wait_ms - budget_ms) / 1000)
+
+        self.model_depth[model] += 1
+        self.tenant_depth[tenant] += 1
+
+    def _bucket(self, client: str) -> TokenBucket:
+        now = time.monotonic()
+        refill_s = self.client_burst / self.client_rate
+        while self.buckets:
+            oldest = next(iter(self.buckets.values()))
+            if now - oldest.updated < refill_s and len(self.buckets) < self.max_clients:
+                break
+            self.buckets.popitem(last=False)
+        bucket = self.buckets.pop(client, None) or TokenBucket(self.client_rate, self.client_burst)
+        self.buckets[client] = bucket
+        return bucket
+
+    def release(self, model: str, tenant: str) -> None:
+        self.model_depth[model] -= 1
+        self.tenant_depth[tenant] -= 1
+        if self.model_depth[model] <= 0:
+            del self.model_depth[model]
+        if self.tenant_depth[tenant] <= 0:
+            del self.tenant_depth[tenant]
@@ -1,7 +1,23 @@
 import asyncio
 import collections
+import heapq
+import itertools
 import time
-from typing import Any, NamedTuple
+from typing import Any, NamedTuple, Optional
+
+from perf import exporters
+
+# Marks the end of a streamed request on its token queue.
+_EOS = object()
+
+# Default deadline budget per priority class. Scheduling is earliest-deadline-first
+# over these budgets, so interactive traffic overtakes bulk rollouts without
+# starving them; "standard" uses the Batcher's p95_slo_ms.
+PRIORITY_BUDGETS_MS = {"interactive": 300, "bulk": 5000}
+
+
+class DeadlineExceeded(Exception):
+    """Raised for requests rejected because their deadline passed while queued."""
 
 
 class Req(NamedTuple):
@@ -9,60 +25,389 @@ class Req(NamedTuple):
     engine: Any
     args: dict
     key: tuple
+    tokens: Optional[asyncio.Queue] = None
+    enqueued: float = 0.0
+    deadline: float = float("inf")
+    priority: str = "standard"
+    demoted: bool = False
+
+    def rank(self) -> tuple:
+        # Demoted (already late) work only runs when no on-time work is waiting.
+        return (self.demoted, self.deadline)
+
+
+class TokenStream:
+    """Async iterator over one streamed request; ``cancel()`` aborts its decode.
+
+    Leaving the iteration early (``break`` followed by ``aclose()``, or task
+    cancellation) also cancels, so abandoned requests stop consuming engine time.
+    """
+
+    def __init__(self, req: "Req"):
+        self._req = req
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            item = await self._req.tokens.get()
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        if item is _EOS:
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def cancel(self):
+        if not self._req.future.done():
+            self._req.future.cancel()
+
+    async def aclose(self):
+        self.cancel()
+
+
+class BatchStats:
+    """Rolling decode throughput and request latency for the Batcher."""
+
+    def __init__(self, window_s: float = 1.0, samples: int = 1024, node_id: str = "local"):
+        self.node_id = node_id
+        self.window_s = window_s
+        self.latencies_ms: collections.deque[float] = collections.deque(maxlen=samples)
+        self.tokens_per_sec = 0.0
+        self._window_tokens = 0
+        self._window_start = time.monotonic()
+
+    def add_tokens(self, count: int = 1):
+        self._window_tokens += count
+
+    def add_latency(self, latency_ms: float):
+        self.latencies_ms.append(latency_ms)
+
+    def refresh(self, now: float | None = None):
+        now = now or time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.window_s:
+            return
+        self.tokens_per_sec = self._window_tokens / elapsed
+        self._window_tokens = 0
+        self._window_start = now
+        exporters.child(exporters.decode_tokens_per_sec, self.node_id).set(self.tokens_per_sec)
+        exporters.child(exporters.decode_p95_ms, self.node_id).set(self.p95_ms())
+
+    def mean_ms(self) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        return sum(self.latencies_ms) / len(self.latencies_ms)
+
+    def p95_ms(self) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
 
 
 class Batcher:
-    """Async decode batcher that coalesces compatible requests."""
+    """Continuous decode batcher that coalesces compatible requests.
+
+    Up to ``max_batch`` requests are in flight at once. A request is admitted as
+    soon as a slot frees up rather than after the whole previous group finishes.
+    Engines exposing ``continue_decode_batch`` receive each admitted group as a
+    single request; others get one ``continue_decode`` stream per member.
+    Waiting requests sit in one sub-queue per batching key, ordered by deadline;
+    free slots are filled from the key whose head has the earliest deadline, so
+    groups only ever hold compatible work and no key starves behind a busier one.
+    Requests whose deadline passes while queued are demoted behind on-time work
+    (``late_policy="demote"``) or failed with ``DeadlineExceeded`` (``"reject"``).
+    """
 
-    def __init__(self, engine, interval_ms: int = 8, max_batch: int = 32, p95_slo_ms: int = 300):
+    def __init__(
+        self,
+        engine,
+        interval_ms: int = 8,
+        max_batch: int = 32,
+        p95_slo_ms: int = 300,
+        late_policy: str = "demote",
+        budgets_ms: dict[str, int] | None = None,
+        node_id: str = "local",
+    ):
+        if late_policy not in ("demote", "reject"):
+            raise ValueError(f"Unknown late_policy: {late_policy}")
         self.engine = engine
-        self.q: asyncio.Queue[Req] = asyncio.Queue()
+        self.queues: dict[tuple, list[tuple]] = {}
         self.interval = interval_ms / 1000
         self.max_batch = max_batch
         self.p95_slo_ms = p95_slo_ms
+        self.late_policy = late_policy
+        self.budgets_ms = {"standard": p95_slo_ms, **PRIORITY_BUDGETS_MS, **(budgets_ms or {})}
+        self.inflight: set[asyncio.Task] = set()
+        self.active = 0
+        self.node_id = node_id
+        self.stats = BatchStats(node_id=node_id)
+        self._pending = 0
+        self._ready = asyncio.Event()
+        self._seq = itertools.count()
+
+    async def submit(
+        self,
+        stream: bool = False,
+        priority: str = "standard",
+        deadline_ms: int | None = None,
+        **kwargs,
+    ):
+        """Queue a decode request.
 
-    async def submit(self, **kwargs):
+        Returns the full token list once the engine stream finishes, or with
+        ``stream=True`` a ``TokenStream`` yielding tokens as the engine emits them.
+        Cancelling the caller (or the stream) aborts the engine decode. The deadline
+        is ``deadline_ms`` from now, or the priority class budget.
+        """
         loop = asyncio.get_event_loop()
         fut: asyncio.Future = loop.create_future()
         key = (kwargs["model"], kwargs.get("grammar"), kwargs.get("speculative"))
-        await self.q.put(Req(fut, self.engine, kwargs, key))
+        tokens: Optional[asyncio.Queue] = asyncio.Queue() if stream else None
+        now = time.monotonic()
+        deadline = now + self.budget_ms(priority, deadline_ms) / 1000
+        req = Req(fut, self.engine, kwargs, key, tokens, now, deadline, priority)
+        self._push(req)
+        self._ready.set()
+        if stream:
+            return TokenStream(req)
         return await fut
 
+    def depth(self) -> int:
+        """Number of requests waiting for a batch slot."""
+        return self._pending
+
+    def budget_ms(self, priority: str = "standard", deadline_ms: int | None = None) -> float:
+        """Deadline budget applied to a request of the given class."""
+        return deadline_ms or self.budgets_ms.get(priority, self.p95_slo_ms)
+
+    def estimated_wait_ms(self) -> float:
+        """Expected queueing delay for a request submitted now.
+
+        Every slot turns over roughly once per mean request latency, so the backlog
+        drains ``max_batch`` requests per latency period.
+        """
+        return self._pending / self.max_batch * self.stats.mean_ms()
+
     async def run(self):
-        while True:
-            group: list[Req] = []
-            try:
-                first = await asyncio.wait_for(self.q.get(), timeout=self.interval)
-                group.append(first)
-            except asyncio.TimeoutError:
-                await asyncio.sleep(self.interval)
+        try:
+            while True:
+                self.stats.refresh()
+                free = self.max_batch - self.active
+                if free <= 0:
+                    await asyncio.wait(
+                        self.inflight, timeout=self.interval, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    continue
+                if not self._pending:
+                    self._ready.clear()
+                    try:
+                        await asyncio.wait_for(self._ready.wait(), timeout=self.interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                group = self._take(self._next_key(), free)
+                if group:
+                    self._dispatch(group)
+        finally:
+            for task in list(self.inflight):
+                task.cancel()
+
+    def _push(self, req: Req):
+        heap = self.queues.setdefault(req.key, [])
+        heapq.heappush(heap, (req.rank(), next(self._seq), req))
+        self._pending += 1
+        exporters.child(exporters.batch_queued, self.node_id).set(self._pending)
+
+    def _next_key(self) -> tuple:
+        # Earliest deadline first across keys; a lightly loaded key is served as
+        # soon as its head is the most urgent waiter.
+        return min(self.queues, key=lambda key: self.queues[key][0][0])
+
+    def _take(self, key: tuple, limit: int) -> list[Req]:
+        heap = self.queues[key]
+        group: list[Req] = []
+        now = time.monotonic()
+        while heap and len(group) < limit:
+            req = heapq.heappop(heap)[2]
+            self._pending -= 1
+            if req.future.cancelled():
+                exporters.cancel_saved_tokens.labels(model=req.args["model"]).inc(
+                    req.args.get("max_new", 0)
+                )
                 continue
+            if now > req.deadline and not req.demoted:
+                if self.late_policy == "reject":
+                    exporters.slo_violations.labels(priority=req.priority, action="rejected").inc()
+                    self._fail(req, DeadlineExceeded(f"deadline passed {now - req.deadline:.3f}s ago"))
+                    continue
+                exporters.slo_violations.labels(priority=req.priority, action="demoted").inc()
+                self._push(req._replace(demoted=True))
+                continue
+            group.append(req)
+        if not heap:
+            del self.queues[key]
+        exporters.child(exporters.batch_queued, self.node_id).set(self._pending)
+        return group
+
+    def _fail(self, req: Req, exc: Exception):
+        if req.future.done():
+            return
+        if req.tokens is not None:
+            req.tokens.put_nowait(exc)
+            req.tokens.put_nowait(_EOS)
+            req.future.set_result(None)
+        else:
+            req.future.set_exception(exc)
+
+    def _dispatch(self, group: list[Req]):
+        self.active += len(group)
+        exporters.child(exporters.batch_inflight, self.node_id).set(self.active)
+        now = time.monotonic()
+        for req in group:
+            exporters.child(exporters.queue_wait, req.key[0], req.priority).observe(now - req.enqueued)
+        engine = group[0].engine
+        if len(group) > 1 and hasattr(engine, "continue_decode_batch"):
+            # Shared with the decode task so a cancelled member is released at
+            # once instead of holding its slot until the group finishes.
+            args = [req.args for req in group]
+            emitted = [0] * len(group)
+            open_idx = set(range(len(group)))
+            task = self._spawn(self._run_group(group, args, emitted, open_idx))
+            for idx, req in enumerate(group):
+                req.future.add_done_callback(
+                    lambda fut, idx=idx, task=task: self._cancel_member(
+                        task, group, args, emitted, open_idx, idx
+                    ) if fut.cancelled() else None
+                )
+        else:
+            for req in group:
+                task = self._spawn(self._run_req(req))
+                req.future.add_done_callback(
+                    lambda fut, task=task: task.cancel() if fut.cancelled() else None
+                )
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.inflight.add(task)
+        task.add_done_callback(self.inflight.discard)
+        return task
+
+    def _cancel_member(
+        self,
+        task: asyncio.Task,
+        group: list[Req],
+        args: list[dict],
+        emitted: list[int],
+        open_idx: set[int],
+        idx: int,
+    ):
+        if idx not in open_idx:
+            return
+        open_idx.discard(idx)
+        self._abort(group[idx], emitted[idx])
+        if not open_idx:
+            task.cancel()
+            return
+        # The rest of the group keeps decoding; stop this member's share of the
+        # engine work where the adapter can.
+        abort_member = getattr(group[idx].engine, "abort_member", None)
+        if abort_member is not None:
+            abort_member(args, idx)
 
-            start_ts = time.time()
-            while len(group) < self.max_batch:
-                try:
-                    item = self.q.get_nowait()
-                except asyncio.QueueEmpty:
-                    break
-                if item.key == group[0].key:
-                    group.append(item)
-                else:
-                    # Put back unmatched request and stop expanding batch.
-                    self.q.put_nowait(item)
-                    break
-
-            coros = [self._collect(req.engine.continue_decode(**req.args)) for req in group]
-            streams = await asyncio.gather(*coros, return_exceptions=True)
-            latency_ms = (time.time() - start_ts) * 1000
-            if latency_ms > self.p95_slo_ms:
-                # TODO: emit a metric or log for SLO violation once observability is wired.
-                pass
-
-            for req, result in zip(group, streams):
-                req.future.set_result(result)
-
-    async def _collect(self, agen):
-        out = []
-        async for token in agen:
+    async def _run_req(self, req: Req):
+        out: Optional[list] = [] if req.tokens is None else None
+        emitted = 0
+        started = time.monotonic()
+        try:
+            async for token in req.engine.continue_decode(**req.args):
+                emitted += 1
+                if emitted == 1:
+                    self._first_token(req, started)
+                self._emit(req, out, token)
+        except asyncio.CancelledError:
+            self._abort(req, emitted)
+            raise
+        except Exception as exc:  # noqa: BLE001
+            self._complete(req, exc=exc)
+            return
+        self._complete(req, out)
+
+    async def _run_group(
+        self, group: list[Req], args: list[dict], emitted: list[int], open_idx: set[int]
+    ):
+        # One engine request serves the whole group; the adapter yields
+        # (index, token) pairs and (index, None) once a member is finished, so
+        # each member frees its slot as soon as its own stream ends.
+        outs: list[Optional[list]] = [[] if req.tokens is None else None for req in group]
+        engine = group[0].engine
+        started = time.monotonic()
+        try:
+            async for idx, token in engine.continue_decode_batch(args):
+                if idx not in open_idx:
+                    continue
+                if token is None:
+                    open_idx.discard(idx)
+                    self._complete(group[idx], outs[idx])
+                    continue
+                emitted[idx] += 1
+                if emitted[idx] == 1:
+                    self._first_token(group[idx], started)
+                self._emit(group[idx], outs[idx], token)
+        except asyncio.CancelledError:
+            for idx in sorted(open_idx):
+                self._abort(group[idx], emitted[idx])
+            raise
+        except Exception as exc:  # noqa: BLE001
+            for idx in sorted(open_idx):
+                self._complete(group[idx], exc=exc)
+            return
+        for idx in sorted(open_idx):
+            self._complete(group[idx], outs[idx])
+
+    @staticmethod
+    def _first_token(req: Req, started: float):
+        exporters.child(exporters.ttft, req.key[0]).observe(time.monotonic() - started)
+
+    def _abort(self, req: Req, emitted: int):
+        """Release a member whose engine stream was torn down before it finished."""
+        self.active -= 1
+        exporters.child(exporters.batch_inflight, self.node_id).set(self.active)
+        if req.future.cancelled():
+            saved = max(0, req.args.get("max_new", 0) - emitted)
+            exporters.cancel_saved_tokens.labels(model=req.args["model"]).inc(saved)
+        else:
+            # The Batcher itself is shutting down; do not leave the caller hanging.
+            self._fail(req, RuntimeError("Batcher stopped"))
+
+    def _emit(self, req: Req, out: Optional[list], token: dict):
+        self.stats.add_tokens()
+        if req.future.cancelled():
+            return
+        if out is None:
+            req.tokens.put_nowait(token)
+        else:
             out.append(token)
-        return out
+
+    def _complete(self, req: Req, out: Optional[list] = None, exc: Exception | None = None):
+        now = time.monotonic()
+        self.active -= 1
+        exporters.child(exporters.batch_inflight, self.node_id).set(self.active)
+        self.stats.add_latency((now - req.enqueued) * 1000)
+        if now > req.deadline and not req.demoted:
+            exporters.slo_violations.labels(priority=req.priority, action="completed_late").inc()
+        if req.future.done():
+            return
+        if exc is not None:
+            self._fail(req, exc)
+        elif req.tokens is not None:
+            # Streaming consumers already received every token through the queue.
+            req.tokens.put_nowait(_EOS)
+            req.future.set_result(None)
+        else:
+            req.future.set_result(out)
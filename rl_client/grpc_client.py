@@ -1,13 +1,56 @@
 from __future__ import annotations
 
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+
 import grpc
+import numpy as np
 
 from api import primerl_pb2, primerl_pb2_grpc
 
+_SHED = grpc.StatusCode.RESOURCE_EXHAUSTED.value[0]
+
+
+@dataclass
+class StepArrays:
+    """Tokens of one session's Step decoded from chunked StepResps."""
+
+    token_ids: np.ndarray
+    tokens: list[str]
+    t_us: np.ndarray
+    accepted: np.ndarray
+    boundary: np.ndarray
+    logprobs: np.ndarray
+    kv_bytes: int = 0
+    error: str = ""  # set when the Step failed; the arrays hold the tokens sent before it
+
+    @classmethod
+    def from_chunks(cls, chunks: list) -> "StepArrays":
+        error = next((c.error for c in chunks if c.error), "")
+        chunks = [c for c in chunks if not c.error]
+
+        def concat(arrays: list, dtype) -> np.ndarray:
+            return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+        return cls(
+            token_ids=concat([np.asarray(c.token_ids, dtype=np.int32) for c in chunks], np.int32),
+            tokens=[text for c in chunks for text in c.token_texts],
+            t_us=concat([np.asarray(c.token_t_us, dtype=np.int64) for c in chunks], np.int64),
+            accepted=concat([np.asarray(c.token_accepted, dtype=bool) for c in chunks], bool),
+            boundary=concat([np.asarray(c.token_boundary, dtype=bool) for c in chunks], bool),
+            logprobs=concat(
+                [np.asarray(c.token_logprobs, dtype=np.float32) for c in chunks], np.float32
+            ),
+            kv_bytes=chunks[-1].kv_bytes if chunks else 0,
+            error=error,
+        )
+
 
 class PrimeRLGrpcClient:
-    def __init__(self, target: str = "localhost:50051"):
+    def __init__(self, target: str = "localhost:50051", max_retries: int = 3):
         self._target = target
+        self.max_retries = max_retries
         self._channel: grpc.aio.Channel | None = None
         self._stub: primerl_pb2_grpc.PrimeRLStub | None = None
 
@@ -22,25 +65,111 @@ class PrimeRLGrpcClient:
         req = primerl_pb2.StartReq(**kwargs)
         return await stub.StartEpisode(req)
 
+    async def start_episode_batch(self, episodes: list[dict]):
+        """Start many episodes in one round-trip; returns StartResps in request order."""
+        stub = await self._ensure_stub()
+        req = primerl_pb2.StartBatchReq(episodes=[primerl_pb2.StartReq(**ep) for ep in episodes])
+        return list((await stub.StartEpisodeBatch(req)).sessions)
+
     async def step(self, *step_reqs):
+        """Run StepReqs on one stream; returns their StepResps in arrival order.
+
+        A failed StepReq ends with a StepResp carrying ``error``. Shed requests are
+        retried after their retry-after hint, unless the call holds another request
+        for the same session (retrying would reorder that session's Steps).
+        """
         stub = await self._ensure_stub()
+        pending = [dict(req) for req in step_reqs]
+        responses = []
+        for attempt in range(self.max_retries + 1):
 
-        async def iterator():
-            for req in step_reqs:
-                yield primerl_pb2.StepReq(**req)
+            async def iterator(reqs=pending):
+                for req in reqs:
+                    yield primerl_pb2.StepReq(**req)
 
-        call = stub.Step(iterator())
-        tokens = []
-        async for resp in call:
-            tokens.append(resp)
-        return tokens
+            sessions = Counter(req.get("session_id", "") for req in pending)
+            shed_reqs, retry_after_s = [], 0.0
+            call = stub.Step(iterator())
+            received = False
+            try:
+                async for resp in call:
+                    received = True
+                    if (
+                        resp.error_code == _SHED
+                        and sessions[resp.session_id] == 1
+                        and attempt < self.max_retries
+                    ):
+                        shed_reqs += [
+                            req for req in pending if req.get("session_id", "") == resp.session_id
+                        ]
+                        retry_after_s = max(retry_after_s, resp.retry_after_ms / 1000 or 0.1)
+                        continue
+                    responses.append(resp)
+            except grpc.aio.AioRpcError as exc:
+                # Shed requests carry a retry-after hint; back off instead of piling on.
+                shed = exc.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+                if not shed or received or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(_retry_after_s(exc))
+                continue
+            if not shed_reqs:
+                break
+            await asyncio.sleep(retry_after_s)
+            pending = shed_reqs
+        return responses
+
+    async def sample_group(self, **kwargs) -> list[list]:
+        """Run a SampleGroup RPC; returns the k samples' SampleResp tokens in index order."""
+        stub = await self._ensure_stub()
+        req = primerl_pb2.SampleGroupReq(**kwargs)
+        for attempt in range(self.max_retries + 1):
+            samples: list[list] = [[] for _ in range(req.k)]
+            received = False
+            try:
+                async for resp in stub.SampleGroup(req):
+                    received = True
+                    if not resp.done:
+                        samples[resp.index].append(resp)
+                return samples
+            except grpc.aio.AioRpcError as exc:
+                shed = exc.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+                if not shed or received or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(_retry_after_s(exc))
+
+    async def step_arrays(self, *step_reqs, chunk_tokens: int = 64) -> dict[str, StepArrays]:
+        """Run Step in chunked mode and decode each session's tokens into numpy arrays.
+
+        ``token_ids`` / ``logprobs`` are empty when the engine does not report them.
+        """
+        responses = await self.step(*({"chunk_tokens": chunk_tokens, **req} for req in step_reqs))
+        chunks: dict[str, list] = {req["session_id"]: [] for req in step_reqs}
+        for resp in responses:
+            chunks.setdefault(resp.session_id, []).append(resp)
+        return {session_id: StepArrays.from_chunks(c) for session_id, c in chunks.items()}
 
     async def end_episode(self, session_id: str):
         stub = await self._ensure_stub()
         return await stub.EndEpisode(primerl_pb2.EndReq(session_id=session_id))
 
+    async def end_episode_batch(self, session_ids: list[str]):
+        stub = await self._ensure_stub()
+        req = primerl_pb2.EndBatchReq(session_ids=session_ids)
+        return list((await stub.EndEpisodeBatch(req)).results)
+
+    async def get_verification(self, session_id: str):
+        stub = await self._ensure_stub()
+        return await stub.GetVerification(primerl_pb2.VerifyReq(session_id=session_id))
+
     async def close(self):
         if self._channel is not None:
             await self._channel.close()
             self._channel = None
             self._stub = None
+
+
+def _retry_after_s(exc: grpc.aio.AioRpcError, default: float = 0.1) -> float:
+    for key, value in exc.trailing_metadata() or ():
+        if key == "retry-after-ms":
+            return int(value) / 1000
+    return default
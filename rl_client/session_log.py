@@ -0,0 +1,208 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rl_client.session_store import compact_session
+
+logger = logging.getLogger(__name__)
+
+OP_HSET = 1
+OP_DEL = 2
+
+# crc32(op + body), len(body), op; the body is the session id followed by fields.
+_RECORD = struct.Struct("<IIB")
+_SID = struct.Struct("<H")
+_FIELD = struct.Struct("<HI")
+
+SessionHashes = Dict[str, Dict[bytes, bytes]]
+
+
+def encode_record(op: int, session_id: str, fields: Optional[dict] = None) -> bytes:
+    sid = session_id.encode()
+    parts = [_SID.pack(len(sid)), sid]
+    for name, value in (fields or {}).items():
+        name = name.encode() if isinstance(name, str) else name
+        parts += [_FIELD.pack(len(name), len(value)), name, value]
+    body = b"".join(parts)
+    op_byte = bytes((op,))
+    return _RECORD.pack(zlib.crc32(body, zlib.crc32(op_byte)), len(body), op) + body
+
+
+def iter_records(buf) -> Iterator[Tuple[int, str, Dict[bytes, bytes], int]]:
+    """Yield ``(op, session_id, fields, end_offset)`` until the buffer ends or a record is torn."""
+    offset, size = 0, len(buf)
+    while offset + _RECORD.size <= size:
+        crc, length, op = _RECORD.unpack_from(buf, offset)
+        start = offset + _RECORD.size
+        end = start + length
+        body = buf[start:end]
+        if end > size or zlib.crc32(body, zlib.crc32(bytes((op,)))) != crc:
+            return
+        (sid_len,) = _SID.unpack_from(body)
+        pos = _SID.size + sid_len
+        session_id = body[_SID.size : pos].decode()
+        fields = {}
+        while pos < length:
+            name_len, value_len = _FIELD.unpack_from(body, pos)
+            pos += _FIELD.size + name_len
+            fields[body[pos - name_len : pos]] = body[pos : pos + value_len]
+            pos += value_len
+        yield op, session_id, fields, end
+        offset = end
+
+
+def replay(path: Path, sessions: SessionHashes) -> int:
+    """Apply a log file to ``sessions`` through mmap; returns the offset of the last good record."""
+    good = 0
+    with open(path, "rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for op, session_id, fields, end in iter_records(buf):
+                if op == OP_HSET:
+                    sessions.setdefault(session_id, {}).update(fields)
+                else:
+                    sessions.pop(session_id, None)
+                good = end
+    return good
+
+
+class SessionLog:
+    """Append-only session log with compacted snapshots, for single-replica restarts.
+
+    A write-back backend for ``SessionStoreSync`` that records the same per-session
+    hashes as ``RedisSessionStore`` (header fields plus ``step:<n>`` fields) as
+    binary HSET/DEL records in ``wal.<seq>`` segments under ``directory``. Once a
+    segment exceeds ``segment_bytes`` it is closed and a background thread folds it
+    into ``snapshot.<seq>``, one HSET per live session with its Steps folded into a
+    materialised ``state`` field, then deletes the segments it covers.
+    ``recover()`` maps the newest snapshot and the later segments and returns the
+    live session hashes; a torn tail record is truncated away.
+    """
+
+    # Sessions are never shared, so there are no leases to renew.
+    lease_ms = 0
+
+    def __init__(self, directory: str, segment_bytes: int = 64 << 20, fsync: bool = False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        # Continue after the newest segment or snapshot so recovery order is preserved.
+        self._seq = max([0, *self._segments(), *(seq + 1 for seq in self._snapshots())])
+        self._handle = open(self._segment_path(self._seq), "ab")
+        self._compactor: Optional[threading.Thread] = None
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"wal.{seq:08d}"
+
+    def _seqs(self, prefix: str) -> List[int]:
+        names = (path.name.split(".") for path in self.directory.glob(f"{prefix}.*"))
+        return sorted(int(parts[1]) for parts in names if len(parts) == 2 and parts[1].isdigit())
+
+    def _segments(self) -> List[int]:
+        return self._seqs("wal")
+
+    def _snapshots(self) -> List[int]:
+        return self._seqs("snapshot")
+
+    def write(
+        self,
+        updates: Iterable[Tuple[str, dict]],
+        ended: Iterable[str] = (),
+        renew: Iterable[str] = (),
+    ) -> List[str]:
+        """Append one group of mutations; same contract as ``RedisSessionStore.write``."""
+        records = [encode_record(OP_HSET, session_id, fields) for session_id, fields in updates]
+        records += [encode_record(OP_DEL, session_id) for session_id in ended]
+        if records:
+            self._handle.write(b"".join(records))
+            self._handle.flush()
+            if self.fsync:
+                os.fsync(self._handle.fileno())
+            if self._handle.tell() >= self.segment_bytes:
+                self._rotate()
+        return []
+
+    def acquire(self, session_id: str) -> None:
+        """Every logged session is restored by ``recover()`` at startup."""
+        return None
+
+    def _next_segment(self) -> int:
+        self._handle.close()
+        closed = self._seq
+        self._seq += 1
+        self._handle = open(self._segment_path(self._seq), "ab")
+        return closed
+
+    def _rotate(self) -> None:
+        self._next_segment()
+        if self._compactor is None or not self._compactor.is_alive():
+            self._compactor = threading.Thread(
+                target=self._compact_closed, name="session-log-compact", daemon=True
+            )
+            self._compactor.start()
+
+    def _compact_closed(self) -> None:
+        # Segments closed while a pass runs are folded by the next one.
+        done = -1
+        while done < self._seq - 1:
+            done = self._seq - 1
+            self.compact(done)
+
+    def snapshot(self) -> None:
+        """Close the current segment and fold everything logged so far into a snapshot."""
+        if self._compactor is not None:
+            self._compactor.join()
+        self.compact(self._next_segment())
+
+    def _load(self, upto: Optional[int] = None) -> SessionHashes:
+        sessions: SessionHashes = {}
+        snapshots = self._snapshots()
+        base = snapshots[-1] if snapshots else -1
+        if snapshots:
+            replay(self.directory / f"snapshot.{base:08d}", sessions)
+        for seq in self._segments():
+            if base < seq and (upto is None or seq <= upto):
+                path = self._segment_path(seq)
+                good = replay(path, sessions)
+                if upto is None and good < path.stat().st_size:
+                    logger.warning("Truncating torn session log tail in %s at %d", path, good)
+                    os.truncate(path, good)
+        return sessions
+
+    def compact(self, upto: int) -> None:
+        """Fold the snapshot and segments up to ``upto`` into ``snapshot.<upto>``."""
+        try:
+            sessions = self._load(upto)
+            tmp = self.directory / f"snapshot.{upto:08d}.tmp"
+            with open(tmp, "wb") as handle:
+                for session_id, fields in sessions.items():
+                    handle.write(encode_record(OP_HSET, session_id, compact_session(fields)))
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp, self.directory / f"snapshot.{upto:08d}")
+            for seq in self._snapshots():
+                if seq < upto:
+                    (self.directory / f"snapshot.{seq:08d}").unlink(missing_ok=True)
+            for seq in self._segments():
+                if seq <= upto:
+                    self._segment_path(seq).unlink(missing_ok=True)
+        except OSError:
+            logger.exception("Session log compaction failed; segments are kept")
+
+    def recover(self) -> SessionHashes:
+        """Live session hashes from the newest snapshot plus the segments after it."""
+        if self._compactor is not None:
+            self._compactor.join()
+        return self._load()
+
+    def close(self) -> None:
+        if self._compactor is not None:
+            self._compactor.join()
+        self._handle.close()
@@ -1,77 +1,488 @@
+import contextlib
+import hashlib
+import math
+import struct
 import time
 import uuid
-from typing import Dict, Optional
+from array import array
+from itertools import accumulate, compress
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+
+class ConversationBuffer:
+    """Append-only episode context: text segments plus a running prefix fingerprint.
+
+    Segments are never rewritten, so ``text()`` joins them at most once per
+    append and the blake2b fingerprint of the running prefix is updated in
+    O(len(segment)). ``mark_turn()`` records ``(length, fingerprint)`` at turn
+    boundaries so callers can look up warm prefixes without rehashing history.
+    """
+
+    __slots__ = ("segments", "length", "boundaries", "_digest", "_text")
+
+    def __init__(self, prompt: str = ""):
+        self.segments: List[str] = []
+        self.length = 0
+        self.boundaries: List[Tuple[int, bytes]] = []
+        self._digest = hashlib.blake2b(digest_size=16)
+        self._text: Optional[str] = ""
+        self.append(prompt)
+        self.mark_turn()
+
+    def append(self, text: str) -> None:
+        if not text:
+            return
+        self.segments.append(text)
+        self.length += len(text)
+        self._digest.update(text.encode())
+        self._text = None
+
+    def mark_turn(self) -> None:
+        self.boundaries.append((self.length, self.fingerprint()))
+
+    def fingerprint(self) -> bytes:
+        return self._digest.copy().digest()
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(self.segments)
+        return self._text
+
+    @classmethod
+    def from_text(cls, text: str, boundaries: List[Tuple[int, bytes]]) -> "ConversationBuffer":
+        """Rebuild a buffer from its full text and recorded turn boundaries."""
+        buffer = cls(text)
+        buffer.boundaries = boundaries
+        return buffer
+
+
+# Header fields a journal flush only writes at creation or after they change: the
+# prompt and meta (which holds the prompt again) can be large.
+BULK_FIELDS = ("prompt", "tools", "meta")
+
+_STATE = struct.Struct("<II")
+_PACK_MAGIC = 0x0102040810204080
+_WORD_MASK = (1 << 64) - 1
+
+
+class PackedBits:
+    """Append-only bit vector packed eight flags per byte (LSB first)."""
+
+    __slots__ = ("_bytes", "_len")
+
+    def __init__(self, bits: Iterable[bool] = ()):
+        self._bytes = bytearray()
+        self._len = 0
+        self.extend(bits)
+
+    def append(self, bit: bool) -> None:
+        if not self._len & 7:
+            self._bytes.append(0)
+        if bit:
+            self._bytes[-1] |= 1 << (self._len & 7)
+        self._len += 1
+
+    def extend(self, bits: Iterable[bool]) -> None:
+        flags = bytes(map(bool, bits))
+        head = min(-self._len & 7, len(flags))
+        for flag in flags[:head]:
+            self.append(flag)
+        full = (len(flags) - head) >> 3
+        if full:
+            # Eight 0/1 bytes read as a little-endian word collapse to one packed byte.
+            words = struct.unpack_from(f"<{full}Q", flags, head)
+            self._bytes += bytes((word * _PACK_MAGIC & _WORD_MASK) >> 56 for word in words)
+            self._len += full << 3
+        for flag in flags[head + (full << 3) :]:
+            self.append(flag)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, idx: int) -> bool:
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("bit index out of range")
+        return bool(self._bytes[idx >> 3] >> (idx & 7) & 1)
+
+    def __iter__(self) -> Iterator[bool]:
+        return (self[idx] for idx in range(self._len))
+
+    def tolist(self) -> List[bool]:
+        return list(self)
+
+    @classmethod
+    def frombytes(cls, data: bytes, length: int) -> "PackedBits":
+        bits = cls()
+        bits._bytes = bytearray(data)
+        bits._len = length
+        return bits
+
+    def view(self) -> memoryview:
+        """Read-only view of the packed bytes; release it before appending again."""
+        return memoryview(self._bytes).toreadonly()
+
+    def tobytes(self) -> bytes:
+        return bytes(self._bytes)
+
+
+class SessionRecord:
+    """One RL episode: routing state plus a compact, append-only token trace.
+
+    Per-token data lives in typed arrays instead of lists of Python objects:
+    token ids in ``array('i')`` (-1 when the engine reported none), logprobs in
+    ``array('f')`` (NaN when unknown), the accepted mask as ``PackedBits`` and the
+    token text as one string per Step plus ``array('I')`` end offsets.
+    """
+
+    __slots__ = (
+        "env_id",
+        "model",
+        "node_id",
+        "started_t",
+        "last_t",
+        "steps",
+        "active",
+        "kv_bytes",
+        "engine_session_id",
+        "token_ids",
+        "logprobs",
+        "accepted",
+        "token_ends",
+        "_text_parts",
+        "_text",
+        "conversation",
+        "tools",
+        "meta",
+    )
+
+    def __init__(self, env_id: str, model: str, node_id: Optional[str] = None, prompt: str = ""):
+        now = time.time()
+        self.env_id = env_id
+        self.model = model
+        self.node_id = node_id
+        self.started_t = now
+        self.last_t = now
+        self.steps = 0
+        self.active = 0
+        self.kv_bytes = 0
+        self.engine_session_id: Optional[str] = None
+        self.token_ids = array("i")
+        self.logprobs = array("f")
+        self.accepted = PackedBits()
+        self.token_ends = array("I")
+        self._text_parts: List[str] = []
+        self._text: Optional[str] = ""
+        self.conversation = ConversationBuffer(prompt)
+        self.tools: List[dict] = []
+        self.meta: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.token_ends)
+
+    def append_tokens(
+        self,
+        tokens: List[str],
+        accepted_mask: List[bool],
+        token_ids: Optional[List[Optional[int]]] = None,
+        logprobs: Optional[List[Optional[float]]] = None,
+    ) -> None:
+        """Append per-token data; everything is converted first, so bad input changes nothing."""
+        n = len(tokens)
+        if len(accepted_mask) != n or any(
+            values and len(values) != n for values in (token_ids, logprobs)
+        ):
+            raise ValueError("accepted_mask, token_ids and logprobs must align with tokens")
+        end = self.token_ends[-1] if self.token_ends else 0
+        ends = array("I", accumulate(map(len, tokens), initial=end))
+        del ends[0]  # accumulate() yields the start offset first
+        if token_ids and None not in token_ids:
+            ids = array("i", token_ids)
+        elif token_ids:
+            ids = array("i", [-1 if tid is None else tid for tid in token_ids])
+        else:
+            ids = array("i", [-1]) * n
+        if logprobs and None not in logprobs:
+            lps = array("f", logprobs)
+        elif logprobs:
+            lps = array("f", [math.nan if lp is None else lp for lp in logprobs])
+        else:
+            lps = array("f", [math.nan]) * n
+        flags = bytes(map(bool, accepted_mask))
+        text = "".join(tokens)
+        self.token_ends.extend(ends)
+        self.token_ids.extend(ids)
+        self.logprobs.extend(lps)
+        self.accepted.extend(flags)
+        self._text_parts.append(text)
+        self._text = None
+
+    def append_step(
+        self,
+        tokens: List[str],
+        accepted_mask: List[bool],
+        obs: Optional[str] = None,
+        token_ids: Optional[List[Optional[int]]] = None,
+        logprobs: Optional[List[Optional[float]]] = None,
+    ) -> None:
+        """Record one Step; ``obs`` plus the accepted tokens extend the conversation.
+
+        The Step only counts once its tokens are stored, so a rejected append
+        leaves the record as it was.
+        """
+        self.append_tokens(tokens, accepted_mask, token_ids=token_ids, logprobs=logprobs)
+        if obs is not None:
+            self.conversation.append(obs)
+            self.conversation.append("".join(compress(tokens, accepted_mask)))
+            self.conversation.mark_turn()
+        self.steps += 1
+
+    @classmethod
+    def restore(cls, header: dict, steps: List[dict]) -> "SessionRecord":
+        """Rebuild a record from a stored header (optionally with ``state``) plus later Steps."""
+        record = cls(
+            header["env_id"],
+            header["model"],
+            node_id=header.get("node_id"),
+            prompt=header.get("prompt", ""),
+        )
+        if "state" in header:
+            record._load_state(header["state"])
+        for step in steps:
+            record.append_step(
+                step["tokens"],
+                step["accepted"],
+                step["obs"],
+                token_ids=step["token_ids"],
+                logprobs=step["logprobs"],
+            )
+        for field in ("started_t", "last_t", "kv_bytes", "engine_session_id"):
+            if field in header:
+                setattr(record, field, header[field])
+        record.tools = list(header.get("tools", []))
+        record.meta = dict(header.get("meta", {}))
+        return record
+
+    def dump_state(self) -> bytes:
+        """Materialised token trace and conversation, restored without replaying Steps.
+
+        Layout: ``<II`` (meta length, token count), orjson meta, then the raw
+        token id, logprob and end-offset arrays (native byte order) and the packed
+        accepted bits.
+        """
+        conversation = self.conversation
+        meta = orjson.dumps(
+            {
+                "steps": self.steps,
+                "text": self.text(),
+                "conversation": conversation.text(),
+                "boundaries": [[length, fp.hex()] for length, fp in conversation.boundaries],
+            }
+        )
+        return b"".join(
+            (
+                _STATE.pack(len(meta), len(self)),
+                meta,
+                self.token_ids.tobytes(),
+                self.logprobs.tobytes(),
+                self.token_ends.tobytes(),
+                self.accepted.tobytes(),
+            )
+        )
+
+    def _load_state(self, data: bytes) -> None:
+        meta_len, n = _STATE.unpack_from(data)
+        pos = _STATE.size + meta_len
+        meta = orjson.loads(data[_STATE.size : pos])
+        for values in (self.token_ids, self.logprobs, self.token_ends):
+            size = n * values.itemsize
+            values.frombytes(data[pos : pos + size])
+            pos += size
+        self.accepted = PackedBits.frombytes(data[pos:], n)
+        self.steps = meta["steps"]
+        self._text_parts = [meta["text"]]
+        self._text = None
+        self.conversation = ConversationBuffer.from_text(
+            meta["conversation"],
+            [(length, bytes.fromhex(fp)) for length, fp in meta["boundaries"]],
+        )
+
+    def text(self) -> str:
+        """All generated token text (including rejected tokens), joined once per append."""
+        if self._text is None:
+            self._text = "".join(self._text_parts)
+            self._text_parts = [self._text]
+        return self._text
+
+    def token_texts(self) -> List[str]:
+        text = self.text()
+        starts = [0, *self.token_ends[:-1]]
+        return [text[start:end] for start, end in zip(starts, self.token_ends)]
 
 
 class SessionManager:
-    """Tracks RL episode sessions and KV residency metadata."""
-
-    def __init__(self):
-        self.sessions: Dict[str, dict] = {}
-
-    def start(self, env_id: str, model: str) -> str:
-        session_id = str(uuid.uuid4())
-        self.sessions[session_id] = {
-            "env_id": env_id,
-            "model": model,
-            "last_t": time.time(),
-            "kv_bytes": 0,
-            "engine_session_id": None,
-            "tokens": [],
-            "accepted_mask": [],
-            "tools": [],
-            "meta": {},
-        }
+    """Tracks RL episode sessions and KV residency metadata.
+
+    With ``journal=True`` every change is also queued for a write-back session
+    store: ``drain()`` hands out the sessions changed since the last call (with the
+    ``BULK_FIELDS`` and Steps they changed) and the sessions that ended, and
+    ``restore()`` rebuilds a session from its stored header and Steps.
+    """
+
+    def __init__(self, new_id: Optional[Callable[[], str]] = None, journal: bool = False):
+        self.sessions: Dict[str, SessionRecord] = {}
+        self.new_id = new_id or (lambda: str(uuid.uuid4()))
+        self.journal = journal
+        self._pending: Dict[str, List[Tuple[int, dict]]] = {}
+        self._dirty: Dict[str, set] = {}
+        self._ended: set = set()
+
+    def start(
+        self, env_id: str, model: str, node_id: Optional[str] = None, prompt: str = ""
+    ) -> str:
+        session_id = self.new_id()
+        self.sessions[session_id] = SessionRecord(env_id, model, node_id=node_id, prompt=prompt)
+        if self.journal:
+            self._pending[session_id] = []
+            self._dirty[session_id] = set(BULK_FIELDS)
         return session_id
 
-    def bind_engine(self, session_id: str, engine_session_id: str) -> None:
-        if session_id not in self.sessions:
+    def _record(self, session_id: str) -> SessionRecord:
+        record = self.sessions.get(session_id)
+        if record is None:
             raise KeyError(f"Unknown session: {session_id}")
-        self.sessions[session_id]["engine_session_id"] = engine_session_id
+        return record
+
+    def _changed(self, session_id: str, bulk_field: Optional[str] = None) -> SessionRecord:
+        record = self._record(session_id)
+        if self.journal:
+            self._pending.setdefault(session_id, [])
+            if bulk_field:
+                self._dirty.setdefault(session_id, set()).add(bulk_field)
+        return record
+
+    def bind_engine(
+        self, session_id: str, engine_session_id: str, node_id: Optional[str] = None
+    ) -> None:
+        record = self._changed(session_id)
+        record.engine_session_id = engine_session_id
+        if node_id is not None:
+            record.node_id = node_id
 
     def touch(self, session_id: str, kv_bytes: int = 0) -> None:
-        if session_id not in self.sessions:
-            raise KeyError(f"Unknown session: {session_id}")
-        entry = self.sessions[session_id]
-        entry["last_t"] = time.time()
-        entry["kv_bytes"] = kv_bytes
+        record = self._changed(session_id)
+        record.last_t = time.time()
+        record.kv_bytes = kv_bytes
 
-    def get(self, session_id: str) -> Optional[dict]:
+    def get(self, session_id: str) -> Optional[SessionRecord]:
         return self.sessions.get(session_id)
 
-    def record_tokens(self, session_id: str, tokens: list[str], accepted_mask: list[bool]):
-        if session_id not in self.sessions:
-            raise KeyError(f"Unknown session: {session_id}")
-        entry = self.sessions[session_id]
-        entry["tokens"].extend(tokens)
-        entry["accepted_mask"].extend(accepted_mask)
+    @contextlib.contextmanager
+    def in_use(self, session_id: str) -> Iterator[None]:
+        """Mark a session busy for the duration of an RPC so the reaper leaves it alone."""
+        record = self.sessions.get(session_id)
+        if record is not None:
+            record.active += 1
+        try:
+            yield
+        finally:
+            if record is not None:
+                record.active -= 1
+                record.last_t = time.time()
+
+    def record_tokens(
+        self,
+        session_id: str,
+        tokens: list[str],
+        accepted_mask: list[bool],
+        obs: Optional[str] = None,
+        token_ids: Optional[list[Optional[int]]] = None,
+        logprobs: Optional[list[Optional[float]]] = None,
+    ):
+        """Append a Step's tokens; ids/logprobs stay aligned with ``tokens`` (None if unknown)."""
+        record = self._changed(session_id)
+        record.append_step(tokens, accepted_mask, obs, token_ids=token_ids, logprobs=logprobs)
+        if self.journal:
+            step = {"tokens": tokens, "accepted": accepted_mask, "obs": obs}
+            step["token_ids"], step["logprobs"] = token_ids, logprobs
+            self._pending[session_id].append((record.steps, step))
+
+    def conversation(self, session_id: str) -> ConversationBuffer:
+        return self._record(session_id).conversation
 
     def record_tool(self, session_id: str, tool_call: dict):
-        if session_id not in self.sessions:
-            raise KeyError(f"Unknown session: {session_id}")
-        self.sessions[session_id]["tools"].append(tool_call)
+        self._changed(session_id, "tools").tools.append(tool_call)
 
     def set_meta(self, session_id: str, **kwargs):
-        if session_id not in self.sessions:
-            raise KeyError(f"Unknown session: {session_id}")
-        self.sessions[session_id]["meta"].update(kwargs)
+        self._changed(session_id, "meta").meta.update(kwargs)
 
     def end(self, session_id: str) -> None:
+        if self.sessions.pop(session_id, None) is not None and self.journal:
+            self._pending.pop(session_id, None)
+            self._dirty.pop(session_id, None)
+            self._ended.add(session_id)
+
+    def drop(self, session_id: str) -> None:
+        """Forget a session locally without ending it in the session store."""
         self.sessions.pop(session_id, None)
+        self._pending.pop(session_id, None)
+        self._dirty.pop(session_id, None)
+
+    def drain(self) -> Tuple[list, List[str]]:
+        """Take the journal: ``(session_id, record, bulk_fields, steps)`` per changed session.
+
+        ``bulk_fields`` are the ``BULK_FIELDS`` to write (all of them for a new
+        session). Also returns the sessions ended since the last drain.
+        """
+        changed = [
+            (session_id, self.sessions[session_id], self._dirty.get(session_id, set()), steps)
+            for session_id, steps in self._pending.items()
+            if session_id in self.sessions
+        ]
+        ended = list(self._ended)
+        self._pending, self._dirty, self._ended = {}, {}, set()
+        return changed, ended
+
+    def requeue(self, changed, ended) -> None:
+        """Put back a ``drain()`` result whose write failed, ahead of newer changes."""
+        for session_id, _, bulk_fields, steps in changed:
+            if session_id in self.sessions:
+                self._pending[session_id] = steps + self._pending.get(session_id, [])
+                if bulk_fields:
+                    self._dirty.setdefault(session_id, set()).update(bulk_fields)
+        self._ended.update(session_id for session_id in ended if session_id not in self.sessions)
+
+    def restore(self, session_id: str, header: dict, steps: List[dict]) -> SessionRecord:
+        """Rebuild a session from the store (``SessionRecord.restore``) and track it."""
+        record = self.sessions[session_id] = SessionRecord.restore(header, steps)
+        return record
 
     def stats(self):
         return self.sessions.copy()
 
     def trace(self, session_id: str) -> dict:
-        entry = self.sessions.get(session_id)
-        if not entry:
-            raise KeyError(f"Unknown session: {session_id}")
+        """Export a snapshot of a session's trace.
+
+        ``token_ids`` (int32), ``logprobs`` (float32) and ``token_ends`` (uint32
+        offsets into ``text``) are copies of the typed arrays and ``accepted_bits``
+        holds the packed mask (``n_tokens`` bits, LSB first). Holding a trace never
+        blocks the session from recording more tokens.
+        """
+        record = self._record(session_id)
         return {
-            "env_id": entry["env_id"],
-            "model": entry["model"],
-            "tokens": list(entry["tokens"]),
-            "accepted_mask": list(entry["accepted_mask"]),
-            "kv_bytes": entry["kv_bytes"],
-            "tools": list(entry["tools"]),
-            "meta": dict(entry.get("meta", {})),
+            "env_id": record.env_id,
+            "model": record.model,
+            "node_id": record.node_id,
+            "n_tokens": len(record),
+            "text": record.text(),
+            "token_ends": record.token_ends[:],
+            "token_ids": record.token_ids[:],
+            "logprobs": record.logprobs[:],
+            "accepted_bits": record.accepted.tobytes(),
+            "kv_bytes": record.kv_bytes,
+            "tools": list(record.tools),
+            "meta": dict(record.meta),
         }
@@ -0,0 +1,163 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+import redis
+
+from rl_client.session_manager import SessionRecord
+
+# Scalar record fields rewritten on every flush; ``BULK_FIELDS`` are only written when
+# they change and Steps are journalled as ``step:<n>``.
+HEADER_FIELDS = (
+    "env_id",
+    "model",
+    "node_id",
+    "started_t",
+    "last_t",
+    "kv_bytes",
+    "engine_session_id",
+)
+
+
+class SessionLeased(Exception):
+    """The session is leased to another replica; ``owner`` is its advertised address."""
+
+    def __init__(self, session_id: str, owner: str):
+        super().__init__(f"Session {session_id} is owned by {owner}")
+        self.session_id = session_id
+        self.owner = owner
+
+
+def encode_header(record: SessionRecord, bulk_fields: Iterable[str] = ("tools", "meta")) -> dict:
+    """Scalar header fields plus the requested ``BULK_FIELDS`` (see ``SessionManager.drain``)."""
+    header = {field: orjson.dumps(getattr(record, field)) for field in HEADER_FIELDS}
+    for field in bulk_fields:
+        if field == "prompt":
+            conversation = record.conversation
+            header["prompt"] = orjson.dumps(conversation.text()[: conversation.boundaries[0][0]])
+        else:
+            header[field] = orjson.dumps(getattr(record, field))
+    return header
+
+
+def decode_session(mapping: Dict[bytes, bytes]) -> Tuple[dict, List[dict]]:
+    """Split a session hash into its header and its Steps in journal order."""
+    header = {}
+    steps = []
+    for key, value in mapping.items():
+        name = key.decode()
+        if name.startswith("step:"):
+            steps.append((int(name[5:]), orjson.loads(value)))
+        elif name == "state":
+            header[name] = value
+        else:
+            header[name] = orjson.loads(value)
+    steps.sort(key=lambda item: item[0])
+    return header, [step for _, step in steps]
+
+
+def compact_session(mapping: Dict[bytes, bytes]) -> Dict[bytes, bytes]:
+    """Fold a session hash's Steps into a ``state`` field (see ``SessionRecord.dump_state``)."""
+    record = SessionRecord.restore(*decode_session(mapping))
+    fields = encode_header(record)
+    fields["state"] = record.dump_state()
+    return {name.encode(): value for name, value in fields.items()}
+
+
+class RedisSessionStore:
+    """Shared session state in Redis hashes, owned through per-session leases.
+
+    Each session is the hash ``<prefix>:<session_id>`` (header fields plus one
+    ``step:<n>`` field per recorded Step, so a flush only writes what changed) and
+    the lease ``<prefix>-lease:<session_id>`` holds the owning replica's address
+    for ``lease_ms``. The owner renews its leases while it holds the session;
+    other replicas forward to the owner or take the session over once the lease
+    lapses. Methods are blocking and meant to run off the event loop.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        owner: str,
+        lease_ms: int = 10_000,
+        prefix: str = "primerl:session",
+    ):
+        self.redis = client
+        self.owner = owner
+        self.lease_ms = lease_ms
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, owner: str, **kwargs) -> "RedisSessionStore":
+        return cls(redis.Redis.from_url(url), owner, **kwargs)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}:{session_id}"
+
+    def _lease(self, session_id: str) -> str:
+        return f"{self.prefix}-lease:{session_id}"
+
+    def write(
+        self,
+        updates: Iterable[Tuple[str, dict]],
+        ended: Iterable[str] = (),
+        renew: Iterable[str] = (),
+    ) -> List[str]:
+        """Apply flushed updates, delete ended sessions and renew leases.
+
+        ``updates`` are ``(session_id, fields)`` pairs. The lease check and the
+        writes run in one WATCH/MULTI transaction, so nothing is written for a
+        session whose lease another replica holds. Returns the sessions among
+        ``updates`` and ``renew`` whose lease now belongs to another replica.
+        """
+        updates = list(updates)
+        ended = list(ended)
+        held = list(dict.fromkeys([session_id for session_id, _ in updates] + list(renew)))
+        leases = [self._lease(session_id) for session_id in held + ended]
+        if not leases:
+            return []
+
+        def apply(pipe) -> List[str]:
+            owners = pipe.mget(leases)
+            foreign = {
+                session_id
+                for session_id, owner in zip(held + ended, owners)
+                if owner is not None and owner.decode() != self.owner
+            }
+            pipe.multi()
+            for session_id, fields in updates:
+                if session_id not in foreign:
+                    pipe.hset(self._key(session_id), mapping=fields)
+            for session_id in held:
+                if session_id not in foreign:
+                    pipe.set(self._lease(session_id), self.owner, px=self.lease_ms)
+            for session_id in ended:
+                if session_id not in foreign:
+                    pipe.delete(self._key(session_id), self._lease(session_id))
+            return [session_id for session_id in held if session_id in foreign]
+
+        return self.redis.transaction(apply, *leases, value_from_callable=True)
+
+    def acquire(self, session_id: str) -> Optional[Dict[bytes, bytes]]:
+        """Lease ``session_id`` to this replica and return its hash (None if unknown).
+
+        The lease is compared and set in one WATCH/MULTI transaction. Raises
+        ``SessionLeased`` when another replica holds a live lease.
+        """
+        lease = self._lease(session_id)
+
+        def claim(pipe) -> Optional[Dict[bytes, bytes]]:
+            owner = pipe.get(lease)
+            if owner is not None and owner.decode() != self.owner:
+                raise SessionLeased(session_id, owner.decode())
+            mapping = pipe.hgetall(self._key(session_id))
+            pipe.multi()
+            if mapping:
+                pipe.set(lease, self.owner, px=self.lease_ms)
+            elif owner is not None:
+                pipe.delete(lease)
+            return mapping or None
+
+        return self.redis.transaction(claim, lease, self._key(session_id), value_from_callable=True)
+
+    def close(self) -> None:
+        self.redis.close()
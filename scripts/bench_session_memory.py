@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Compare session memory, GC and trace-export cost: dict-of-lists vs. SessionRecord."""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from rl_client.session_manager import SessionManager  # noqa: E402
+
+
+def _step(step: int, tokens_per_step: int):
+    tokens = [f" tok{step}-{idx}" for idx in range(tokens_per_step)]
+    ids = [step * tokens_per_step + idx for idx in range(tokens_per_step)]
+    logprobs = [-0.25] * tokens_per_step
+    mask = [idx % 7 != 0 for idx in range(tokens_per_step)]
+    return tokens, mask, ids, logprobs
+
+
+def build_lists(sessions: int, steps: int, tokens_per_step: int) -> dict:
+    """The previous layout: one dict per session holding per-token Python lists."""
+    store = {}
+    for sid in range(sessions):
+        entry = store[str(sid)] = {
+            "tokens": [],
+            "accepted_mask": [],
+            "token_ids": [],
+            "logprobs": [],
+            "tools": [],
+            "meta": {},
+        }
+        for step in range(steps):
+            tokens, mask, ids, logprobs = _step(step, tokens_per_step)
+            entry["tokens"].extend(tokens)
+            entry["accepted_mask"].extend(mask)
+            entry["token_ids"].extend(ids)
+            entry["logprobs"].extend(logprobs)
+    return store
+
+
+def build_records(sessions: int, steps: int, tokens_per_step: int) -> SessionManager:
+    manager = SessionManager()
+    for _ in range(sessions):
+        session_id = manager.start("bench", "m")
+        for step in range(steps):
+            tokens, mask, ids, logprobs = _step(step, tokens_per_step)
+            manager.record_tokens(session_id, tokens, mask, token_ids=ids, logprobs=logprobs)
+    return manager
+
+
+def measure(build, *args) -> tuple[object, int, float]:
+    """Build the store under tracemalloc; returns (store, bytes retained, full GC seconds)."""
+    gc.collect()
+    tracemalloc.start()
+    store = build(*args)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    gc.collect()
+    return store, retained, time.perf_counter() - start
+
+
+def export_lists(store: dict) -> float:
+    start = time.perf_counter()
+    for entry in store.values():
+        {key: list(entry[key]) for key in ("tokens", "accepted_mask", "token_ids", "logprobs")}
+    return time.perf_counter() - start
+
+
+def export_records(manager: SessionManager) -> float:
+    start = time.perf_counter()
+    for session_id in manager.sessions:
+        manager.trace(session_id)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=16)
+    parser.add_argument("--tokens-per-step", type=int, default=64)
+    args = parser.parse_args()
+    dims = (args.sessions, args.steps, args.tokens_per_step)
+    n = args.sessions * args.steps * args.tokens_per_step
+
+    lists, lists_bytes, lists_gc = measure(build_lists, *dims)
+    lists_export = export_lists(lists)
+    del lists
+    records, records_bytes, records_gc = measure(build_records, *dims)
+    records_export = export_records(records)
+
+    print(f"sessions={args.sessions} tokens={n}")
+    print(
+        f"dict of lists:  {lists_bytes / n:6.1f} B/token  gc {lists_gc * 1e3:7.1f} ms"
+        f"  trace {lists_export * 1e3:7.1f} ms"
+    )
+    print(
+        f"SessionRecord:  {records_bytes / n:6.1f} B/token  gc {records_gc * 1e3:7.1f} ms"
+        f"  trace {records_export * 1e3:7.1f} ms"
+    )
+    print(f"memory ratio:   {lists_bytes / records_bytes:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Measure SessionLog crash-recovery time against session count (log replay vs. snapshot)."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from rl_client.session_log import SessionLog  # noqa: E402
+from rl_client.session_manager import SessionManager  # noqa: E402
+from server.session_sync import SessionStoreSync  # noqa: E402
+
+
+async def write_log(directory: str, sessions: int, steps: int, tokens_per_step: int) -> int:
+    """Run ``sessions`` episodes through the write-back journal; returns bytes logged."""
+    manager = SessionManager(journal=True)
+    # One unbounded segment: no background compaction, so "replay" times the raw log alone.
+    log = SessionLog(directory, segment_bytes=sys.maxsize)
+    sync = SessionStoreSync(manager, log)
+    ids = []
+    for idx in range(sessions):
+        session_id = manager.start("bench", "m", node_id="node-a", prompt=f"prompt {idx}")
+        manager.bind_engine(session_id, f"eng-{idx}")
+        ids.append(session_id)
+    await sync.flush()
+    tokens = [f" tok{idx}" for idx in range(tokens_per_step)]
+    mask = [True] * tokens_per_step
+    token_ids = list(range(tokens_per_step))
+    for step in range(steps):
+        for session_id in ids:
+            manager.record_tokens(session_id, tokens, mask, obs=f" obs{step}", token_ids=token_ids)
+        await sync.flush()
+    await sync.stop()
+    return sum(path.stat().st_size for path in Path(directory).iterdir())
+
+
+def recover(directory: str) -> tuple[float, int]:
+    start = time.perf_counter()
+    manager = SessionManager(journal=True)
+    recovered = SessionStoreSync(manager, SessionLog(directory)).recover()
+    return time.perf_counter() - start, recovered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    parser.add_argument("--steps", type=int, default=8)
+    parser.add_argument("--tokens-per-step", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"steps/session={args.steps} tokens/step={args.tokens_per_step}")
+    print(f"{'sessions':>9} {'log MB':>8} {'replay ms':>10} {'snapshot ms':>12} {'us/session':>11}")
+    for sessions in args.sessions:
+        with tempfile.TemporaryDirectory() as directory:
+            size = asyncio.run(write_log(directory, sessions, args.steps, args.tokens_per_step))
+            replay_s, recovered = recover(directory)
+            assert recovered == sessions
+            log = SessionLog(directory)
+            log.snapshot()
+            log.close()
+            snapshot_s, _ = recover(directory)
+        print(
+            f"{sessions:9d} {size / 2**20:8.1f} {replay_s * 1e3:10.1f} {snapshot_s * 1e3:12.1f}"
+            f" {snapshot_s / sessions * 1e6:11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
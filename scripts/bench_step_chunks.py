@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Microbenchmark StepResp wire cost: one message per token vs. chunked token arrays."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "api"))
+
+from api import primerl_pb2  # noqa: E402
+from rl_client.grpc_client import StepArrays  # noqa: E402
+
+
+def per_token(n: int) -> tuple[float, int]:
+    """Serialize and parse one StepResp per token, then collect the fields client-side."""
+    start = time.perf_counter()
+    wire = 0
+    tokens, t_us, accepted = [], [], []
+    for idx in range(n):
+        payload = primerl_pb2.StepResp(
+            session_id="bench", token=f"tok-{idx}", t_us=idx, kv_bytes=idx * 1024, accepted=True
+        ).SerializeToString()
+        wire += len(payload)
+        resp = primerl_pb2.StepResp.FromString(payload)
+        tokens.append(resp.token)
+        t_us.append(resp.t_us)
+        accepted.append(resp.accepted)
+    return time.perf_counter() - start, wire
+
+
+def chunked(n: int, chunk: int) -> tuple[float, int]:
+    """Serialize and parse chunked StepResps and decode them into arrays."""
+    start = time.perf_counter()
+    wire = 0
+    chunks = []
+    for base in range(0, n, chunk):
+        ids = range(base, min(base + chunk, n))
+        payload = primerl_pb2.StepResp(
+            session_id="bench",
+            kv_bytes=ids[-1] * 1024,
+            token_ids=ids,
+            token_texts=[f"tok-{idx}" for idx in ids],
+            token_t_us=ids,
+            token_accepted=[True] * len(ids),
+            token_boundary=[False] * len(ids),
+        ).SerializeToString()
+        wire += len(payload)
+        chunks.append(primerl_pb2.StepResp.FromString(payload))
+    StepArrays.from_chunks(chunks)
+    return time.perf_counter() - start, wire
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=100_000)
+    parser.add_argument("--chunk", type=int, default=64, help="tokens per chunked StepResp")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    before, before_bytes = min(per_token(args.tokens) for _ in range(args.repeats))
+    after, after_bytes = min(chunked(args.tokens, args.chunk) for _ in range(args.repeats))
+    n = args.tokens
+    print(f"tokens={n} chunk={args.chunk}")
+    print(f"per-token messages: {before / n * 1e9:8.0f} ns/token {before_bytes / n:6.1f} B/token")
+    print(f"chunked messages:   {after / n * 1e9:8.0f} ns/token {after_bytes / n:6.1f} B/token")
+    print(f"speedup:            {before / after:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
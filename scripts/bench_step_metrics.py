@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Microbenchmark the per-token metrics/session bookkeeping done by Step."""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from perf import exporters
+from rl_client.session_manager import SessionManager
+
+
+def per_token(manager: SessionManager, session_id: str, model: str, n: int) -> float:
+    """Previous Step hot path: session touch plus three label lookups per token."""
+    start = time.perf_counter()
+    for idx in range(n):
+        kv_bytes = idx * 1024
+        manager.touch(session_id, kv_bytes=kv_bytes)
+        exporters.tokens.labels(phase="decode", model=model).inc()
+        exporters.latency.labels(route="Step", model=model).observe(0.005)
+        exporters.kv_bytes.labels(model=model).set(kv_bytes)
+    return time.perf_counter() - start
+
+
+def batched(manager: SessionManager, session_id: str, model: str, n: int, step_len: int) -> float:
+    """Current hot path: StepMetrics accumulation, one flush and touch per Step."""
+    start = time.perf_counter()
+    for _ in range(0, n, step_len):
+        metrics = exporters.StepMetrics(model)
+        for idx in range(step_len):
+            metrics.token(idx * 1024)
+        metrics.flush()
+        manager.touch(session_id, kv_bytes=metrics.kv_bytes)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=200_000)
+    parser.add_argument("--step-len", type=int, default=64, help="tokens per Step")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    manager = SessionManager()
+    session_id = manager.start("bench", "bench-model")
+    n = args.tokens - args.tokens % args.step_len
+
+    before = min(per_token(manager, session_id, "bench-model", n) for _ in range(args.repeats))
+    after = min(
+        batched(manager, session_id, "bench-model", n, args.step_len) for _ in range(args.repeats)
+    )
+    print(f"tokens={n} step_len={args.step_len}")
+    print(f"per-token path: {before / n * 1e9:8.0f} ns/token")
+    print(f"batched path:   {after / n * 1e9:8.0f} ns/token")
+    print(f"speedup:        {before / after:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
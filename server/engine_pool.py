@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+NODE_DEFAULTS = {
+    "engine": "dummy",
+    "base_url": None,
+    "models": [],
+    "free_hbm": 80 * 1024**3,
+    "link_bw": 900.0,
+    "queue_penalty": 0.1,
+}
+
+
+def load_topology(path: str) -> List[dict]:
+    """Load serving nodes from a YAML topology file.
+
+    Expected layout::
+
+        nodes:
+          - id: node-a
+            engine: vllm
+            base_url: http://node-a:8000
+            models: [llama3-8b]
+    """
+    data = yaml.safe_load(Path(path).read_text()) or {}
+    nodes = []
+    for raw in data.get("nodes", []):
+        if "id" not in raw:
+            raise ValueError(f"Topology node without id in {path}: {raw}")
+        nodes.append({**NODE_DEFAULTS, **raw})
+    if not nodes:
+        raise ValueError(f"Topology file {path} defines no nodes")
+    return nodes
+
+
+class EnginePool:
+    """Engine adapters keyed by node_id; unknown nodes resolve to the default node."""
+
+    def __init__(self, engines: Dict[str, Any], default: Optional[str] = None):
+        if not engines:
+            raise ValueError("EnginePool needs at least one engine")
+        self.engines = dict(engines)
+        self.default = default or next(iter(self.engines))
+
+    def resolve(self, node_id: Optional[str]) -> str:
+        return node_id if node_id in self.engines else self.default
+
+    def get(self, node_id: Optional[str]) -> Any:
+        return self.engines[self.resolve(node_id)]
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return iter(self.engines.items())
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self.engines
+
+    def __len__(self) -> int:
+        return len(self.engines)
@@ -3,6 +3,7 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+import socket
 
 import grpc
 from prometheus_client import start_http_server
@@ -13,8 +14,13 @@ from engines import DummyAdapter, SGLangAdapter, TRTLLMAdapter, VLLMAdapter
 from placement.kv_budget import kv_bytes
 from placement.scheduler import Scheduler
 from prime_stack.control_plane import CacheIndex, ModelRecord, NodeRecord, Registry, Router
+from rl_client.session_log import SessionLog
 from rl_client.session_manager import SessionManager
+from rl_client.session_store import RedisSessionStore
+from server.engine_pool import NODE_DEFAULTS, EnginePool, load_topology
+from server.peers import PeerForwarder
 from server.service import PrimeRLService
+from server.workers import peer_address, run_workers
 
 logging.basicConfig(level=logging.INFO)
 
@@ -35,28 +41,51 @@ def build_engine(engine_type: str, base_url: str | None):
     return DummyAdapter()
 
 
-async def serve():
+async def serve(worker: int = 0, workers: int = 1):
+    """Run one PrimeRL server process; with ``workers > 1`` it is worker ``worker`` of a pool."""
     engine_type = os.getenv("PRIMERL_ENGINE", "dummy").lower()
     base_url = os.getenv("PRIMERL_ENGINE_BASE_URL")
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     listen_port = int(os.getenv("PRIMERL_PORT", "50051"))
     metrics_port = int(os.getenv("PRIMERL_METRICS_PORT", "9300"))
     node_id = os.getenv("PRIMERL_NODE_ID", "node-local")
-
-    engine = build_engine(engine_type, base_url)
-    prefix_cache = GlobalPrefixCache(redis_url)
+    topology_path = os.getenv("PRIMERL_TOPOLOGY")
+
+    if topology_path:
+        nodes = load_topology(topology_path)
+    else:
+        nodes = [
+            {
+                **NODE_DEFAULTS,
+                "id": node_id,
+                "engine": engine_type,
+                "base_url": base_url,
+                "models": ["llama3-8b"],
+            }
+        ]
+    engines = EnginePool(
+        {node["id"]: build_engine(node["engine"].lower(), node["base_url"]) for node in nodes}
+    )
+    prefix_cache = GlobalPrefixCache(
+        redis_url,
+        l1_size=int(os.getenv("PRIMERL_PREFIX_L1_SIZE", "8192")),
+        l1_ttl_s=float(os.getenv("PRIMERL_PREFIX_L1_TTL_MS", "5000")) / 1000,
+        hit_flush_s=float(os.getenv("PRIMERL_PREFIX_HIT_FLUSH_MS", "1000")) / 1000,
+    )
+    prefix_cache.start()
     cache_index = CacheIndex()
     registry = Registry()
     scheduler = Scheduler()
-    registry.register_node(
-        NodeRecord(
-            id=node_id,
-            models=["llama3-8b"],
-            free_hbm=80 * 1024**3,
-            link_bw=900.0,
-            queue_penalty=0.1,
+    for node in nodes:
+        registry.register_node(
+            NodeRecord(
+                id=node["id"],
+                models=list(node["models"]),
+                free_hbm=int(node["free_hbm"]),
+                link_bw=float(node["link_bw"]),
+                queue_penalty=float(node["queue_penalty"]),
+            )
         )
-    )
     registry.register_model(
         ModelRecord(
             name="llama3-8b",
@@ -70,24 +99,62 @@ async def serve():
     def kv_estimator(seq_len: int, batch: int) -> int:
         return kv_bytes(seq_len=seq_len, layers=40, heads=40, head_dim=128, batch=batch)
 
-    session_manager = SessionManager()
+    peers = None
+    if workers > 1:
+        peer_port_base = int(os.getenv("PRIMERL_PEER_PORT_BASE", str(listen_port + 1)))
+        peers = PeerForwarder(worker, workers, peer_port_base)
+    session_store = None
+    store_kind = os.getenv("PRIMERL_SESSION_STORE", "memory").lower()
+    if store_kind == "wal":
+        wal_dir = os.getenv("PRIMERL_SESSION_WAL_DIR", "primerl-sessions")
+        if workers > 1:
+            # Workers own disjoint sessions, so each keeps its own log.
+            wal_dir = os.path.join(wal_dir, f"worker-{worker}")
+        session_store = SessionLog(
+            wal_dir,
+            segment_bytes=int(os.getenv("PRIMERL_SESSION_WAL_SEGMENT_MB", "64")) << 20,
+            fsync=os.getenv("PRIMERL_SESSION_WAL_FSYNC", "0") == "1",
+        )
+    elif store_kind == "redis":
+        # Other replicas forward to this address while this process holds a session's lease.
+        advertise = os.getenv("PRIMERL_ADVERTISE_ADDR", f"{socket.gethostname()}:{listen_port}")
+        session_store = RedisSessionStore.from_url(
+            os.getenv("PRIMERL_SESSION_REDIS_URL", redis_url),
+            owner=advertise,
+            lease_ms=int(os.getenv("PRIMERL_SESSION_LEASE_MS", "10000")),
+        )
+    session_manager = SessionManager(
+        new_id=peers.new_session_id if peers else None, journal=session_store is not None
+    )
     service = PrimeRLService(
-        engine,
+        engines,
         prefix_cache,
         session_manager,
         cache_index=cache_index,
-        node_id=node_id,
+        node_id=engines.default,
         router=router,
         kv_estimator=kv_estimator,
+        peers=peers,
+        session_store=session_store,
     )
 
-    server = grpc.aio.server()
+    # Workers share the public port; the kernel spreads connections across them.
+    server = grpc.aio.server(options=[("grpc.so_reuseport", 1)] if peers else None)
     primerl_pb2_grpc.add_PrimeRLServicer_to_server(service, server)
     server.add_insecure_port(f"[::]:{listen_port}")
-
-    logging.info("PrimeRL server starting on port %s (engine=%s)", listen_port, engine_type)
-    start_http_server(metrics_port)
-    logging.info("Metrics exporter listening on %s", metrics_port)
+    if peers:
+        server.add_insecure_port(peer_address(worker, peers.peer_port_base))
+
+    logging.info(
+        "PrimeRL server starting on port %s (worker %d/%d, nodes=%s)",
+        listen_port,
+        worker + 1,
+        workers,
+        ", ".join(f"{node['id']}:{node['engine']}" for node in nodes),
+    )
+    if workers == 1:
+        start_http_server(metrics_port)
+        logging.info("Metrics exporter listening on %s", metrics_port)
 
     await server.start()
     try:
@@ -96,10 +163,22 @@ async def serve():
         logging.info("PrimeRL server cancelled")
     finally:
         await service.shutdown()
+        await asyncio.to_thread(prefix_cache.close)
         await server.stop(grace=None)
 
 
+def run_worker(worker: int, workers: int):
+    try:
+        asyncio.run(serve(worker, workers))
+    except KeyboardInterrupt:  # pragma: no cover
+        logging.info("PrimeRL worker %d interrupted", worker)
+
+
 def main():
+    workers = int(os.getenv("PRIMERL_WORKERS", "1"))
+    if workers > 1:
+        run_workers(run_worker, workers, int(os.getenv("PRIMERL_METRICS_PORT", "9300")))
+        return
     try:
         asyncio.run(serve())
     except KeyboardInterrupt:  # pragma: no cover
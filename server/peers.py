@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import grpc
+
+from api import primerl_pb2_grpc
+from server.workers import owned_session_id, peer_address, session_owner
+
+# Caller identity forwarded with a request so admission on the owner sees the
+# original client rather than the forwarding worker.
+FORWARDED_METADATA = ("x-primerl-tenant", "x-primerl-client")
+
+
+class PeerForwarder:
+    """Routes session RPCs to the worker that owns the session.
+
+    Session ids hash to a worker index (``server.workers.session_owner``); a
+    worker that receives an RPC for another worker's session forwards it over
+    that worker's loopback port. Owners given as an address string (another
+    replica holding the session's store lease) are dialled directly.
+    """
+
+    def __init__(self, worker: int, workers: int, peer_port_base: int):
+        self.worker = worker
+        self.workers = workers
+        self.peer_port_base = peer_port_base
+        self._channels: dict[int | str, grpc.aio.Channel] = {}
+        self._stubs: dict[int | str, primerl_pb2_grpc.PrimeRLStub] = {}
+
+    def new_session_id(self) -> str:
+        return owned_session_id(self.worker, self.workers)
+
+    def owner(self, session_id: str) -> Optional[int]:
+        """Owning worker for ``session_id``, or None when this worker owns it."""
+        owner = session_owner(session_id, self.workers)
+        return None if owner == self.worker else owner
+
+    def stub(self, owner: int | str) -> primerl_pb2_grpc.PrimeRLStub:
+        stub = self._stubs.get(owner)
+        if stub is None:
+            address = owner if isinstance(owner, str) else peer_address(owner, self.peer_port_base)
+            channel = grpc.aio.insecure_channel(address)
+            self._channels[owner] = channel
+            stub = self._stubs[owner] = primerl_pb2_grpc.PrimeRLStub(channel)
+        return stub
+
+    @staticmethod
+    def metadata(context: grpc.aio.ServicerContext) -> tuple:
+        incoming = dict(context.invocation_metadata() or ())
+        client = incoming.get("x-primerl-client") or context.peer()
+        forwarded = {key: incoming[key] for key in FORWARDED_METADATA if key in incoming}
+        forwarded["x-primerl-client"] = client
+        return tuple(forwarded.items())
+
+    async def close(self):
+        for channel in self._channels.values():
+            await channel.close()
+        self._channels.clear()
+        self._stubs.clear()
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from cache.eviction import eviction_cost
+from perf import exporters
+from rl_client.session_manager import SessionManager, SessionRecord
+
+logger = logging.getLogger(__name__)
+
+
+class SessionReaper:
+    """Background task that closes sessions abandoned without ``EndEpisode``.
+
+    Every ``interval_s`` it evicts sessions idle for longer than ``idle_ttl_s``
+    and, while the manager holds more than ``max_sessions`` sessions or
+    ``max_kv_bytes`` of KV (0 disables either budget), the idle sessions with the
+    highest ``eviction_cost`` (large KV, few Steps per second of life, long idle).
+    Sessions with an RPC in flight (``SessionManager.in_use``) are never evicted.
+    A victim is removed from the manager before ``close(session_id, session)``
+    releases its engine session, so a Step arriving during the close gets
+    NOT_FOUND instead of a session that ends under it.
+    """
+
+    def __init__(
+        self,
+        session_manager: SessionManager,
+        close: Callable[[str, SessionRecord], Awaitable[None]],
+        idle_ttl_s: float = 1800.0,
+        max_sessions: int = 0,
+        max_kv_bytes: int = 0,
+        interval_s: float = 10.0,
+    ):
+        self.session_manager = session_manager
+        self.close = close
+        self.idle_ttl_s = idle_ttl_s
+        self.max_sessions = max_sessions
+        self.max_kv_bytes = max_kv_bytes
+        self.interval_s = interval_s
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def select(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """``(session_id, reason)`` for every session to evict now; updates resident gauges."""
+        now = time.time() if now is None else now
+        sessions = self.session_manager.sessions
+        resident = len(sessions)
+        kv_total = sum(record.kv_bytes for record in sessions.values())
+        exporters.sessions_resident.set(resident)
+        exporters.session_kv_resident.set(kv_total)
+
+        victims: List[Tuple[str, str]] = []
+        candidates = []
+        for session_id, record in sessions.items():
+            if record.active:
+                continue
+            idle = now - record.last_t
+            if self.idle_ttl_s and idle >= self.idle_ttl_s:
+                victims.append((session_id, "idle"))
+                resident -= 1
+                kv_total -= record.kv_bytes
+                continue
+            age = max(now - record.started_t, 1.0)
+            cost = eviction_cost(hbm_bytes=record.kv_bytes, hit_rate=record.steps / age, age_s=idle)
+            candidates.append((cost, session_id, record.kv_bytes))
+
+        candidates.sort(reverse=True)
+        for _, session_id, kv in candidates:
+            if self.max_sessions and resident > self.max_sessions:
+                reason = "sessions"
+            elif self.max_kv_bytes and kv_total > self.max_kv_bytes:
+                reason = "kv"
+            else:
+                break
+            victims.append((session_id, reason))
+            resident -= 1
+            kv_total -= kv
+        return victims
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Evict the sessions picked by ``select``; returns how many were closed."""
+        evicted = 0
+        for session_id, reason in self.select(now):
+            session = self.session_manager.get(session_id)
+            # A Step may have picked the session up while an earlier close awaited.
+            if session is None or session.active:
+                continue
+            self.session_manager.end(session_id)
+            try:
+                await self.close(session_id, session)
+            except Exception:  # noqa: BLE001
+                logger.exception("Failed to reap session %s", session_id)
+                continue
+            evicted += 1
+            exporters.child(exporters.session_evictions, reason).inc()
+            logger.info("Reaped session %s (%s)", session_id, reason)
+        if evicted:
+            exporters.sessions_resident.set(len(self.session_manager.sessions))
+        return evicted
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await self.sweep()
+            except Exception:  # noqa: BLE001
+                logger.exception("Session reaper sweep failed")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
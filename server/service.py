@@ -3,29 +3,116 @@ from __future__ import annotations
 import asyncio
 import contextlib
 import logging
+import math
 import os
+import time
 from typing import AsyncIterator, List
 
 import httpx
+import orjson
 from opentelemetry import trace
 
 import grpc
 
 from api import primerl_pb2, primerl_pb2_grpc
 from cache.global_prefix_cache import GlobalPrefixCache
-from cache.prefix_fingerprint import normalize, rolling_hash
+from cache.prefix_fingerprint import BLOCK_TOKENS, block_hashes, normalize
 from perf import exporters
 from prime_stack.adapters import build_trace
 from prime_stack.control_plane.router import RoutingRequest
-from rl_client.batcher import Batcher
-from rl_client.session_manager import SessionManager
+from rl_client.admission import AdmissionController, AdmissionRejected
+from rl_client.batcher import Batcher, DeadlineExceeded
+from rl_client.session_log import SessionLog
+from rl_client.session_manager import SessionManager, SessionRecord
+from rl_client.session_store import RedisSessionStore, SessionLeased
+from server.engine_pool import EnginePool
+from server.peers import PeerForwarder
+from server.reaper import SessionReaper
+from server.session_sync import SessionStoreSync
+from server.verification import VerificationQueue
 from speculation.tool_boundary_spec import ToolBoundarySpec
 
 logger = logging.getLogger(__name__)
 
+# Per-env_id scheduling defaults for Step; override with PRIMERL_ENV_SLO (JSON object
+# mapping env_id to {"priority": ..., "deadline_ms": ...}).
+DEFAULT_ENV_SLO = {
+    "grpo": {"priority": "bulk"},
+    "eval": {"priority": "interactive"},
+}
+
+# Responses buffered per Step stream before decode workers block on the client.
+STEP_RESPONSE_BUFFER = 256
+_STEP_DONE = object()
+
+
+def _peer_host(peer: str) -> str:
+    """``context.peer()`` without the ephemeral port, so connections share a client key."""
+    if peer.startswith(("ipv4:", "ipv6:")):
+        return peer.rpartition(":")[0]
+    return peer
+
+
+async def _with_flush_ticks(items: AsyncIterator, flush_at) -> AsyncIterator:
+    """Yield from ``items``, plus ``None`` whenever ``flush_at()`` passes first.
+
+    ``flush_at`` returns a monotonic deadline, or ``None`` while nothing waits to be
+    flushed; only then is the next item awaited directly instead of as a task.
+    ``items`` is closed with the wrapper.
+    """
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            deadline = flush_at()
+            if deadline is None and pending is None:
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    return
+                yield item
+                continue
+            if pending is None:
+                pending = asyncio.ensure_future(items.__anext__())
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield None
+                continue
+            next_item, pending = pending, None
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait({pending})
+        await items.aclose()
+
+
+class StepFailed(Exception):
+    """A StepReq failed; Step reports it on that request's responses, other RPCs abort."""
+
+    def __init__(self, code: grpc.StatusCode, details: str, retry_after_ms: int = 0):
+        super().__init__(details)
+        self.code = code
+        self.details = details
+        self.retry_after_ms = retry_after_ms
+
+    async def abort(self, context: grpc.aio.ServicerContext) -> None:
+        if self.retry_after_ms:
+            context.set_trailing_metadata((("retry-after-ms", str(self.retry_after_ms)),))
+        await context.abort(self.code, self.details)
+
 
 class PrimeRLService(primerl_pb2_grpc.PrimeRLServicer):
-    """PrimeRL gRPC service bridging trainers to model engines."""
+    """PrimeRL gRPC service bridging trainers to model engines.
+
+    ``engine`` is a single adapter or an ``EnginePool`` keyed by node_id. Each node
+    gets its own Batcher; sessions are pinned to the node the Router picks at
+    StartEpisode and every later prefill, decode and close goes to that node.
+    """
 
     def __init__(
         self,
@@ -36,246 +123,1029 @@ class PrimeRLService(primerl_pb2_grpc.PrimeRLServicer):
         node_id: str | None = None,
         router=None,
         kv_estimator=None,
+        admission: AdmissionController | None = None,
+        peers: PeerForwarder | None = None,
+        session_store: RedisSessionStore | SessionLog | None = None,
     ):
-        self.engine = engine
+        self.node_id = node_id or os.getenv("PRIMERL_NODE_ID", "node-local")
+        self.engines = engine if isinstance(engine, EnginePool) else EnginePool({self.node_id: engine})
+        self.engine = self.engines.get(None)
         self.prefix_cache = prefix_cache
         self.session_manager = session_manager
         self.cache_index = cache_index
-        self.batcher = Batcher(engine)
-        self._batcher_task = asyncio.create_task(self.batcher.run())
-        self.node_id = node_id or os.getenv("PRIMERL_NODE_ID", "node-local")
-        self.speculator = ToolBoundarySpec(engine, engine, boundary_token="[TOOL_END]")
+        late_policy = os.getenv("PRIMERL_LATE_POLICY", "demote")
+        self.batchers = {
+            node: Batcher(adapter, late_policy=late_policy, node_id=node)
+            for node, adapter in self.engines.items()
+        }
+        self.speculators = {
+            node: ToolBoundarySpec(adapter, adapter, boundary_token="[TOOL_END]")
+            for node, adapter in self.engines.items()
+        }
+        self.env_slo = {**DEFAULT_ENV_SLO, **orjson.loads(os.getenv("PRIMERL_ENV_SLO", "{}"))}
+        self.step_inflight = int(os.getenv("PRIMERL_STEP_INFLIGHT", "8"))
+        self.chunk_flush_s = float(os.getenv("PRIMERL_CHUNK_FLUSH_MS", "5")) / 1000
+        self.admission = admission or AdmissionController(
+            max_per_model=int(os.getenv("PRIMERL_MAX_QUEUE_PER_MODEL", "512")),
+            max_per_tenant=int(os.getenv("PRIMERL_MAX_QUEUE_PER_TENANT", "128")),
+            client_rate=float(os.getenv("PRIMERL_CLIENT_RATE", "0")),
+            client_burst=float(os.getenv("PRIMERL_CLIENT_BURST", "32")),
+            model_limits=orjson.loads(os.getenv("PRIMERL_MODEL_QUEUE_LIMITS", "{}")),
+            tenant_limits=orjson.loads(os.getenv("PRIMERL_TENANT_QUEUE_LIMITS", "{}")),
+        )
+        self._batcher_tasks = [asyncio.create_task(b.run()) for b in self.batchers.values()]
         self.verifier_url = os.getenv("PRIMERL_VERIFIER_URL")
         self.verifier_client = httpx.AsyncClient(timeout=30) if self.verifier_url else None
+        self.verification = (
+            VerificationQueue(self.verifier_client, self.verifier_url) if self.verifier_client else None
+        )
         self.router = router
         self.kv_estimator = kv_estimator
+        self.peers = peers
+        self.reaper = SessionReaper(
+            session_manager,
+            self._reap_session,
+            idle_ttl_s=float(os.getenv("PRIMERL_SESSION_IDLE_TTL_S", "1800")),
+            max_sessions=int(os.getenv("PRIMERL_MAX_SESSIONS", "0")),
+            max_kv_bytes=int(os.getenv("PRIMERL_MAX_SESSION_KV_BYTES", "0")),
+            interval_s=float(os.getenv("PRIMERL_REAP_INTERVAL_S", "10")),
+        )
+        self.reaper.start()
+        self.session_sync = None
+        if session_store is not None:
+            self.session_sync = SessionStoreSync(
+                session_manager,
+                session_store,
+                interval_s=float(os.getenv("PRIMERL_SESSION_FLUSH_MS", "50")) / 1000,
+            )
+            if isinstance(session_store, SessionLog):
+                started = time.monotonic()
+                recovered = self.session_sync.recover()
+                logger.info(
+                    "Recovered %d sessions from %s in %.1f ms",
+                    recovered,
+                    session_store.directory,
+                    (time.monotonic() - started) * 1000,
+                )
+            else:
+                # Sessions leased to other replicas are forwarded to their address.
+                self.peers = self.peers or PeerForwarder(0, 1, 0)
+            self.session_sync.start()
         self.tracer = trace.get_tracer("primerl.service")
 
     async def StartEpisode(
         self, request: primerl_pb2.StartReq, context: grpc.aio.ServicerContext
     ) -> primerl_pb2.StartResp:
+        started = time.monotonic()
         model = request.model or ""
-        prompt_text = request.prompt
-        prompt_fp = request.prompt_fp
-
         with self.tracer.start_as_current_span(
             "StartEpisode",
             attributes={"env_id": request.env_id, "model": request.model},
         ):
-            if not prompt_fp and prompt_text:
-                normalized = normalize(prompt_text)
-                prompt_fp = rolling_hash(normalized)
-
-            cache_hit = False
-            if prompt_fp:
-                meta = self.prefix_cache.get(prompt_fp)
-                cache_hit = meta is not None
+            (response,) = await self._open_sessions([request], context)
+            exporters.child(exporters.latency, "StartEpisode", model).observe(
+                time.monotonic() - started
+            )
+            return response
+
+    async def StartEpisodeBatch(
+        self, request: primerl_pb2.StartBatchReq, context: grpc.aio.ServicerContext
+    ) -> primerl_pb2.StartBatchResp:
+        started = time.monotonic()
+        models = {episode.model for episode in request.episodes}
+        label = models.pop() if len(models) == 1 else "mixed"
+        with self.tracer.start_as_current_span(
+            "StartEpisodeBatch", attributes={"episodes": len(request.episodes)}
+        ):
+            opened = await self._open_sessions(list(request.episodes), context)
+            exporters.child(exporters.latency, "StartEpisodeBatch", label).observe(
+                time.monotonic() - started
+            )
+            return primerl_pb2.StartBatchResp(sessions=opened)
+
+    async def _open_sessions(
+        self,
+        episodes: list[primerl_pb2.StartReq],
+        context: grpc.aio.ServicerContext,
+        batch: int = 1,
+    ) -> list[primerl_pb2.StartResp]:
+        """Route, create and (optionally) prefill sessions; returns their StartResps.
+
+        Prompts are fingerprinted as chained blocks (``block_hashes``) and the
+        longest cached prefix of every prompt in the batch is looked up in one
+        pipelined Redis call; a client-supplied ``prompt_fp`` only matches whole.
+        Episodes with the same model and prompt are routed together and prefilled
+        once; the copies fork the prefilled engine session when the engine supports
+        ``fork_session`` and otherwise prefill concurrently with the other prompts.
+        """
+        chains = []
+        prompt_words = []
+        for episode in episodes:
+            normalized = normalize(episode.prompt)
+            prompt_words.append(len(normalized.split()))
+            chains.append([episode.prompt_fp] if episode.prompt_fp else block_hashes(normalized))
+        matches = self.prefix_cache.longest_prefix_many(chains)
+
+        responses = []
+        groups: dict[tuple, list[int]] = {}
+        for idx, episode in enumerate(episodes):
+            model = episode.model or ""
+            chain, words = chains[idx], prompt_words[idx]
+            depth, _ = matches[idx]
+            cache_hit = bool(chain) and depth == len(chain)
+            hit_tokens = words if cache_hit else min(depth * BLOCK_TOKENS, words)
+            responses.append(
+                primerl_pb2.StartResp(cache_hit=cache_hit, cache_hit_tokens=hit_tokens)
+            )
+            if chain:
                 counter = exporters.cache_hit if cache_hit else exporters.cache_miss
                 counter.labels(model=model).inc()
+                exporters.cache_tokens.labels(model=model, result="hit").inc(hit_tokens)
+                exporters.cache_tokens.labels(model=model, result="miss").inc(words - hit_tokens)
+            prompt_fp = chain[-1] if chain else b""
+            groups.setdefault((model, episode.prompt, prompt_fp), []).append(idx)
 
-            session_id = self.session_manager.start(request.env_id, model)
-            meta_kwargs = {}
-            if prompt_fp:
-                meta_kwargs["prompt_fp"] = prompt_fp.hex()
-            if prompt_text:
-                meta_kwargs["prompt"] = prompt_text
-            if meta_kwargs:
-                self.session_manager.set_meta(session_id, **meta_kwargs)
-
-            if self.router and self.kv_estimator and prompt_text:
-                seq_len = len(prompt_text.split())
-                kv_est = self.kv_estimator(seq_len=seq_len, batch=1)
-                routing_req = self.router.route(
-                    RoutingRequest(
-                        prompt_fp=prompt_fp,
-                        kv_estimate=kv_est,
-                        slo_latency_ms=300,
-                        model=model,
+        session_ids: list[str] = [""] * len(episodes)
+        prefills = []
+        # Sessions stay busy until prefill finishes so the reaper cannot close them.
+        with contextlib.ExitStack() as opening:
+            for (model, prompt_text, prompt_fp), members in groups.items():
+                chain = chains[members[0]]
+                node_id = self._route(model, prompt_text, chain, batch * len(members))
+                for idx in members:
+                    session_id = self.session_manager.start(
+                        episodes[idx].env_id, model, node_id=node_id, prompt=prompt_text
+                    )
+                    opening.enter_context(self.session_manager.in_use(session_id))
+                    logger.info("Routing session %s to node %s", session_id, node_id)
+                    meta_kwargs = {}
+                    if prompt_fp:
+                        meta_kwargs["prompt_fp"] = prompt_fp.hex()
+                    if prompt_text:
+                        meta_kwargs["prompt"] = prompt_text
+                    if meta_kwargs:
+                        self.session_manager.set_meta(session_id, **meta_kwargs)
+                    session_ids[idx] = session_id
+                pinned = [session_ids[idx] for idx in members if episodes[idx].pin_prefill]
+                if pinned and prompt_text:
+                    prefills.append(
+                        self._prefill_sessions(node_id, model, prompt_text, chain, pinned)
                     )
+
+            results = await asyncio.gather(*prefills, return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logger.error("Prefill failed for %d of %d prompts", len(failures), len(prefills))
+            for session_id in session_ids:
+                session = self.session_manager.get(session_id)
+                if session is not None:
+                    await self._close_engine_session(session.node_id, session.engine_session_id)
+                self.session_manager.end(session_id)
+            await context.abort(grpc.StatusCode.INTERNAL, str(failures[0]))
+        if self.session_sync:
+            # New sessions (and their leases) reach the store before the client sees their ids.
+            await self.session_sync.flush()
+        for response, session_id in zip(responses, session_ids):
+            response.session_id = session_id
+        return responses
+
+    def _route(self, model: str, prompt_text: str, chain: list[bytes], batch: int) -> str:
+        """Node the Router picks for ``batch`` sequences of this prompt (default node otherwise)."""
+        node_id = self.engines.default
+        if self.router and self.kv_estimator and prompt_text:
+            seq_len = len(prompt_text.split())
+            kv_est = self.kv_estimator(seq_len=seq_len, batch=batch)
+            routed = self.router.route(
+                RoutingRequest(
+                    prompt_fp=chain[-1] if chain else None,
+                    kv_estimate=kv_est,
+                    slo_latency_ms=300,
+                    model=model,
+                    prefix_blocks=chain,
                 )
-                logger.info("Routing session %s to node %s", session_id, routing_req)
+            )
+            if routed in self.engines:
+                node_id = routed
+            elif routed is not None:
+                logger.warning("Router picked node %s with no engine; using %s", routed, node_id)
+        return node_id
 
-            engine_session_id = None
-            if request.pin_prefill and prompt_text:
-                try:
-                    response = await self.engine.prefill(model=model, prompt=prompt_text, grammar=None)
-                    engine_session_id = response.get("session_id")
-                    exporters.tokens.labels(phase="prefill", model=model).inc(
-                        response.get("tokens", 0)
-                    )
-                    if prompt_fp and self.cache_index and engine_session_id:
-                        self.cache_index.register(prompt_fp, self.node_id)
-                        self.prefix_cache.put(
-                            prompt_fp,
-                            meta={"model": model, "node_id": self.node_id, "tier": "hbm"},
-                        )
-                except Exception as exc:  # noqa: BLE001
-                    logger.exception("Prefill failed for session %s", session_id)
-                    await context.abort(grpc.StatusCode.INTERNAL, str(exc))
+    async def _prefill_sessions(
+        self, node_id: str, model: str, prompt_text: str, chain: list[bytes], session_ids: list[str]
+    ):
+        """Prefill ``prompt_text`` once on ``node_id`` and bind it to every session.
+
+        ``chain`` (the prompt's block fingerprints) is registered block by block,
+        so later prompts sharing a leading run of blocks find this node warm.
+        """
+        response = await self._prefill(node_id, model=model, prompt=prompt_text, grammar=None)
+        engine_session_id = response.get("session_id")
+        exporters.tokens.labels(phase="prefill", model=model).inc(response.get("tokens", 0))
+        if not engine_session_id:
+            return
+        if chain and self.cache_index:
+            self.cache_index.register_blocks(chain, node_id)
 
-            if engine_session_id:
-                self.session_manager.bind_engine(session_id, engine_session_id)
-                if prompt_fp:
-                    meta = {"engine_session_id": engine_session_id, "model": model}
-                    self.prefix_cache.put(prompt_fp, meta)
+        engine_session_ids = [engine_session_id]
+        copies = len(session_ids) - 1
+        engine = self.engines.get(node_id)
+        if copies and hasattr(engine, "fork_session"):
+            engine_session_ids += await engine.fork_session(engine_session_id, copies)
+        elif copies:
+            responses = await asyncio.gather(
+                *(
+                    self._prefill(node_id, model=model, prompt=prompt_text, grammar=None)
+                    for _ in range(copies)
+                )
+            )
+            for response in responses:
+                exporters.tokens.labels(phase="prefill", model=model).inc(response.get("tokens", 0))
+                engine_session_ids.append(response.get("session_id"))
+        for session_id, forked_id in zip(session_ids, engine_session_ids):
+            if forked_id:
+                self.session_manager.bind_engine(session_id, forked_id, node_id)
 
-            return primerl_pb2.StartResp(session_id=session_id, cache_hit=cache_hit)
+        if chain:
+            meta = {"engine_session_id": engine_session_id, "model": model}
+            self.prefix_cache.put_blocks(chain, meta, node_id=node_id, tier="hbm")
 
     async def Step(
         self, request_iterator: AsyncIterator[primerl_pb2.StepReq], context: grpc.aio.ServicerContext
     ) -> AsyncIterator[primerl_pb2.StepResp]:
-        async for request in request_iterator:
-            with self.tracer.start_as_current_span(
-                "Step",
-                attributes={
-                    "session_id": request.session_id,
-                    "speculative": request.speculative,
-                    "grammar_id": request.grammar_id,
-                },
-            ):
-                session = self.session_manager.get(request.session_id)
-                if session is None:
-                    await context.abort(grpc.StatusCode.NOT_FOUND, "unknown session")
+        """Serve every StepReq read from one stream concurrently.
+
+        Up to ``step_inflight`` requests decode at once; requests for the same
+        session keep their order. Responses are interleaved and carry the
+        session_id they belong to. A failed request ends with a response carrying
+        ``error``; the stream keeps serving the others.
+        """
+        responses: asyncio.Queue = asyncio.Queue(maxsize=STEP_RESPONSE_BUFFER)
+        slots = asyncio.Semaphore(self.step_inflight)
+        # Per-session order: a lock and the number of this stream's requests holding
+        # or waiting on it, so the lock is dropped with the session's last request.
+        session_locks: dict[str, tuple[asyncio.Lock, int]] = {}
+        workers: set[asyncio.Task] = set()
+
+        async def worker(request: primerl_pb2.StepReq):
+            session_id = request.session_id
+            lock, users = session_locks.get(session_id, (asyncio.Lock(), 0))
+            session_locks[session_id] = (lock, users + 1)
+            try:
+                async with lock:
+                    async with contextlib.aclosing(self._step_one(request, context)) as step:
+                        async for response in step:
+                            await responses.put(response)
+            except StepFailed as exc:
+                await responses.put(self._step_error(session_id, exc))
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Step failed for session %s", session_id)
+                failure = StepFailed(grpc.StatusCode.INTERNAL, str(exc) or type(exc).__name__)
+                await responses.put(self._step_error(session_id, failure))
+            finally:
+                slots.release()
+                lock, users = session_locks[session_id]
+                if users == 1:
+                    del session_locks[session_id]
+                else:
+                    session_locks[session_id] = (lock, users - 1)
+
+        async def reader():
+            try:
+                async for request in request_iterator:
+                    await slots.acquire()
+                    task = asyncio.create_task(worker(request))
+                    workers.add(task)
+                    task.add_done_callback(workers.discard)
+                if workers:
+                    await asyncio.wait(set(workers))
+            except Exception as exc:  # noqa: BLE001
+                await responses.put(exc)
+            await responses.put(_STEP_DONE)
+
+        reader_task = asyncio.create_task(reader())
+        try:
+            while True:
+                item = await responses.get()
+                if item is _STEP_DONE:
                     return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            reader_task.cancel()
+            for task in list(workers):
+                task.cancel()
+
+    async def _step_one(
+        self, request: primerl_pb2.StepReq, context: grpc.aio.ServicerContext
+    ) -> AsyncIterator[primerl_pb2.StepResp]:
+        with self.tracer.start_as_current_span(
+            "Step",
+            attributes={
+                "session_id": request.session_id,
+                "speculative": request.speculative,
+                "grammar_id": request.grammar_id,
+            },
+        ):
+            session, owner = await self._locate(request.session_id)
+            if owner is not None:
+                async for response in self._forward_step(owner, request, context):
+                    yield response
+                return
+            if session is None:
+                raise StepFailed(grpc.StatusCode.NOT_FOUND, "unknown session")
+
+            # In use from admission on, so an idle reaper sweep cannot close it mid-Step.
+            with self.session_manager.in_use(request.session_id):
+                model = session.model
+                tenant, _ = self._caller(session, context)
+                self._admit(session, request, context)
+
+                token_texts: List[str] = []
+                accepted_mask: List[bool] = []
+                token_ids: List[int | None] = []
+                logprobs: List[float | None] = []
+                chunk_size = max(request.chunk_tokens, 1)
+                chunk: List[tuple[dict, bool]] = []
+                chunk_started = 0.0
+                # Tokens handed to the client so far; only these reach the trace if the
+                # Step is cancelled or fails part-way.
+                delivered = 0
+                completed = False
+                started = time.monotonic()
+                metrics = exporters.StepMetrics(model)
+                queue_depth = exporters.child(exporters.queue_depth, model)
+                queue_depth.inc()
+
+                def flush_at() -> float | None:
+                    return chunk_started + self.chunk_flush_s if chunk else None
 
-                engine_session_id = session.get("engine_session_id") or request.session_id
-                model = session.get("model", "unknown")
-                prompt_text = session.get("meta", {}).get("prompt", "") + request.obs
-                exporters.queue_depth.labels(model=model).inc()
                 try:
-                    if request.speculative and request.grammar_id:
-                        try:
-                            tokens, accepted_mask = await self.speculator.generate(
-                                session_id=engine_session_id,
-                                obs=request.obs,
-                                max_new=request.max_new_tokens,
-                                grammar=request.grammar_id,
-                                prompt=prompt_text,
-                            )
-                        except Exception:  # noqa: BLE001
-                            logger.exception("Speculation failed; falling back to normal decode")
-                            tokens = await self.batcher.submit(
-                                session_id=engine_session_id,
-                                model=model,
+                    # aclosing() tears the decode down as soon as the client cancels,
+                    # which in turn aborts the engine stream inside the Batcher. The
+                    # flush ticks release a partial chunk on time while the engine stalls.
+                    decode = _with_flush_ticks(self._decode(session, request, model), flush_at)
+                    async with contextlib.aclosing(decode) as decoded:
+                        async for item in decoded:
+                            if item is None:
+                                delivered = len(token_texts)
+                                yield self._chunk_resp(request.session_id, chunk)
+                                chunk = []
+                                continue
+                            token, accepted = item
+                            kv_bytes = token.get("kv_bytes", 0)
+                            metrics.token(kv_bytes)
+                            token_texts.append(token.get("token", ""))
+                            accepted_mask.append(accepted)
+                            token_ids.append(token.get("token_id"))
+                            logprobs.append(token.get("logprob"))
+                            if chunk_size == 1:
+                                delivered = len(token_texts)
+                                yield primerl_pb2.StepResp(
+                                    session_id=request.session_id,
+                                    token=token.get("token", ""),
+                                    t_us=token.get("t_us", 0),
+                                    kv_bytes=kv_bytes,
+                                    boundary=token.get("boundary", False),
+                                    accepted=accepted,
+                                    token_id=token.get("token_id"),
+                                    logprob=token.get("logprob"),
+                                )
+                                continue
+                            # Chunks flush when full, at a boundary, for the first token (TTFT)
+                            # and once their oldest token has waited chunk_flush_s.
+                            now = time.monotonic()
+                            if not chunk:
+                                chunk_started = now
+                            chunk.append((token, accepted))
+                            if (
+                                len(chunk) >= chunk_size
+                                or token.get("boundary", False)
+                                or len(token_texts) == 1
+                                or now - chunk_started >= self.chunk_flush_s
+                            ):
+                                delivered = len(token_texts)
+                                yield self._chunk_resp(request.session_id, chunk)
+                                chunk = []
+                        if chunk:
+                            delivered = len(token_texts)
+                            yield self._chunk_resp(request.session_id, chunk)
+                        completed = True
+                except DeadlineExceeded as exc:
+                    raise StepFailed(grpc.StatusCode.DEADLINE_EXCEEDED, str(exc)) from exc
+                finally:
+                    queue_depth.dec()
+                    self.admission.release(model, tenant)
+                    metrics.flush()
+                    exporters.child(exporters.latency, "Step", model).observe(
+                        time.monotonic() - started
+                    )
+                    # One session update per Step rather than per token.
+                    if self.session_manager.get(request.session_id) is not None:
+                        kv_bytes = metrics.kv_bytes if token_texts else session.kv_bytes
+                        self.session_manager.touch(request.session_id, kv_bytes=kv_bytes)
+                        # A cancelled or failed Step still records what the client saw, so
+                        # the conversation replayed on the next turn matches it.
+                        if completed or delivered:
+                            self.session_manager.record_tokens(
+                                request.session_id,
+                                token_texts[:delivered],
+                                accepted_mask[:delivered],
                                 obs=request.obs,
-                                max_new=request.max_new_tokens,
-                                grammar=request.grammar_id or None,
-                                speculative=False,
-                                prompt=prompt_text,
+                                token_ids=token_ids[:delivered],
+                                logprobs=logprobs[:delivered],
                             )
-                            accepted_mask = [True] * len(tokens)
-                    else:
-                        tokens = await self.batcher.submit(
-                            session_id=engine_session_id,
-                            model=model,
-                            obs=request.obs,
-                            max_new=request.max_new_tokens,
-                            grammar=request.grammar_id or None,
-                            speculative=request.speculative,
-                            prompt=prompt_text,
-                        )
-                        accepted_mask = [True] * len(tokens)
-                except Exception as exc:  # noqa: BLE001
-                    logger.warning("Decode failure for session %s: %s", request.session_id, exc)
-                    tokens, accepted_mask = await self._failover_replay(
-                        session, request, model
-                    )
-                finally:
-                    exporters.queue_depth.labels(model=model).dec()
+                            self._register_turn(session)
 
-                token_texts: List[str] = []
-                for idx, token in enumerate(tokens):
-                    accepted = accepted_mask[idx] if idx < len(accepted_mask) else True
-                    kv_bytes = token.get("kv_bytes", 0)
-                    self.session_manager.touch(request.session_id, kv_bytes=kv_bytes)
-                    exporters.tokens.labels(phase="decode", model=model).inc()
-                    latency = token.get("t_us", 0) / 1_000_000
-                    exporters.latency.labels(route="Step", model=model).observe(latency)
-                    exporters.kv_bytes.labels(model=model).set(kv_bytes)
-                    token_texts.append(token.get("token", ""))
-                    yield primerl_pb2.StepResp(
-                        token=token.get("token", ""),
-                        t_us=token.get("t_us", 0),
-                        kv_bytes=kv_bytes,
-                        boundary=token.get("boundary", False),
-                        accepted=accepted,
-                    )
-                self.session_manager.record_tokens(request.session_id, token_texts, accepted_mask)
+    @staticmethod
+    def _step_error(session_id: str, exc: StepFailed) -> primerl_pb2.StepResp:
+        return primerl_pb2.StepResp(
+            session_id=session_id,
+            error=exc.details,
+            error_code=exc.code.value[0],
+            retry_after_ms=exc.retry_after_ms,
+        )
+
+    @staticmethod
+    def _chunk_resp(session_id: str, chunk: List[tuple[dict, bool]]) -> primerl_pb2.StepResp:
+        tokens = [token for token, _ in chunk]
+        token_ids = [token.get("token_id") for token in tokens]
+        logprobs = [token.get("logprob") for token in tokens]
+        return primerl_pb2.StepResp(
+            session_id=session_id,
+            kv_bytes=tokens[-1].get("kv_bytes", 0),
+            boundary=tokens[-1].get("boundary", False),
+            token_ids=token_ids if None not in token_ids else [],
+            token_texts=[token.get("token", "") for token in tokens],
+            token_t_us=[token.get("t_us", 0) for token in tokens],
+            token_accepted=[accepted for _, accepted in chunk],
+            token_boundary=[token.get("boundary", False) for token in tokens],
+            token_logprobs=logprobs if None not in logprobs else [],
+        )
+
+    async def _decode(
+        self, session: SessionRecord, request: primerl_pb2.StepReq, model: str
+    ) -> AsyncIterator[tuple[dict, bool]]:
+        """Yield ``(token, accepted)`` pairs for one StepReq as soon as they exist."""
+        node_id = self.engines.resolve(session.node_id)
+        engine_session_id = session.engine_session_id or request.session_id
+        # Stateless engines need the whole episode so far, not just the first prompt.
+        prompt_text = session.conversation.text() + request.obs
+        decode_args = dict(
+            session_id=engine_session_id,
+            model=model,
+            obs=request.obs,
+            max_new=request.max_new_tokens,
+            grammar=request.grammar_id or None,
+            prompt=prompt_text,
+        )
+        speculative = request.speculative
+        if request.speculative and request.grammar_id:
+            drafted = await self._speculate(
+                node_id, engine_session_id, request, request.obs, prompt_text
+            )
+            if drafted is not None:
+                for token, accepted in drafted:
+                    yield token, accepted
+                return
+            speculative = False
+
+        emitted = 0
+        stream = None
+        try:
+            stream = await self.batchers[node_id].submit(
+                stream=True,
+                speculative=speculative,
+                **self._schedule(session, request),
+                **decode_args,
+            )
+            async for token in stream:
+                emitted += 1
+                yield token, True
+        except DeadlineExceeded:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            if emitted:
+                # Tokens already reached the trainer; replaying would duplicate them.
+                raise
+            logger.warning("Decode failure for session %s: %s", request.session_id, exc)
+            tokens, accepted_mask = await self._failover_replay(session, request, model)
+            for token, accepted in zip(tokens, accepted_mask):
+                yield token, accepted
+        finally:
+            if stream is not None:
+                stream.cancel()
+
+    async def _speculate(
+        self, node_id: str, engine_session_id: str, request, obs: str, prompt: str
+    ) -> list[tuple[dict, bool]] | None:
+        """Draft+verify a grammar-constrained decode; None when speculation failed."""
+        try:
+            tokens, accepted_mask = await self.speculators[node_id].generate(
+                session_id=engine_session_id,
+                obs=obs,
+                max_new=request.max_new_tokens,
+                grammar=request.grammar_id,
+                prompt=prompt,
+            )
+        except Exception:  # noqa: BLE001
+            logger.exception("Speculation failed; falling back to normal decode")
+            return None
+        return [
+            (token, accepted_mask[idx] if idx < len(accepted_mask) else True)
+            for idx, token in enumerate(tokens)
+        ]
 
     async def EndEpisode(
         self, request: primerl_pb2.EndReq, context: grpc.aio.ServicerContext
     ) -> primerl_pb2.EndResp:
+        started = time.monotonic()
         with self.tracer.start_as_current_span(
             "EndEpisode", attributes={"session_id": request.session_id}
         ):
-            session = self.session_manager.get(request.session_id)
+            session, owner = await self._locate(request.session_id)
+            if owner is not None:
+                return await self._forward_unary("EndEpisode", owner, request, context)
             if session is None:
                 await context.abort(grpc.StatusCode.NOT_FOUND, "unknown session")
                 return primerl_pb2.EndResp(evicted=False)
 
-            engine_session_id = session.get("engine_session_id")
-            if engine_session_id and hasattr(self.engine, "close_session"):
-                try:
-                    await self.engine.close_session(engine_session_id)  # type: ignore[misc]
-                except Exception as exc:  # noqa: BLE001
-                    logger.warning("Failed to close engine session %s: %s", engine_session_id, exc)
-
-            if self.verifier_client:
-                trace = self.session_manager.trace(request.session_id)
-                episode = {
-                    "episode_id": request.session_id,
-                    "model": trace["model"],
-                    "prompt_fp": trace.get("meta", {}).get("prompt_fp"),
-                    "tokens": " ".join(trace["tokens"]),
-                    "accepted_mask": trace["accepted_mask"],
-                    "tools": trace.get("tools", []),
-                    "meta": trace.get("meta", {}),
-                }
-                metrics = {"kv_bytes": trace["kv_bytes"]}
-                policy_meta = {"sandbox_profile": "default", "egress_blocked": True}
-                verifier_payload = build_trace(episode, metrics, policy_meta)
+            await self._end_session(request.session_id, session)
+            exporters.child(exporters.latency, "EndEpisode", session.model).observe(
+                time.monotonic() - started
+            )
+            return primerl_pb2.EndResp(evicted=True)
+
+    async def EndEpisodeBatch(
+        self, request: primerl_pb2.EndBatchReq, context: grpc.aio.ServicerContext
+    ) -> primerl_pb2.EndBatchResp:
+        """End many sessions concurrently; unknown or repeated ids report ``evicted=False``.
+
+        A session that fails to end reports ``evicted=False`` with ``error`` set;
+        the others are unaffected.
+        """
+        started = time.monotonic()
+        with self.tracer.start_as_current_span(
+            "EndEpisodeBatch", attributes={"sessions": len(request.session_ids)}
+        ):
+            sessions = {}
+            remote: dict[int | str, list[str]] = {}
+            session_ids = list(dict.fromkeys(request.session_ids))
+            located = await asyncio.gather(*(self._locate(sid) for sid in session_ids))
+            for session_id, (session, owner) in zip(session_ids, located):
+                if owner is not None:
+                    remote.setdefault(owner, []).append(session_id)
+                elif session is not None:
+                    sessions[session_id] = session
+
+            async def end_remote(
+                owner: int | str, session_ids: list[str]
+            ) -> dict[str, primerl_pb2.EndResp]:
+                req = primerl_pb2.EndBatchReq(session_ids=session_ids)
+                metadata = self.peers.metadata(context)
+                resp = await self.peers.stub(owner).EndEpisodeBatch(req, metadata=metadata)
+                return dict(zip(session_ids, resp.results))
+
+            # One failed session (or unreachable owner) fails only its own results.
+            outcomes = await asyncio.gather(
+                *(
+                    self._end_session(session_id, session, strict=True)
+                    for session_id, session in sessions.items()
+                ),
+                *(end_remote(owner, session_ids) for owner, session_ids in remote.items()),
+                return_exceptions=True,
+            )
+            ended: dict[str, primerl_pb2.EndResp] = {}
+            for session_id, outcome in zip(sessions, outcomes):
+                if isinstance(outcome, Exception):
+                    logger.error("EndEpisodeBatch failed for session %s: %s", session_id, outcome)
+                    ended[session_id] = primerl_pb2.EndResp(evicted=False, error=str(outcome))
+                else:
+                    ended[session_id] = primerl_pb2.EndResp(evicted=True)
+            for session_ids, outcome in zip(remote.values(), outcomes[len(sessions) :]):
+                if isinstance(outcome, Exception):
+                    logger.error("EndEpisodeBatch forward failed: %s", outcome)
+                    error = primerl_pb2.EndResp(evicted=False, error=str(outcome))
+                    outcome = dict.fromkeys(session_ids, error)
+                ended.update(outcome)
+            results = []
+            for session_id in request.session_ids:
+                result = ended.pop(session_id, None)
+                results.append(primerl_pb2.EndResp(evicted=False) if result is None else result)
+            exporters.child(exporters.latency, "EndEpisodeBatch", "mixed").observe(
+                time.monotonic() - started
+            )
+            return primerl_pb2.EndBatchResp(results=results)
+
+    async def _end_session(
+        self, session_id: str, session: SessionRecord, strict: bool = False
+    ) -> None:
+        """Close the engine session, queue verification and drop the session.
+
+        With ``strict``, a failed engine close is raised once the session is dropped.
+        """
+        close_error = None
+        try:
+            await self._close_engine_session(
+                session.node_id, session.engine_session_id, strict=strict
+            )
+        except Exception as exc:  # noqa: BLE001
+            close_error = exc
+
+        if self.verification:
+            episode = {
+                "episode_id": session_id,
+                "model": session.model,
+                "prompt_fp": session.meta.get("prompt_fp"),
+                "tokens": " ".join(session.token_texts()),
+                "accepted_mask": session.accepted.tolist(),
+                "tools": list(session.tools),
+                "meta": dict(session.meta),
+            }
+            metrics = {"kv_bytes": session.kv_bytes}
+            policy_meta = {"sandbox_profile": "default", "egress_blocked": True}
+            verifier_payload = build_trace(episode, metrics, policy_meta)
+            # Verification runs in the background; results are read via GetVerification.
+            self.verification.submit(session_id, verifier_payload)
+
+        self.session_manager.end(session_id)
+        if close_error is not None:
+            raise close_error
+
+    async def GetVerification(
+        self, request: primerl_pb2.VerifyReq, context: grpc.aio.ServicerContext
+    ) -> primerl_pb2.VerifyResp:
+        owner = self._owner(request.session_id)
+        if owner is not None:
+            return await self._forward_unary("GetVerification", owner, request, context)
+        entry = self.verification.result(request.session_id) if self.verification else None
+        if entry is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "no verification for session")
+            return primerl_pb2.VerifyResp()
+        result = entry.get("result") or {}
+        return primerl_pb2.VerifyResp(
+            status=entry["status"],
+            reward=result.get("reward", 0.0),
+            result_json=orjson.dumps(result).decode() if result else "",
+        )
+
+    async def SampleGroup(
+        self, request: primerl_pb2.SampleGroupReq, context: grpc.aio.ServicerContext
+    ) -> AsyncIterator[primerl_pb2.SampleResp]:
+        """Prefill ``prompt`` once and decode ``k`` samples from it concurrently.
+
+        Engines exposing ``fork_session`` give every sample its own copy of the
+        prefilled session; stateless engines decode all samples from the shared
+        prompt. The samples are submitted to the node's Batcher together, so they
+        share a batch. Tokens stream back as they are produced, tagged with the
+        sample ``index``, and each sample ends with a ``done`` message.
+        """
+        started = time.monotonic()
+        model = request.model or ""
+        with self.tracer.start_as_current_span(
+            "SampleGroup",
+            attributes={"env_id": request.env_id, "model": model, "k": request.k},
+        ):
+            if request.k <= 0 or not request.prompt:
+                await context.abort(
+                    grpc.StatusCode.INVALID_ARGUMENT, "SampleGroup needs a prompt and k > 0"
+                )
+                return
+            start = primerl_pb2.StartReq(
+                env_id=request.env_id, model=model, prompt=request.prompt, pin_prefill=True
+            )
+            (opened,) = await self._open_sessions([start], context, batch=request.k)
+            session_id = opened.session_id
+            session = self.session_manager.get(session_id)
+            with self.session_manager.in_use(session_id):
+                node_id = self.engines.resolve(session.node_id)
+                tenant, _ = self._caller(session, context)
+                engine_session_ids: list = []
+                admitted = 0
+                tasks: list[asyncio.Task] = []
+                metrics = exporters.StepMetrics(model)
                 try:
-                    response = await self.verifier_client.post(
-                        f"{self.verifier_url}/verify", json=verifier_payload
+                    for _ in range(request.k):
+                        try:
+                            self._admit(session, request, context)
+                        except StepFailed as exc:
+                            await exc.abort(context)
+                        admitted += 1
+                    engine_session_ids = await self._fork(node_id, session, request.k)
+                    responses: asyncio.Queue = asyncio.Queue(maxsize=STEP_RESPONSE_BUFFER)
+
+                    async def sample(index: int, engine_session_id: str | None):
+                        sample_session_id = engine_session_id or session_id
+                        speculative = request.speculative
+                        try:
+                            # Grammar-constrained speculation goes through the node's
+                            # speculator, as in Step, so draft tokens keep their mask.
+                            if request.speculative and request.grammar_id:
+                                drafted = await self._speculate(
+                                    node_id, sample_session_id, request, "", request.prompt
+                                )
+                                if drafted is not None:
+                                    for token, accepted in drafted:
+                                        await responses.put((index, token, accepted))
+                                    await responses.put((index, None, False))
+                                    return
+                                speculative = False
+                            stream = await self.batchers[node_id].submit(
+                                stream=True,
+                                session_id=sample_session_id,
+                                model=model,
+                                obs="",
+                                max_new=request.max_new_tokens,
+                                grammar=request.grammar_id or None,
+                                speculative=speculative,
+                                prompt=request.prompt,
+                                **self._schedule(session, request),
+                            )
+                            try:
+                                async for token in stream:
+                                    await responses.put((index, token, True))
+                            finally:
+                                stream.cancel()
+                            await responses.put((index, None, False))
+                        except Exception as exc:  # noqa: BLE001
+                            await responses.put(exc)
+
+                    tasks = [
+                        asyncio.create_task(sample(index, engine_session_id))
+                        for index, engine_session_id in enumerate(engine_session_ids)
+                    ]
+                    remaining = request.k
+                    while remaining:
+                        item = await responses.get()
+                        if isinstance(item, Exception):
+                            raise item
+                        index, token, accepted = item
+                        if token is None:
+                            remaining -= 1
+                            yield primerl_pb2.SampleResp(index=index, done=True)
+                            continue
+                        kv_bytes = token.get("kv_bytes", 0)
+                        metrics.token(kv_bytes)
+                        yield primerl_pb2.SampleResp(
+                            index=index,
+                            token=token.get("token", ""),
+                            t_us=token.get("t_us", 0),
+                            kv_bytes=kv_bytes,
+                            boundary=token.get("boundary", False),
+                            accepted=accepted,
+                            token_id=token.get("token_id"),
+                            logprob=token.get("logprob"),
+                        )
+                except DeadlineExceeded as exc:
+                    await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(exc))
+                finally:
+                    for task in tasks:
+                        task.cancel()
+                    for _ in range(admitted):
+                        self.admission.release(model, tenant)
+                    metrics.flush()
+                    parent = session.engine_session_id
+                    forks = [sid for sid in engine_session_ids if sid != parent]
+                    for engine_session_id in forks:
+                        await self._close_engine_session(node_id, engine_session_id)
+                    await self._close_engine_session(node_id, session.engine_session_id)
+                    self.session_manager.end(session_id)
+                    exporters.child(exporters.latency, "SampleGroup", model).observe(
+                        time.monotonic() - started
                     )
-                    response.raise_for_status()
-                    session["verifier_result"] = response.json()
-                except httpx.HTTPError as exc:  # noqa: BLE001
-                    logger.warning("Verifier call failed: %s", exc)
 
-            self.session_manager.end(request.session_id)
-            exporters.latency.labels(route="EndEpisode", model=session.get("model", "unknown")).observe(0)
-            return primerl_pb2.EndResp(evicted=True)
+    def _owner(self, session_id: str) -> int | None:
+        """Worker owning ``session_id`` when it is not this one (multi-worker mode)."""
+        return self.peers.owner(session_id) if self.peers else None
+
+    async def _locate(self, session_id: str) -> tuple[SessionRecord | None, int | str | None]:
+        """``(session, None)`` when served here, else ``(None, owner)`` to forward to.
+
+        The owner is a local worker index or, with a shared session store, the
+        address of the replica holding the session's lease. Sessions missing from
+        memory are restored from the store when their lease is free.
+        """
+        owner = self._owner(session_id)
+        if owner is not None:
+            return None, owner
+        session = self.session_manager.get(session_id)
+        if session is None and self.session_sync:
+            try:
+                session = await self.session_sync.load(session_id)
+            except SessionLeased as exc:
+                return None, exc.owner
+        return session, None
+
+    async def _forward_unary(self, method: str, owner: int | str, request, context):
+        try:
+            call = getattr(self.peers.stub(owner), method)
+            return await call(request, metadata=self.peers.metadata(context))
+        except grpc.aio.AioRpcError as exc:
+            context.set_trailing_metadata(tuple(exc.trailing_metadata() or ()))
+            await context.abort(exc.code(), exc.details())
+
+    async def _forward_step(
+        self, owner: int | str, request: primerl_pb2.StepReq, context: grpc.aio.ServicerContext
+    ) -> AsyncIterator[primerl_pb2.StepResp]:
+        call = self.peers.stub(owner).Step(iter([request]), metadata=self.peers.metadata(context))
+        try:
+            async for response in call:
+                yield response
+        except grpc.aio.AioRpcError as exc:
+            # The owner reports failed StepReqs in-band; this is the stream itself failing.
+            retry_after_ms = dict(exc.trailing_metadata() or ()).get("retry-after-ms", 0)
+            raise StepFailed(exc.code(), exc.details() or "", int(retry_after_ms)) from exc
+        finally:
+            call.cancel()
 
     async def shutdown(self):
-        self._batcher_task.cancel()
-        with contextlib.suppress(asyncio.CancelledError):
-            await self._batcher_task
+        await self.reaper.stop()
+        if self.session_sync:
+            await self.session_sync.stop()
+        for task in self._batcher_tasks:
+            task.cancel()
+        for task in self._batcher_tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        if self.verification:
+            await self.verification.stop()
         if self.verifier_client:
             await self.verifier_client.aclose()
+        if self.peers:
+            await self.peers.close()
+
+    async def _prefill(
+        self, node_id: str | None, model: str, prompt: str, grammar: str | None
+    ) -> dict:
+        started = time.monotonic()
+        try:
+            engine = self.engines.get(node_id)
+            return await engine.prefill(model=model, prompt=prompt, grammar=grammar)
+        finally:
+            exporters.child(exporters.prefill, model).observe(time.monotonic() - started)
+
+    async def _fork(self, node_id: str, session: SessionRecord, k: int) -> list:
+        """Engine session ids for ``k`` samples decoding from the session's prefill."""
+        engine = self.engines.get(node_id)
+        engine_session_id = session.engine_session_id
+        if engine_session_id and hasattr(engine, "fork_session"):
+            return list(await engine.fork_session(engine_session_id, k))
+        return [engine_session_id] * k
+
+    async def _reap_session(self, session_id: str, session: SessionRecord) -> None:
+        """Reaper callback: release an abandoned (already detached) session's engine state."""
+        await self._close_engine_session(session.node_id, session.engine_session_id)
+
+    async def _close_engine_session(
+        self, node_id: str | None, engine_session_id: str | None, strict: bool = False
+    ):
+        engine = self.engines.get(node_id)
+        if engine_session_id and hasattr(engine, "close_session"):
+            try:
+                await engine.close_session(engine_session_id)  # type: ignore[misc]
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Failed to close engine session %s: %s", engine_session_id, exc)
+                if strict:
+                    raise
+
+    async def _failover_replay(self, session: SessionRecord, request: primerl_pb2.StepReq, model: str):
+        """Rebuild the engine session from the recorded transcript and replay the Step.
 
-    async def _failover_replay(self, session: dict, request: primerl_pb2.StepReq, model: str):
-        prompt = session.get("meta", {}).get("prompt")
-        engine_session_id = session.get("engine_session_id")
-        if not prompt:
-            raise RuntimeError("Missing prompt for failover replay")
+        The transcript (prompt plus every obs and accepted token so far) is
+        re-prefilled on the node holding the longest warm prefix of it, so the
+        engine only recomputes the cold suffix; the session moves to that node.
+        """
+        started = time.monotonic()
+        conversation = session.conversation
+        transcript = conversation.text()
+        if not transcript:
+            raise RuntimeError("Missing transcript for failover replay")
+        failed_node = self.engines.resolve(session.node_id)
+        node_id, warm_chars = self._warm_node(session, conversation, exclude=failed_node)
         try:
-            response = await self.engine.prefill(model=model, prompt=prompt, grammar=request.grammar_id or None)
-            engine_session_id = response.get("session_id")
-            if engine_session_id:
-                self.session_manager.bind_engine(request.session_id, engine_session_id)
+            response = await self._prefill(
+                node_id, model=model, prompt=transcript, grammar=request.grammar_id or None
+            )
         except Exception as exc:  # noqa: BLE001
-            logger.error("Failover prefill failed: %s", exc)
+            logger.error("Failover prefill on node %s failed: %s", node_id, exc)
             raise
-        engine_sid = engine_session_id or request.session_id
-        prompt_text = session.get("meta", {}).get("prompt", "") + request.obs
-        tokens = await self.batcher.submit(
-            session_id=engine_sid,
-            model=model,
-            obs=request.obs,
-            max_new=request.max_new_tokens,
-            grammar=request.grammar_id or None,
-            speculative=False,
-            prompt=prompt_text,
+        engine_session_id = response.get("session_id")
+        if engine_session_id:
+            self.session_manager.bind_engine(request.session_id, engine_session_id, node_id)
+            transcript_fp = conversation.fingerprint()
+            if self.cache_index:
+                self.cache_index.register(transcript_fp, node_id)
+            self.prefix_cache.put(
+                transcript_fp,
+                meta={"model": model, "engine_session_id": engine_session_id},
+                node_id=node_id,
+            )
+        logger.warning(
+            "Session %s failed over from %s to %s (%d warm / %d transcript chars)",
+            request.session_id,
+            failed_node,
+            node_id,
+            warm_chars,
+            len(transcript),
+        )
+
+        warm_tokens = len(transcript[:warm_chars].split())
+        total_tokens = response.get("tokens") or len(transcript.split())
+        exporters.child(exporters.failover_replay_tokens, model, "warm").inc(warm_tokens)
+        exporters.child(exporters.failover_replay_tokens, model, "cold").inc(
+            max(total_tokens - warm_tokens, 0)
         )
+        try:
+            tokens = await self.batchers[node_id].submit(
+                session_id=engine_session_id or request.session_id,
+                model=model,
+                obs=request.obs,
+                max_new=request.max_new_tokens,
+                grammar=request.grammar_id or None,
+                speculative=False,
+                prompt=transcript + request.obs,
+                **self._schedule(session, request),
+            )
+        finally:
+            exporters.child(exporters.failover, model, str(bool(warm_chars)).lower()).observe(
+                time.monotonic() - started
+            )
         return tokens, [True] * len(tokens)
+
+    def _register_turn(self, session: SessionRecord) -> None:
+        """Mark the session's node warm for its latest turn boundary, for ``_warm_node``."""
+        node_id = self.engines.resolve(session.node_id)
+        _, fingerprint = session.conversation.boundaries[-1]
+        if self.cache_index:
+            self.cache_index.register(fingerprint, node_id)
+        meta = {"model": session.model, "engine_session_id": session.engine_session_id}
+        self.prefix_cache.put(fingerprint, meta, node_id=node_id)
+
+    def _warm_node(self, session: SessionRecord, conversation, exclude: str) -> tuple[str, int]:
+        """Pick the failover node holding the longest warm prefix of the conversation.
+
+        Returns ``(node_id, warm_chars)``; ``warm_chars`` is 0 when no candidate
+        has any turn boundary cached, in which case the least loaded node wins.
+        The failed node is only reused when it is the only one.
+        """
+        candidates = [node for node, _ in self.engines.items() if node != exclude] or [exclude]
+        prompt_fp = session.meta.get("prompt_fp")
+        boundaries = []
+        for idx in range(len(conversation.boundaries) - 1, -1, -1):
+            length, fingerprint = conversation.boundaries[idx]
+            if not length:
+                continue
+            if idx == 0 and prompt_fp:
+                # StartEpisode registers the prompt under its normalized fingerprint.
+                fingerprint = bytes.fromhex(prompt_fp)
+            boundaries.append((length, fingerprint))
+        # Every boundary in one pipelined lookup rather than a round-trip per turn.
+        metas = self.prefix_cache.get_many([fingerprint for _, fingerprint in boundaries])
+        for (length, fingerprint), meta in zip(boundaries, metas):
+            warm = set(self.cache_index.lookup(fingerprint)) if self.cache_index else set()
+            if meta:
+                warm.update(meta.get("nodes") or [])
+            nodes = [node for node in candidates if node in warm]
+            if nodes:
+                return min(nodes, key=self._node_load), length
+        return min(candidates, key=self._node_load), 0
+
+    def _node_load(self, node_id: str) -> int:
+        batcher = self.batchers[node_id]
+        return batcher.active + batcher.depth()
+
+    def _admit(self, session: SessionRecord, request, context: grpc.aio.ServicerContext) -> None:
+        """Admit one decode for ``session`` or raise ``StepFailed`` with RESOURCE_EXHAUSTED."""
+        model = session.model
+        tenant, client = self._caller(session, context)
+        batcher = self.batchers[self.engines.resolve(session.node_id)]
+        try:
+            self.admission.admit(
+                model,
+                tenant,
+                client,
+                est_wait_ms=batcher.estimated_wait_ms(),
+                budget_ms=batcher.budget_ms(**self._schedule(session, request)),
+                slot_ms=batcher.stats.mean_ms(),
+            )
+        except AdmissionRejected as exc:
+            exporters.admission_shed.labels(model=model, reason=exc.reason).inc()
+            retry_after_ms = math.ceil(exc.retry_after_s * 1000)
+            raise StepFailed(
+                grpc.StatusCode.RESOURCE_EXHAUSTED, str(exc), retry_after_ms
+            ) from exc
+
+    def _caller(self, session: SessionRecord, context: grpc.aio.ServicerContext) -> tuple[str, str]:
+        """Resolve the (tenant, client) a Step is accounted to for admission control."""
+        metadata = dict(context.invocation_metadata() or ())
+        tenant = metadata.get("x-primerl-tenant") or session.env_id
+        client = metadata.get("x-primerl-client") or _peer_host(context.peer())
+        return tenant, client
+
+    def _schedule(self, session: SessionRecord, request: primerl_pb2.StepReq) -> dict:
+        """Resolve the Batcher priority class and deadline for a StepReq."""
+        defaults = self.env_slo.get(session.env_id, {})
+        return {
+            "priority": request.priority or defaults.get("priority", "standard"),
+            "deadline_ms": request.deadline_ms or defaults.get("deadline_ms"),
+        }
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import math
+import time
+from typing import Optional
+
+import orjson
+from redis.exceptions import RedisError
+
+from rl_client.session_log import SessionLog
+from rl_client.session_manager import SessionManager, SessionRecord
+from rl_client.session_store import RedisSessionStore, decode_session, encode_header
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStoreSync:
+    """Write-back cache between the local ``SessionManager`` and a session store.
+
+    RPCs only touch the in-process ``SessionManager`` (journalling enabled); every
+    ``interval_s`` the journal is serialised on the event loop and written to the
+    store from a worker thread, so the store is never on the Step path. With a
+    ``RedisSessionStore``, leases of all local sessions are renewed every
+    ``renew_s``, sessions whose lease was taken by another replica are dropped
+    locally and ``load`` leases and restores a session that is not in memory.
+    With a ``SessionLog``, ``recover`` restores every logged session at startup.
+    """
+
+    def __init__(
+        self,
+        session_manager: SessionManager,
+        store: RedisSessionStore | SessionLog,
+        interval_s: float = 0.05,
+        renew_s: Optional[float] = None,
+    ):
+        self.session_manager = session_manager
+        self.store = store
+        self.interval_s = interval_s
+        if renew_s is None:
+            renew_s = store.lease_ms / 3000 if store.lease_ms else math.inf
+        self.renew_s = renew_s
+        self._last_renew = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self) -> None:
+        """Write pending changes (and due lease renewals) to the store."""
+        async with self._lock:
+            changed, ended = self.session_manager.drain()
+            renew: list[str] = []
+            now = time.monotonic()
+            if now - self._last_renew >= self.renew_s:
+                renew = list(self.session_manager.sessions)
+                self._last_renew = now
+            if not (changed or ended or renew):
+                return
+            updates = []
+            for session_id, record, bulk_fields, steps in changed:
+                fields = encode_header(record, bulk_fields)
+                for index, step in steps:
+                    fields[f"step:{index}"] = orjson.dumps(step)
+                updates.append((session_id, fields))
+            try:
+                lost = await asyncio.to_thread(self.store.write, updates, ended, renew)
+            except (RedisError, OSError):
+                logger.exception("Session store write failed; retrying next flush")
+                self.session_manager.requeue(changed, ended)
+                return
+            for session_id in lost:
+                logger.warning("Lease for session %s moved to another replica", session_id)
+                self.session_manager.drop(session_id)
+
+    async def load(self, session_id: str) -> Optional[SessionRecord]:
+        """Lease and restore ``session_id``; raises ``SessionLeased`` if another replica owns it."""
+        try:
+            mapping = await asyncio.to_thread(self.store.acquire, session_id)
+        except RedisError:
+            logger.exception("Session store read failed for %s", session_id)
+            return None
+        # Another RPC may have restored it while this one waited on Redis.
+        record = self.session_manager.get(session_id)
+        if record is not None or mapping is None:
+            return record
+        header, steps = decode_session(mapping)
+        logger.info("Restored session %s (%d steps) from the session store", session_id, len(steps))
+        return self.session_manager.restore(session_id, header, steps)
+
+    def recover(self) -> int:
+        """Restore every session held by a ``SessionLog``; returns how many came back."""
+        sessions = self.store.recover()
+        for session_id, mapping in sessions.items():
+            header, steps = decode_session(mapping)
+            self.session_manager.restore(session_id, header, steps)
+        return len(sessions)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await self.flush()
+            except Exception:  # noqa: BLE001
+                logger.exception("Session store flush failed")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        # Write-back: nothing recorded before shutdown may be lost.
+        await self.flush()
+        self.store.close()
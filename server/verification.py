@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import logging
+import time
+from typing import Optional
+
+import httpx
+
+from perf import exporters
+
+logger = logging.getLogger(__name__)
+
+
+class VerificationQueue:
+    """Bounded background queue that posts episode traces to the verifier.
+
+    ``submit`` never waits on the verifier: traces are picked up by worker tasks,
+    posted in batches to ``/verify_batch`` (falling back to per-trace ``/verify``
+    for verifiers without it) and retried with exponential backoff. Results are
+    kept in a bounded LRU and read back with ``result(episode_id)``.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        max_queue: int = 1024,
+        workers: int = 2,
+        batch_size: int = 16,
+        batch_wait_s: float = 0.05,
+        max_retries: int = 3,
+        backoff_s: float = 0.5,
+        max_results: int = 10_000,
+    ):
+        self.client = client
+        self.url = url
+        self.batch_size = batch_size
+        self.batch_wait_s = batch_wait_s
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_results = max_results
+        self.queue: asyncio.Queue[tuple[str, dict]] = asyncio.Queue(maxsize=max_queue)
+        self.results: collections.OrderedDict[str, dict] = collections.OrderedDict()
+        self._batch_supported = True
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(workers)]
+
+    def submit(self, episode_id: str, trace: dict) -> bool:
+        """Enqueue a trace; returns False (and records it as dropped) when the queue is full."""
+        try:
+            self.queue.put_nowait((episode_id, trace))
+        except asyncio.QueueFull:
+            self._store(episode_id, {"status": "dropped"})
+            return False
+        self._store(episode_id, {"status": "pending"})
+        exporters.verifier_queue_depth.set(self.queue.qsize())
+        return True
+
+    def result(self, episode_id: str) -> Optional[dict]:
+        return self.results.get(episode_id)
+
+    async def stop(self, drain_timeout_s: float = 5.0):
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout_s)
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def _store(self, episode_id: str, entry: dict):
+        self.results[episode_id] = entry
+        self.results.move_to_end(episode_id)
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+        if entry["status"] != "pending":
+            exporters.verifier_results.labels(status=entry["status"]).inc()
+
+    async def _worker(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.batch_wait_s
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            exporters.verifier_queue_depth.set(self.queue.qsize())
+            try:
+                await self._verify(batch)
+            except Exception as exc:  # noqa: BLE001
+                # A malformed verifier reply fails this batch; the worker keeps serving.
+                logger.exception("Verification of %d traces failed", len(batch))
+                for episode_id, _ in batch:
+                    self._store(episode_id, {"status": "failed", "error": str(exc)})
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _verify(self, batch: list[tuple[str, dict]]):
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                results = await self._post([trace for _, trace in batch])
+            except httpx.HTTPError as exc:
+                exporters.child(exporters.verifier_rtt, "error").observe(time.monotonic() - started)
+                if attempt == self.max_retries:
+                    logger.warning("Verifier call failed after %d attempts: %s", attempt + 1, exc)
+                    for episode_id, _ in batch:
+                        self._store(episode_id, {"status": "failed", "error": str(exc)})
+                    return
+                await asyncio.sleep(self.backoff_s * 2**attempt)
+                continue
+            exporters.child(exporters.verifier_rtt, "ok").observe(time.monotonic() - started)
+            if not isinstance(results, list) or len(results) != len(batch):
+                count = len(results) if isinstance(results, list) else type(results).__name__
+                raise ValueError(f"Verifier returned {count} results for {len(batch)} traces")
+            for (episode_id, _), result in zip(batch, results):
+                self._store(episode_id, {"status": "done", "result": result})
+            return
+
+    async def _post(self, traces: list[dict]) -> list[dict]:
+        if self._batch_supported:
+            response = await self.client.post(f"{self.url}/verify_batch", json=traces)
+            if response.status_code != 404:
+                response.raise_for_status()
+                return response.json()
+            self._batch_supported = False
+            logger.info("Verifier has no /verify_batch; posting traces individually")
+
+        async def post_one(trace: dict) -> dict:
+            response = await self.client.post(f"{self.url}/verify", json=trace)
+            response.raise_for_status()
+            return response.json()
+
+        return list(await asyncio.gather(*(post_one(trace) for trace in traces)))
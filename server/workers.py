@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import uuid
+import zlib
+from typing import Callable
+
+from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+logger = logging.getLogger(__name__)
+
+
+def session_owner(session_id: str, workers: int) -> int:
+    """Worker index that owns ``session_id``; every worker computes the same answer."""
+    return zlib.crc32(session_id.encode()) % workers
+
+
+def owned_session_id(worker: int, workers: int) -> str:
+    """New random session id that hashes to ``worker`` (expected ``workers`` draws)."""
+    while True:
+        session_id = str(uuid.uuid4())
+        if session_owner(session_id, workers) == worker:
+            return session_id
+
+
+def peer_address(worker: int, peer_port_base: int) -> str:
+    """Loopback address on which ``worker`` serves forwarded RPCs."""
+    return f"127.0.0.1:{peer_port_base + worker}"
+
+
+def prepare_multiprocess_metrics() -> str:
+    """Point prometheus_client at a fresh multiprocess directory shared by all workers.
+
+    Must run in the parent before workers start; they inherit the environment and
+    write their samples there, and the parent aggregates them for scraping.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+    else:
+        path = tempfile.mkdtemp(prefix="primerl-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+def serve_multiprocess_metrics(port: int):
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+
+
+def run_workers(target: Callable[[int, int], None], workers: int, metrics_port: int):
+    """Run ``target(worker, workers)`` in ``workers`` spawned processes until they exit.
+
+    Workers share the public port via SO_REUSEPORT; metrics from all of them are
+    served from the parent on ``metrics_port``.
+    """
+    prepare_multiprocess_metrics()
+    serve_multiprocess_metrics(metrics_port)
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=target, args=(idx, workers), daemon=True) for idx in range(workers)]
+    for proc in procs:
+        proc.start()
+    logger.info("Started %d PrimeRL workers (metrics on %s)", workers, metrics_port)
+    try:
+        for proc in procs:
+            proc.join()
+            if proc.exitcode:
+                logger.error("Worker pid %s exited with %s", proc.pid, proc.exitcode)
+    except KeyboardInterrupt:  # pragma: no cover
+        logger.info("Stopping PrimeRL workers")
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+            multiprocess.mark_process_dead(proc.pid)
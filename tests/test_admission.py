@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from rl_client.admission import AdmissionController, AdmissionRejected, TokenBucket
+
+
+def test_token_bucket_reports_wait():
+    bucket = TokenBucket(rate=10, burst=1)
+    now = bucket.updated
+    assert bucket.take(now) == 0.0
+    assert bucket.take(now) == pytest.approx(0.1)
+    assert bucket.take(now + 0.2) == 0.0
+
+
+def test_admission_bounds_queues_and_sheds_on_wait():
+    ctrl = AdmissionController(max_per_model=2, max_per_tenant=1, tenant_limits={"eval": 2})
+    ctrl.admit("m", "grpo", "c1")
+    with pytest.raises(AdmissionRejected, match="tenant queue full"):
+        ctrl.admit("m", "grpo", "c1")
+    ctrl.admit("m", "eval", "c2")
+    with pytest.raises(AdmissionRejected, match="model queue full"):
+        ctrl.admit("m", "eval", "c2", slot_ms=50)
+    ctrl.release("m", "grpo")
+    assert ctrl.model_depth["m"] == 1
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        ctrl.admit("m", "eval", "c2", est_wait_ms=500, budget_ms=300)
+    assert exc_info.value.retry_after_s == pytest.approx(0.2)
+
+
+def test_admission_rate_limits_per_client():
+    ctrl = AdmissionController(client_rate=1, client_burst=1)
+    ctrl.admit("m", "t", "c1")
+    ctrl.admit("m", "t", "c2")
+    with pytest.raises(AdmissionRejected, match="client rate limit"):
+        ctrl.admit("m", "t", "c1")
+
+
+def test_idle_client_buckets_are_evicted():
+    ctrl = AdmissionController(client_rate=10, client_burst=1, max_clients=2)
+    ctrl.admit("m", "t", "c1")
+    ctrl.admit("m", "t", "c2")
+    ctrl.admit("m", "t", "c3")
+    assert list(ctrl.buckets) == ["c2", "c3"]
+    time.sleep(0.11)
+    ctrl.admit("m", "t", "c4")
+    assert list(ctrl.buckets) == ["c4"]
@@ -0,0 +1,265 @@
+import asyncio
+import collections
+
+import pytest
+from prometheus_client import REGISTRY
+
+from engines.per_request import PerRequestFallback
+from rl_client.batcher import Batcher, DeadlineExceeded
+
+
+class GatedEngine:
+    """Emits tokens one at a time, each released by the test per session."""
+
+    def __init__(self):
+        self.gates = collections.defaultdict(asyncio.Queue)
+
+    def release(self, session_id, count=1):
+        for _ in range(count):
+            self.gates[session_id].put_nowait(None)
+
+    async def continue_decode(self, session_id, max_new, **_):
+        for idx in range(max_new):
+            await self.gates[session_id].get()
+            yield {"token": f"{session_id}-{idx}"}
+
+
+class FailingEngine:
+    async def continue_decode(self, **_):
+        yield {"token": "a"}
+        raise RuntimeError("engine died")
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_tokens_before_decode_finishes():
+    engine = GatedEngine()
+    batcher = Batcher(engine, interval_ms=1)
+    task = asyncio.create_task(batcher.run())
+    try:
+        stream = await batcher.submit(stream=True, session_id="s", model="m", max_new=3)
+        engine.release("s")
+        first = await asyncio.wait_for(stream.__anext__(), timeout=1)
+        assert first["token"] == "s-0"
+        engine.release("s", 2)
+        rest = [token["token"] async for token in stream]
+        assert rest == ["s-1", "s-2"]
+    finally:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_stream_and_collect_surface_engine_errors():
+    batcher = Batcher(FailingEngine(), interval_ms=1)
+    task = asyncio.create_task(batcher.run())
+    try:
+        stream = await batcher.submit(stream=True, session_id="s", model="m")
+        seen = []
+        with pytest.raises(RuntimeError):
+            async for token in stream:
+                seen.append(token["token"])
+        assert seen == ["a"]
+        with pytest.raises(RuntimeError):
+            await batcher.submit(session_id="s", model="m")
+    finally:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_continuous_batching_admits_into_free_slots():
+    engine = GatedEngine()
+    batcher = Batcher(engine, interval_ms=1, max_batch=2)
+    task = asyncio.create_task(batcher.run())
+    try:
+        long_run = asyncio.create_task(batcher.submit(session_id="long", model="m", max_new=3))
+        short_run = asyncio.create_task(batcher.submit(session_id="short", model="m", max_new=1))
+        await asyncio.sleep(0.01)
+        assert len(batcher.inflight) == 2
+        late = asyncio.create_task(batcher.submit(session_id="late", model="m", max_new=1))
+        await asyncio.sleep(0.01)
+        assert len(batcher.inflight) == 2
+
+        # "late" takes the slot "short" frees while "long" is still decoding.
+        engine.release("long")
+        engine.release("short")
+        await asyncio.wait_for(short_run, timeout=1)
+        engine.release("late")
+        await asyncio.wait_for(late, timeout=1)
+        assert not long_run.done()
+
+        engine.release("long", 2)
+        tokens = await asyncio.wait_for(long_run, timeout=1)
+        assert [t["token"] for t in tokens] == ["long-0", "long-1", "long-2"]
+        assert len(batcher.stats.latencies_ms) == 3
+    finally:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_interleaved_keys_fill_groups_without_reordering():
+    engine = GatedEngine()
+    batcher = Batcher(engine, interval_ms=1, max_batch=2)
+    for idx in range(3):
+        for grammar in ("sql", "json"):
+            asyncio.create_task(
+                batcher.submit(session_id=f"{grammar}{idx}", model="m", grammar=grammar, max_new=1)
+            )
+    await asyncio.sleep(0)
+    queued = sorted(batcher.queues[("m", "sql", None)])
+    assert [entry[2].args["session_id"] for entry in queued] == ["sql0", "sql1", "sql2"]
+    assert batcher.depth() == 6
+
+    # The oldest head is served first and the group fills only from its own key.
+    group = batcher._take(batcher._next_key(), 2)
+    assert [r.args["session_id"] for r in group] == ["sql0", "sql1"]
+    group = batcher._take(batcher._next_key(), 2)
+    assert [r.args["session_id"] for r in group] == ["json0", "json1"]
+    assert batcher._next_key() == ("m", "sql", None)
+    assert batcher.depth() == 2
+
+
+@pytest.mark.asyncio
+async def test_edf_serves_interactive_before_bulk():
+    batcher = Batcher(GatedEngine(), interval_ms=1)
+    asyncio.create_task(batcher.submit(session_id="bulk", model="m", grammar="a", priority="bulk"))
+    asyncio.create_task(
+        batcher.submit(session_id="eval", model="m", grammar="b", priority="interactive")
+    )
+    await asyncio.sleep(0)
+    group = batcher._take(batcher._next_key(), 4)
+    assert [r.args["session_id"] for r in group] == ["eval"]
+
+
+@pytest.mark.asyncio
+async def test_late_requests_are_demoted_or_rejected():
+    batcher = Batcher(GatedEngine(), interval_ms=1)
+    asyncio.create_task(batcher.submit(session_id="late", model="m", deadline_ms=1))
+    asyncio.create_task(batcher.submit(session_id="ok", model="m", deadline_ms=10_000))
+    await asyncio.sleep(0.01)
+    group = batcher._take(batcher._next_key(), 4)
+    assert [r.args["session_id"] for r in group] == ["ok", "late"]
+    assert group[1].demoted
+
+    batcher = Batcher(GatedEngine(), interval_ms=1, late_policy="reject")
+    late = asyncio.create_task(batcher.submit(session_id="late", model="m", deadline_ms=1))
+    await asyncio.sleep(0.01)
+    assert batcher._take(batcher._next_key(), 4) == []
+    with pytest.raises(DeadlineExceeded):
+        await late
+
+
+class CountingBatchEngine(GatedEngine):
+    def __init__(self):
+        super().__init__()
+        self.batch_calls = 0
+
+    async def continue_decode_batch(self, requests):
+        self.batch_calls += 1
+        for step in range(max(req["max_new"] for req in requests)):
+            for idx, req in enumerate(requests):
+                if step < req["max_new"]:
+                    yield idx, {"token": f"{req['session_id']}-{step}"}
+                if step == req["max_new"] - 1:
+                    yield idx, None
+
+
+@pytest.mark.asyncio
+async def test_group_uses_native_batch_decode():
+    engine = CountingBatchEngine()
+    batcher = Batcher(engine, interval_ms=1)
+    short = asyncio.create_task(batcher.submit(session_id="a", model="m", max_new=1))
+    long_stream = asyncio.create_task(batcher.submit(stream=True, session_id="b", model="m", max_new=2))
+    await asyncio.sleep(0)
+    task = asyncio.create_task(batcher.run())
+    try:
+        assert [t["token"] for t in await asyncio.wait_for(short, timeout=1)] == ["a-0"]
+        stream = await long_stream
+        assert [t["token"] async for t in stream] == ["b-0", "b-1"]
+        assert engine.batch_calls == 1
+        assert batcher.active == 0
+    finally:
+        task.cancel()
+
+
+class AbortTrackingEngine(GatedEngine):
+    def __init__(self):
+        super().__init__()
+        self.aborted = []
+
+    async def continue_decode(self, session_id, max_new, **kwargs):
+        try:
+            async for token in super().continue_decode(session_id, max_new, **kwargs):
+                yield token
+        finally:
+            self.aborted.append(session_id)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_stream_aborts_engine_decode():
+    engine = AbortTrackingEngine()
+    batcher = Batcher(engine, interval_ms=1)
+    task = asyncio.create_task(batcher.run())
+    try:
+        stream = await batcher.submit(stream=True, session_id="s", model="m", max_new=100)
+        engine.release("s")
+        async for _ in stream:
+            break
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        assert engine.aborted == ["s"]
+        assert batcher.active == 0
+        assert not batcher.inflight
+    finally:
+        task.cancel()
+
+
+class FallbackBatchEngine(PerRequestFallback, AbortTrackingEngine):
+    def __init__(self):
+        super().__init__()
+        self._separate = {}
+
+    def continue_decode_batch(self, requests):
+        return self.decode_separately(requests)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_group_member_aborts_only_that_member():
+    engine = FallbackBatchEngine()
+    batcher = Batcher(engine, interval_ms=1)
+    saved = "primerl_cancel_saved_tokens_total"
+    before = REGISTRY.get_sample_value(saved, {"model": "grp"}) or 0
+    cancelled = asyncio.create_task(
+        batcher.submit(stream=True, session_id="a", model="grp", max_new=100)
+    )
+    kept = asyncio.create_task(batcher.submit(session_id="b", model="grp", max_new=2))
+    await asyncio.sleep(0)
+    task = asyncio.create_task(batcher.run())
+    try:
+        stream = await cancelled
+        engine.release("a")
+        await asyncio.wait_for(stream.__anext__(), timeout=1)
+        await stream.aclose()
+        await asyncio.sleep(0)
+        # The member's slot and saved tokens are released before the group ends.
+        assert batcher.active == 1
+        assert REGISTRY.get_sample_value(saved, {"model": "grp"}) - before == 99
+        await asyncio.sleep(0.01)
+        assert engine.aborted == ["a"]
+
+        engine.release("b", 2)
+        tokens = await asyncio.wait_for(kept, timeout=1)
+        assert [t["token"] for t in tokens] == ["b-0", "b-1"]
+        assert batcher.active == 0
+    finally:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_is_dropped_before_dispatch():
+    engine = AbortTrackingEngine()
+    batcher = Batcher(engine, interval_ms=1)
+    waiter = asyncio.create_task(batcher.submit(session_id="s", model="m", max_new=4))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    assert batcher._take(batcher._next_key(), 4) == []
+    assert engine.aborted == []
@@ -0,0 +1,37 @@
+import pytest
+
+from server.engine_pool import EnginePool, load_topology
+
+
+def test_load_topology_fills_defaults(tmp_path):
+    path = tmp_path / "topology.yaml"
+    path.write_text(
+        "nodes:\n"
+        "  - id: node-a\n"
+        "    engine: vllm\n"
+        "    base_url: http://node-a:8000\n"
+        "    models: [llama3-8b]\n"
+        "  - id: node-b\n"
+    )
+    nodes = load_topology(str(path))
+    assert [node["id"] for node in nodes] == ["node-a", "node-b"]
+    assert nodes[0]["base_url"] == "http://node-a:8000"
+    assert nodes[1]["engine"] == "dummy"
+    assert nodes[1]["queue_penalty"] == 0.1
+
+
+def test_load_topology_rejects_nodes_without_id(tmp_path):
+    path = tmp_path / "topology.yaml"
+    path.write_text("nodes:\n  - engine: vllm\n")
+    with pytest.raises(ValueError):
+        load_topology(str(path))
+
+
+def test_pool_resolves_unknown_nodes_to_default():
+    a, b = object(), object()
+    pool = EnginePool({"node-a": a, "node-b": b})
+    assert pool.get("node-b") is b
+    assert pool.get("node-x") is a
+    assert pool.get(None) is a
+    assert pool.resolve("node-x") == "node-a"
+    assert "node-b" in pool and len(pool) == 2
@@ -0,0 +1,109 @@
+import httpx
+import orjson
+import pytest
+
+from engines import DummyAdapter, SGLangAdapter, TRTLLMAdapter, VLLMAdapter
+from mock_engine.app import app
+
+
+async def _collect(agen):
+    out: dict[int, list] = {}
+    finished = []
+    async for idx, token in agen:
+        if token is None:
+            finished.append(idx)
+        else:
+            out.setdefault(idx, []).append(token["token"])
+    return out, finished
+
+
+@pytest.mark.asyncio
+async def test_dummy_batch_decode_demuxes_members():
+    requests = [{"session_id": "a", "max_new": 1}, {"session_id": "b", "max_new": 3}]
+    out, finished = await _collect(DummyAdapter().continue_decode_batch(requests))
+    assert out == {0: ["tok-0"], 1: ["tok-0", "tok-1", "tok-2"]}
+    assert finished == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_sglang_batch_decode_against_mock_engine():
+    adapter = SGLangAdapter("http://mock")
+    adapter.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://mock")
+    requests = [
+        {"session_id": "a", "obs": "", "max_new": 2, "grammar": None, "speculative": False},
+        {"session_id": "b", "obs": "", "max_new": 1, "grammar": None, "speculative": True},
+    ]
+    out, finished = await _collect(adapter.continue_decode_batch(requests))
+    assert out == {0: ["tok_0", "tok_1"], 1: ["draft_0"]}
+    assert sorted(finished) == [0, 1]
+    await adapter.client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_sglang_fork_session_against_mock_engine():
+    adapter = SGLangAdapter("http://mock")
+    adapter.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://mock")
+    forks = await adapter.fork_session("mock-1", 3)
+    assert len(set(forks)) == 3
+    await adapter.client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_vllm_decode_passes_through_token_ids_and_logprobs():
+    requests = []
+
+    def handler(request):
+        requests.append(orjson.loads(request.content))
+        chunks = [
+            {"text": " a", "logprobs": {"tokens": ["token_id:11"], "token_logprobs": [-0.25]}},
+            {
+                "text": " bc",
+                "finish_reason": "length",
+                "logprobs": {"tokens": ["token_id:12", "token_id:13"], "token_logprobs": [-1.0, -2.0]},
+            },
+        ]
+        body = "".join(f"data: {orjson.dumps({'choices': [c]}).decode()}\n\n" for c in chunks)
+        return httpx.Response(200, text=body + "data: [DONE]\n\n")
+
+    adapter = VLLMAdapter("http://vllm")
+    adapter.client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://vllm")
+    tokens = [
+        t async for t in adapter.continue_decode("s", "", 3, None, False, prompt="p", model="m")
+    ]
+    assert requests[0]["return_tokens_as_token_ids"] is True
+    assert [t["token_id"] for t in tokens] == [11, 12, 13]
+    assert [t["logprob"] for t in tokens] == [-0.25, -1.0, -2.0]
+    assert "".join(t["token"] for t in tokens) == " a bc"
+    assert [t["boundary"] for t in tokens] == [False, False, True]
+    await adapter.client.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("adapter_cls", [SGLangAdapter, TRTLLMAdapter])
+async def test_batch_decode_falls_back_without_the_batch_route(adapter_cls):
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        if request.url.path == "/decode_batch":
+            return httpx.Response(404)
+        payload = orjson.loads(request.content)
+        lines = [
+            orjson.dumps({"token": f"{payload['session_id']}-{idx}"}).decode()
+            for idx in range(payload["max_new_tokens"])
+        ]
+        return httpx.Response(200, text="\n".join(lines) + "\n")
+
+    adapter = adapter_cls("http://engine")
+    adapter.client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://engine")
+    requests = [
+        {"session_id": "a", "obs": "", "max_new": 2, "grammar": None, "speculative": False},
+        {"session_id": "b", "obs": "", "max_new": 1, "grammar": None, "speculative": False},
+    ]
+    for _ in range(2):
+        out, finished = await _collect(adapter.continue_decode_batch(requests))
+        assert out == {0: ["a-0", "a-1"], 1: ["b-0"]}
+        assert sorted(finished) == [0, 1]
+    # The missing route is probed once; later groups go straight to /decode.
+    assert paths.count("/decode_batch") == 1 and paths.count("/decode") == 4
+    await adapter.client.aclose()
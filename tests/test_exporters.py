@@ -0,0 +1,49 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from perf import exporters
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_step_metrics_flush_bins_inter_token_gaps(monkeypatch):
+    clock = iter([0.0, 0.0, 0.002, 0.004, 0.024, 20.024, 20.024])
+    monkeypatch.setattr(exporters.time, "monotonic", lambda: next(clock))
+    metrics = exporters.StepMetrics("exporters-test", flush_interval_s=3600)
+    for _ in range(5):
+        metrics.token(kv_bytes=1024)
+    metrics.flush()
+
+    bucket = "primerl_inter_token_seconds_bucket"
+    assert _sample(bucket, model="exporters-test", le="0.001") == 0
+    assert _sample(bucket, model="exporters-test", le="0.0025") == 2
+    assert _sample(bucket, model="exporters-test", le="0.025") == 3
+    assert _sample(bucket, model="exporters-test", le="10.0") == 3
+    assert _sample(bucket, model="exporters-test", le="+Inf") == 4
+    assert _sample("primerl_inter_token_seconds_count", model="exporters-test") == 4
+    assert _sample("primerl_inter_token_seconds_sum", model="exporters-test") == pytest.approx(
+        20.024
+    )
+    assert _sample("primerl_tokens_total", phase="decode", model="exporters-test") == 5
+
+
+def test_observe_binned_matches_observe():
+    values = [0.0005, 0.001, 0.003, 0.003, 0.2, 11.0]
+    one_by_one = exporters.child(exporters.prefill, "binned-a")
+    for value in values:
+        one_by_one.observe(value)
+    bounds = exporters.MS_BUCKETS + (float("inf"),)
+    counts = [sum(low < v <= high for v in values) for low, high in zip((-1.0,) + bounds, bounds)]
+    exporters.observe_binned(exporters.child(exporters.prefill, "binned-b"), counts, sum(values))
+
+    def samples(model):
+        (metric,) = [m for m in REGISTRY.collect() if m.name == "primerl_prefill_seconds"]
+        return {
+            (sample.name, sample.labels.get("le")): sample.value
+            for sample in metric.samples
+            if sample.labels.get("model") == model and not sample.name.endswith("_created")
+        }
+
+    assert samples("binned-a") == samples("binned-b")
@@ -1,4 +1,11 @@
+import time
+
+import fakeredis
+
 from cache.global_prefix_cache import GlobalPrefixCache
+from cache.local_cache import MISSING, LocalCache
+from cache.prefix_fingerprint import block_hashes
+from cache.prefix_index import PrefixIndex
 
 
 class DummyRedis:
@@ -20,7 +27,31 @@ class DummyRedis:
         return {k if isinstance(k, bytes) else k.encode(): v for k, v in raw.items()}
 
     def hincrby(self, key, field, amount):
-        self.store.setdefault(key, {})[field.encode() if isinstance(field, str) else field] = amount
+        bucket = self.store.setdefault(key, {})
+        field = field.encode() if isinstance(field, str) else field
+        bucket[field] = bucket.get(field, 0) + amount
+
+    def publish(self, channel, message):
+        return 0
+
+    def pipeline(self, transaction=True):
+        return DummyPipeline(self)
+
+
+class DummyPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+
+        return queue
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in calls]
 
 
 def test_cache_put_get(monkeypatch):
@@ -32,3 +63,125 @@ def test_cache_put_get(monkeypatch):
     meta = cache.get(fp)
     assert meta["model"] == "test"
     assert meta["tier"] == "hbm"
+
+
+def test_get_many_pipelines_lookups(monkeypatch):
+    cache = GlobalPrefixCache()
+    monkeypatch.setattr(cache, "redis", DummyRedis())
+    cache.put(b"a", {"model": "test"})
+    metas = cache.get_many([b"a", b"missing", b"a"])
+    assert [meta and meta["model"] for meta in metas] == ["test", None, "test"]
+    assert cache.get_many([]) == []
+
+
+def _prompt(system_words, user):
+    return " ".join(f"sys{idx}" for idx in range(system_words)) + " " + user
+
+
+def test_block_hashes_share_common_leading_blocks():
+    a = block_hashes(_prompt(200, "question one"), block_tokens=64)
+    b = block_hashes(_prompt(200, "another question"), block_tokens=64)
+    assert len(a) == len(b) == 4
+    assert a[:3] == b[:3] and a[3] != b[3]
+    # Chained: the same block text under a different parent hashes differently.
+    assert block_hashes("x " * 64 + "y", block_tokens=64)[1] != block_hashes("y")[0]
+
+
+def test_prefix_index_longest_match_and_removal():
+    index = PrefixIndex()
+    a = block_hashes(_prompt(200, "question one"), block_tokens=64)
+    b = block_hashes(_prompt(200, "another question"), block_tokens=64)
+    index.insert(a, "node-a")
+    index.insert(b[:2], "node-b")
+    assert index.longest(a) == (4, {"node-a"})
+    assert index.longest(b) == (3, {"node-a"})
+    assert index.longest(b[:2]) == (2, {"node-a", "node-b"})
+    assert index.longest([b"unknown"]) == (0, set())
+    index.remove_node("node-a")
+    assert index.longest(a) == (2, {"node-b"})
+
+
+def test_longest_prefix_many_stops_at_first_miss(monkeypatch):
+    cache = GlobalPrefixCache()
+    monkeypatch.setattr(cache, "redis", DummyRedis())
+    a = block_hashes(_prompt(200, "question one"), block_tokens=64)
+    b = block_hashes(_prompt(200, "another question"), block_tokens=64)
+    cache.put_blocks(a, {"model": "test"}, node_id="node-a")
+    (hit_a, meta), (hit_b, _), (miss, none) = cache.longest_prefix_many([a, b, [b"x"]])
+    assert (hit_a, hit_b, miss) == (4, 3, 0)
+    assert meta["nodes"] == ["node-a"] and none is None
+
+
+def test_shared_prefix_blocks_keep_every_warm_node(monkeypatch):
+    cache = GlobalPrefixCache(l1_size=0)
+    monkeypatch.setattr(cache, "redis", DummyRedis())
+    a = block_hashes(_prompt(200, "question one"), block_tokens=64)
+    b = block_hashes(_prompt(200, "another question"), block_tokens=64)
+    cache.put_blocks(a, {"model": "test"}, node_id="node-a")
+    cache.put_blocks(b, {"model": "test"}, node_id="node-b")
+    cache.register_node(a[-1], "node-c")
+    metas = cache.get_many([a[0], a[-1], b[-1]])
+    assert [meta["nodes"] for meta in metas] == [
+        ["node-a", "node-b"],
+        ["node-a", "node-c"],
+        ["node-b"],
+    ]
+    assert metas[0]["tier"] == "hbm"
+
+
+def test_l1_serves_repeat_lookups_and_batches_hit_counts(monkeypatch):
+    cache = GlobalPrefixCache(hit_flush_s=3600)
+    dummy = DummyRedis()
+    monkeypatch.setattr(cache, "redis", dummy)
+    cache.put(b"a", {"model": "test"})
+    lookups = []
+    hgetall = dummy.hgetall
+    monkeypatch.setattr(dummy, "hgetall", lambda key: lookups.append(key) or hgetall(key))
+    for _ in range(3):
+        assert cache.get(b"a")["model"] == "test"
+        assert cache.get(b"missing") is None
+    assert lookups == ["pf:61", "pf:6d697373696e67"]
+    assert b"hits" not in dummy.store["pf:61"]
+    cache.flush_hits()
+    assert dummy.store["pf:61"][b"hits"] == 3
+    # A write drops the stale L1 entry.
+    cache.put(b"a", {"model": "other"})
+    assert cache.get(b"a")["model"] == "other"
+
+
+def test_remote_writes_invalidate_l1_over_pubsub():
+    server = fakeredis.FakeServer()
+    reader, writer = GlobalPrefixCache(hit_flush_s=0.01), GlobalPrefixCache(l1_size=0)
+    reader.redis = fakeredis.FakeRedis(server=server)
+    writer.redis = fakeredis.FakeRedis(server=server)
+    reader.start()
+    try:
+        deadline = time.monotonic() + 2
+        while not reader.redis.pubsub_numsub("pf:invalidate")[0][1]:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        writer.put(b"a", {"model": "v1"})
+        assert reader.get(b"a")["model"] == "v1"
+        writer.put(b"a", {"model": "v2"})
+        while reader.get(b"a")["model"] != "v2":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        reader.close()
+    assert int(writer.redis.hget("pf:61", "hits")) >= 2
+
+
+def test_local_cache_ttl_and_frequency_admission():
+    now = [0.0]
+    cache = LocalCache(max_entries=2, ttl_s=1.0, clock=lambda: now[0])
+    for key in ("hot", "warm"):
+        cache.put(key, key)
+        for _ in range(5):
+            cache.get(key)
+    cache.get("scan")
+    cache.put("scan", "scan")
+    assert cache.get("scan") is MISSING and cache.get("hot") == "hot"
+    now[0] = 2.0
+    assert cache.get("hot") is MISSING
+    cache.put("scan", "scan")
+    assert cache.get("scan") == "scan"
@@ -0,0 +1,425 @@
+import asyncio
+import contextlib
+import socket
+import time
+
+import grpc
+import pytest
+
+from api import primerl_pb2, primerl_pb2_grpc
+from cache.global_prefix_cache import GlobalPrefixCache
+from engines import DummyAdapter
+from rl_client.grpc_client import PrimeRLGrpcClient
+from rl_client.session_manager import SessionManager
+from server.engine_pool import EnginePool
+from server.peers import PeerForwarder
+from server.service import PrimeRLService, _peer_host
+from server.workers import peer_address, session_owner
+from tests.test_prefix_cache import DummyRedis
+
+
+@contextlib.asynccontextmanager
+async def _serve(engine=None, peers: PeerForwarder | None = None, **kwargs):
+    """In-process aio server around ``PrimeRLService``; yields ``(service, client)``.
+
+    With ``peers`` it also listens on its worker's peer port, like ``server.main``.
+    """
+    prefix_cache = GlobalPrefixCache()
+    prefix_cache.redis = DummyRedis()
+    session_manager = SessionManager(new_id=peers.new_session_id if peers else None)
+    service = PrimeRLService(
+        engine or DummyAdapter(), prefix_cache, session_manager, peers=peers, **kwargs
+    )
+    server = grpc.aio.server()
+    primerl_pb2_grpc.add_PrimeRLServicer_to_server(service, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    if peers:
+        server.add_insecure_port(peer_address(peers.worker, peers.peer_port_base))
+    await server.start()
+    client = PrimeRLGrpcClient(f"127.0.0.1:{port}")
+    try:
+        yield service, client
+    finally:
+        await client.close()
+        await server.stop(None)
+        await service.shutdown()
+
+
+def _free_port_base(count: int) -> int:
+    """First of ``count`` consecutive free loopback ports."""
+    while True:
+        with contextlib.ExitStack() as stack:
+            first = stack.enter_context(socket.socket())
+            first.bind(("127.0.0.1", 0))
+            base = first.getsockname()[1]
+            try:
+                for offset in range(1, count):
+                    stack.enter_context(socket.socket()).bind(("127.0.0.1", base + offset))
+            except OSError:
+                continue
+            return base
+
+
+async def _eventually(predicate, timeout_s: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout_s
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_step_records_delivered_tokens():
+    async with _serve() as (service, client):
+        session_id = (await client.start_episode(env_id="e", model="m", prompt="P:")).session_id
+        stub = await client._ensure_stub()
+
+        async def requests():
+            yield primerl_pb2.StepReq(session_id=session_id, obs=" o1", max_new_tokens=200)
+
+        call = stub.Step(requests())
+        received = [(await call.read()).token for _ in range(3)]
+        call.cancel()
+        record = service.session_manager.get(session_id)
+        await _eventually(lambda: record.steps == 1)
+        recorded = record.token_texts()
+        assert recorded[:3] == received and len(recorded) < 200
+        assert record.conversation.text() == "P: o1" + "".join(recorded)
+
+
+class _FlakyEngine:
+    """DummyAdapter without batched decode whose decode fails for the obs ``" boom"``."""
+
+    def __init__(self):
+        self._engine = DummyAdapter()
+
+    def __getattr__(self, name):
+        if name == "continue_decode_batch":
+            raise AttributeError(name)
+        return getattr(self._engine, name)
+
+    async def continue_decode(self, **kwargs):
+        if kwargs["obs"] == " boom":
+            raise RuntimeError("engine exploded")
+        async for token in self._engine.continue_decode(**kwargs):
+            yield token
+
+
+@pytest.mark.asyncio
+async def test_failed_pipelined_steps_do_not_abort_the_stream():
+    async with _serve(_FlakyEngine()) as (service, client):
+        first = (await client.start_episode(env_id="e", model="m", prompt="A:")).session_id
+        second = (await client.start_episode(env_id="e", model="m", prompt="B:")).session_id
+        responses = await client.step(
+            {"session_id": first, "obs": " o", "max_new_tokens": 30},
+            {"session_id": "missing", "obs": " o", "max_new_tokens": 5},
+            {"session_id": second, "obs": " boom", "max_new_tokens": 5},
+            {"session_id": second, "obs": " o", "max_new_tokens": 10},
+        )
+
+    by_session: dict[str, list] = {}
+    for resp in responses:
+        by_session.setdefault(resp.session_id, []).append(resp)
+    assert [resp.token for resp in by_session[first]] == [f"tok-{i}" for i in range(30)]
+    (missing,) = by_session["missing"]
+    assert missing.error_code == grpc.StatusCode.NOT_FOUND.value[0]
+    failed, *tokens = by_session[second]
+    assert failed.error == "engine exploded"
+    assert failed.error_code == grpc.StatusCode.INTERNAL.value[0]
+    assert [resp.token for resp in tokens] == [f"tok-{i}" for i in range(10)]
+    # Both sessions decoded on the one stream at the same time.
+    order = [resp.session_id for resp in responses if not resp.error]
+    assert order.index(second) < len(order) - 1 - order[::-1].index(first)
+    assert service.session_manager.get(second).steps == 1
+
+
+def test_peer_client_key_drops_the_port():
+    assert _peer_host("ipv4:10.0.0.7:54321") == "ipv4:10.0.0.7"
+    assert _peer_host("ipv6:[::1]:54321") == "ipv6:[::1]"
+    assert _peer_host("unix:/tmp/primerl.sock") == "unix:/tmp/primerl.sock"
+
+
+class _RecordingEngine(DummyAdapter):
+    """DummyAdapter that records prefills, forks, decoded and closed engine sessions."""
+
+    def __init__(self, fail_prompt: str | None = None):
+        super().__init__()
+        self.fail_prompt = fail_prompt
+        self.fail_close: str | None = None
+        self.prefills: list[str] = []
+        self.forks: list[str] = []
+        self.decoded: list[str] = []
+        self.closed: list[str] = []
+
+    async def prefill(self, model: str, prompt: str, grammar: str | None):
+        self.prefills.append(prompt)
+        if prompt == self.fail_prompt:
+            raise RuntimeError("prefill failed")
+        return await super().prefill(model, prompt, grammar)
+
+    async def fork_session(self, session_id: str, n: int) -> list[str]:
+        forks = await super().fork_session(session_id, n)
+        self.forks += forks
+        return forks
+
+    async def continue_decode(self, **kwargs):
+        self.decoded.append(kwargs["session_id"])
+        async for token in super().continue_decode(**kwargs):
+            yield token
+
+    async def continue_decode_batch(self, requests: list[dict]):
+        self.decoded += [req["session_id"] for req in requests]
+        async for item in super().continue_decode_batch(requests):
+            yield item
+
+    async def close_session(self, session_id: str):
+        if session_id == self.fail_close:
+            raise RuntimeError("close failed")
+        self.closed.append(session_id)
+
+
+@pytest.mark.asyncio
+async def test_sample_group_prefills_once_and_decodes_each_fork():
+    engine = _RecordingEngine()
+    async with _serve(engine) as (service, client):
+        samples = await client.sample_group(
+            env_id="e", model="m", prompt="Solve:", k=4, max_new_tokens=3
+        )
+        assert [[resp.token for resp in sample] for sample in samples] == [
+            ["tok-0", "tok-1", "tok-2"]
+        ] * 4
+        assert engine.prefills == ["Solve:"]
+        assert len(set(engine.forks)) == 4
+        assert sorted(engine.decoded) == sorted(engine.forks)
+        # The group's forks and its prefilled parent are released with it.
+        assert set(engine.closed) >= set(engine.forks) and len(engine.closed) == 5
+        assert not service.session_manager.sessions
+
+
+@pytest.mark.asyncio
+async def test_episode_batches_share_prefills_and_end_together():
+    engine = _RecordingEngine()
+    async with _serve(engine) as (service, client):
+        started = await client.start_episode_batch(
+            [
+                {"env_id": "e", "model": "m", "prompt": prompt, "pin_prefill": True}
+                for prompt in ("A:", "B:", "A:")
+            ]
+        )
+        session_ids = [resp.session_id for resp in started]
+        assert len(set(session_ids)) == 3
+        # The repeated prompt is prefilled once; its copy forks the engine session.
+        assert sorted(engine.prefills) == ["A:", "B:"] and len(engine.forks) == 1
+
+        results = await client.end_episode_batch([session_ids[0], "missing", *session_ids])
+        assert [resp.evicted for resp in results] == [True, False, False, True, True]
+        assert not service.session_manager.sessions
+
+
+@pytest.mark.asyncio
+async def test_end_batch_reports_a_failed_close_only_for_its_session():
+    engine = _RecordingEngine()
+    async with _serve(engine) as (service, client):
+        started = await client.start_episode_batch(
+            [
+                {"env_id": "e", "model": "m", "prompt": prompt, "pin_prefill": True}
+                for prompt in ("A:", "B:", "C:")
+            ]
+        )
+        session_ids = [resp.session_id for resp in started]
+        engine.fail_close = service.session_manager.get(session_ids[1]).engine_session_id
+
+        results = await client.end_episode_batch(session_ids)
+        assert [resp.evicted for resp in results] == [True, False, True]
+        assert [resp.error for resp in results] == ["", "close failed", ""]
+        assert len(engine.closed) == 2 and not service.session_manager.sessions
+
+
+@pytest.mark.asyncio
+async def test_episode_batch_with_a_failed_prefill_opens_nothing():
+    engine = _RecordingEngine(fail_prompt="B:")
+    async with _serve(engine) as (service, client):
+        with pytest.raises(grpc.aio.AioRpcError) as exc_info:
+            await client.start_episode_batch(
+                [
+                    {"env_id": "e", "model": "m", "prompt": prompt, "pin_prefill": True}
+                    for prompt in ("A:", "B:")
+                ]
+            )
+        assert exc_info.value.code() == grpc.StatusCode.INTERNAL
+        assert "prefill failed" in exc_info.value.details()
+        assert not service.session_manager.sessions
+        # The member whose prefill succeeded has its engine session released.
+        assert len(engine.closed) == 1
+
+
+@pytest.mark.asyncio
+async def test_chunked_steps_round_trip_through_step_arrays():
+    async with _serve() as (service, client):
+        first = (await client.start_episode(env_id="e", model="m", prompt="A:")).session_id
+        second = (await client.start_episode(env_id="e", model="m", prompt="B:")).session_id
+        arrays = await client.step_arrays(
+            {"session_id": first, "obs": " o", "max_new_tokens": 20},
+            {"session_id": second, "obs": " o", "max_new_tokens": 7},
+            chunk_tokens=4,
+        )
+        chunks = await client.step(
+            {"session_id": first, "obs": " p", "max_new_tokens": 20, "chunk_tokens": 4}
+        )
+        assert 5 <= len(chunks) < 20 and sum(len(c.token_texts) for c in chunks) == 20
+        assert all(len(c.token_texts) <= 4 and not c.token for c in chunks)
+
+    for session_id, count in ((first, 20), (second, 7)):
+        result = arrays[session_id]
+        assert not result.error
+        assert result.tokens == [f"tok-{i}" for i in range(count)]
+        assert result.token_ids.tolist() == list(range(count))
+        assert result.logprobs.tolist() == [-0.5] * count
+        assert result.accepted.all() and len(result.t_us) == count
+        assert result.boundary.tolist() == [False] * (count - 1) + [True]
+        assert result.kv_bytes == count * 1024
+        record = service.session_manager.get(session_id)
+        assert record.token_texts()[:count] == result.tokens
+        assert list(record.token_ids)[:count] == result.token_ids.tolist()
+
+
+class _SlowEngine(DummyAdapter):
+    """Stalls between tokens for longer than the chunk flush window."""
+
+    async def continue_decode(self, *args, **kwargs):
+        async for token in super().continue_decode(*args, **kwargs):
+            await asyncio.sleep(0.1)
+            token["t_us"] = int(time.time() * 1e6)
+            yield token
+
+
+@pytest.mark.asyncio
+async def test_partial_chunks_flush_on_time_while_the_engine_stalls():
+    async with _serve(_SlowEngine()) as (service, client):
+        service.chunk_flush_s = 0.005
+        session_id = (await client.start_episode(env_id="e", model="m", prompt="A:")).session_id
+        stub = await client._ensure_stub()
+
+        async def requests():
+            yield primerl_pb2.StepReq(
+                session_id=session_id, obs=" o", max_new_tokens=4, chunk_tokens=8
+            )
+
+        delays_ms, sizes = [], []
+        async for resp in stub.Step(requests()):
+            received_us = time.time() * 1e6
+            sizes.append(len(resp.token_texts))
+            delays_ms += [(received_us - t_us) / 1000 for t_us in resp.token_t_us]
+    # Each token leaves on its own, within the flush window (plus scheduling slack),
+    # rather than waiting for the next token to arrive.
+    assert sizes == [1, 1, 1, 1]
+    assert max(delays_ms) < 50
+
+
+@pytest.mark.asyncio
+async def test_steps_for_another_workers_session_are_forwarded_to_it():
+    base = _free_port_base(2)
+    async with _serve(peers=PeerForwarder(0, 2, base)) as (front, client), _serve(
+        peers=PeerForwarder(1, 2, base)
+    ) as (owner, owner_client):
+        started = await owner_client.start_episode(env_id="e", model="m", prompt="P:")
+        session_id = started.session_id
+        assert session_owner(session_id, 2) == 1
+
+        responses = await client.step({"session_id": session_id, "obs": " o", "max_new_tokens": 3})
+        assert [resp.token for resp in responses] == ["tok-0", "tok-1", "tok-2"]
+        assert {resp.session_id for resp in responses} == {session_id}
+        assert front.session_manager.get(session_id) is None
+        assert owner.session_manager.get(session_id).token_texts() == ["tok-0", "tok-1", "tok-2"]
+
+        assert (await client.end_episode(session_id)).evicted
+        assert owner.session_manager.get(session_id) is None
+
+
+class _StubRouter:
+    """Router that sends every new session to ``node``."""
+
+    def __init__(self, node: str):
+        self.node = node
+
+    def route(self, request) -> str:
+        return self.node
+
+
+@pytest.mark.asyncio
+async def test_failover_finds_turns_registered_by_earlier_steps_in_one_lookup():
+    engines = EnginePool({"node-a": DummyAdapter(), "node-b": DummyAdapter()}, default="node-a")
+    router = _StubRouter("node-b")
+    async with _serve(engines, router=router, kv_estimator=lambda **_: 0) as (service, client):
+        earlier = (await client.start_episode(env_id="e", model="m", prompt="P:")).session_id
+        await client.step({"session_id": earlier, "obs": " o0", "max_new_tokens": 2})
+        router.node = "node-a"
+        session_id = (await client.start_episode(env_id="e", model="m", prompt="P:")).session_id
+        for turn in range(3):
+            await client.step({"session_id": session_id, "obs": f" o{turn}", "max_new_tokens": 2})
+        record = service.session_manager.get(session_id)
+        conversation = record.conversation
+
+        lookups = []
+        get_many = service.prefix_cache.get_many
+        service.prefix_cache.get_many = lambda fps: lookups.append(fps) or get_many(fps)
+        # node-b holds the first turn, which the earlier session's Step registered.
+        node, warm = service._warm_node(record, conversation, exclude="node-a")
+        assert (node, warm) == ("node-b", conversation.boundaries[1][0])
+        assert len(lookups) == 1 and len(lookups[0]) == len(conversation.boundaries)
+        # The session's own node is warm for its whole conversation.
+        assert service._warm_node(record, conversation, exclude="node-b") == (
+            "node-a",
+            conversation.length,
+        )
+
+
+@pytest.mark.asyncio
+async def test_episode_rpcs_reach_the_routed_nodes_engine():
+    default, routed = _RecordingEngine(), _RecordingEngine()
+    engines = EnginePool({"node-a": default, "node-b": routed}, default="node-a")
+    async with _serve(engines, router=_StubRouter("node-b"), kv_estimator=lambda **_: 0) as (
+        service,
+        client,
+    ):
+        started = await client.start_episode(env_id="e", model="m", prompt="P:", pin_prefill=True)
+        session_id = started.session_id
+        engine_session_id = service.session_manager.get(session_id).engine_session_id
+        await client.step({"session_id": session_id, "obs": " o", "max_new_tokens": 2})
+        assert (await client.end_episode(session_id)).evicted
+
+    assert routed.prefills == ["P:"]
+    assert routed.decoded == [engine_session_id]
+    assert routed.closed == [engine_session_id]
+    assert not (default.prefills or default.decoded or default.closed)
+
+
+class _StubSpeculator:
+    """Speculator whose second draft token is always rejected."""
+
+    def __init__(self):
+        self.sessions: list[str] = []
+
+    async def generate(self, session_id, obs, max_new, grammar, prompt=None):
+        self.sessions.append(session_id)
+        tokens = [{"token": f"draft-{idx}", "token_id": idx} for idx in range(2)]
+        return tokens, [True, False]
+
+
+@pytest.mark.asyncio
+async def test_speculative_sample_group_reports_the_speculators_mask():
+    engine = _RecordingEngine()
+    async with _serve(engine) as (service, client):
+        speculator = service.speculators[service.engines.default] = _StubSpeculator()
+        samples = await client.sample_group(
+            env_id="e",
+            model="m",
+            prompt="Q:",
+            k=3,
+            max_new_tokens=4,
+            grammar_id="json",
+            speculative=True,
+        )
+    assert [[(resp.token, resp.accepted) for resp in sample] for sample in samples] == [
+        [("draft-0", True), ("draft-1", False)]
+    ] * 3
+    assert sorted(speculator.sessions) == sorted(engine.forks) and not engine.decoded
@@ -0,0 +1,64 @@
+import pytest
+
+from rl_client.session_log import SessionLog
+from rl_client.session_manager import SessionManager
+from server.session_sync import SessionStoreSync
+
+
+async def _run_episodes(directory, segment_bytes=64 << 20):
+    manager = SessionManager(journal=True)
+    sync = SessionStoreSync(manager, SessionLog(directory, segment_bytes=segment_bytes))
+    kept = manager.start("env", "m", node_id="node-a", prompt="Q:")
+    manager.bind_engine(kept, "eng-1")
+    ended = manager.start("env", "m")
+    for turn in range(3):
+        manager.record_tokens(kept, [f" t{turn}", " x"], [True, False], obs=f" o{turn}")
+        await sync.flush()
+    manager.end(ended)
+    await sync.stop()
+    return kept, ended
+
+
+def _recover(directory):
+    manager = SessionManager(journal=True)
+    recovered = SessionStoreSync(manager, SessionLog(directory)).recover()
+    return manager, recovered
+
+
+@pytest.mark.asyncio
+async def test_recovery_replays_the_log(tmp_path):
+    kept, ended = await _run_episodes(tmp_path)
+    manager, recovered = _recover(tmp_path)
+    assert recovered == 1 and manager.get(ended) is None
+    record = manager.get(kept)
+    assert record.engine_session_id == "eng-1" and record.node_id == "node-a"
+    assert record.conversation.text() == "Q: o0 t0 o1 t1 o2 t2"
+    assert record.accepted.tolist() == [True, False] * 3
+
+
+@pytest.mark.asyncio
+async def test_torn_tail_is_truncated(tmp_path):
+    kept, _ = await _run_episodes(tmp_path)
+    (segment,) = tmp_path.glob("wal.*")
+    size = segment.stat().st_size
+    with open(segment, "ab") as handle:
+        handle.write(b"\x01\x02\x03 partial record")
+    manager, recovered = _recover(tmp_path)
+    assert recovered == 1 and manager.get(kept).steps == 3
+    assert segment.stat().st_size == size
+
+
+@pytest.mark.asyncio
+async def test_segments_are_compacted_into_snapshots(tmp_path):
+    kept, _ = await _run_episodes(tmp_path, segment_bytes=1)
+    assert [path.name for path in tmp_path.glob("snapshot.*")]
+    assert len(list(tmp_path.glob("wal.*"))) <= 2
+    manager, recovered = _recover(tmp_path)
+    assert recovered == 1
+    record = manager.get(kept)
+    assert record.conversation.text() == "Q: o0 t0 o1 t1 o2 t2"
+    assert record.steps == 3 and record.accepted.tolist() == [True, False] * 3
+    # Restored state keeps accepting Steps.
+    manager.record_tokens(kept, [" t3"], [True], obs=" o3")
+    assert record.token_texts()[-2:] == [" x", " t3"]
+    assert record.conversation.text().endswith(" o3 t3")
@@ -0,0 +1,64 @@
+import hashlib
+import math
+
+import pytest
+
+from rl_client.session_manager import ConversationBuffer, PackedBits, SessionManager
+
+
+def test_conversation_appends_turns_and_skips_rejected_tokens():
+    manager = SessionManager()
+    session_id = manager.start("env", "m", node_id="node-a", prompt="Q:")
+    manager.record_tokens(session_id, [" a", " b"], [True, True], obs=" x")
+    manager.record_tokens(session_id, [" c", " d"], [True, False], obs=" y")
+    conversation = manager.conversation(session_id)
+    assert conversation.text() == "Q: x a b y c"
+    assert [length for length, _ in conversation.boundaries] == [2, 8, 12]
+    assert manager.trace(session_id)["node_id"] == "node-a"
+
+
+def test_running_fingerprint_matches_full_prefix_hash():
+    buffer = ConversationBuffer("hello")
+    buffer.append(" world")
+    expected = hashlib.blake2b(b"hello world", digest_size=16).digest()
+    assert buffer.fingerprint() == expected
+    assert buffer.boundaries[0][1] == hashlib.blake2b(b"hello", digest_size=16).digest()
+
+
+def test_packed_bits_round_trip():
+    bits = PackedBits([True, False, True] * 5)
+    bits.append(True)
+    assert len(bits) == 16
+    assert bits.tolist() == [True, False, True] * 5 + [True]
+    assert bits[-1] and not bits[1]
+    assert bytes(bits.view()) == bytes([0b01101101, 0b11011011])
+
+
+def test_trace_exports_token_array_copies():
+    manager = SessionManager()
+    session_id = manager.start("env", "m")
+    manager.record_tokens(session_id, ["a", "bc"], [True, False], token_ids=[5, None])
+    manager.record_tokens(session_id, ["d"], [True], logprobs=[-0.5])
+    trace = manager.trace(session_id)
+    assert trace["n_tokens"] == 3 and trace["text"] == "abcd"
+    assert trace["token_ids"].tolist() == [5, -1, -1]
+    assert trace["token_ends"].tolist() == [1, 3, 4]
+    assert trace["logprobs"][2] == -0.5 and math.isnan(trace["logprobs"][0])
+    assert manager.get(session_id).token_texts() == ["a", "bc", "d"]
+    assert manager.get(session_id).accepted.tolist() == [True, False, True]
+    # A held trace neither blocks nor observes later Steps.
+    manager.record_tokens(session_id, ["e"], [True], obs=" o")
+    assert trace["token_ids"].tolist() == [5, -1, -1] and trace["accepted_bits"] == b"\x05"
+
+
+def test_rejected_step_leaves_the_record_unchanged():
+    manager = SessionManager()
+    session_id = manager.start("env", "m", prompt="P:")
+    manager.record_tokens(session_id, ["a"], [True], obs=" x", token_ids=[1])
+    record = manager.get(session_id)
+    for bad in ({"token_ids": [2**40]}, {"logprobs": ["nan?"]}, {"token_ids": [1, 2]}):
+        with pytest.raises((OverflowError, TypeError, ValueError)):
+            manager.record_tokens(session_id, ["b"], [True], obs=" y", **bad)
+    assert record.steps == 1 and record.token_texts() == ["a"]
+    assert record.token_ids.tolist() == [1] and len(record.logprobs) == len(record.accepted) == 1
+    assert record.conversation.text() == "P: xa"
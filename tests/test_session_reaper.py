@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from rl_client.session_manager import SessionManager
+from server.reaper import SessionReaper
+
+
+def _manager(*kv_bytes):
+    manager = SessionManager()
+    ids = []
+    for kv in kv_bytes:
+        session_id = manager.start("env", "m")
+        manager.touch(session_id, kv_bytes=kv)
+        ids.append(session_id)
+    return manager, ids
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_closed_unless_in_use():
+    manager, (idle, busy, fresh) = _manager(0, 0, 0)
+    for session_id in (idle, busy):
+        manager.sessions[session_id].last_t -= 100
+    closed = []
+
+    async def close(session_id, session):
+        closed.append(session_id)
+
+    reaper = SessionReaper(manager, close, idle_ttl_s=60)
+    with manager.in_use(busy):
+        assert await reaper.sweep() == 1
+    assert closed == [idle]
+    assert set(manager.sessions) == {busy, fresh}
+
+
+@pytest.mark.asyncio
+async def test_reaped_session_is_detached_before_close_awaits():
+    manager, (session_id,) = _manager(0)
+    manager.sessions[session_id].last_t -= 100
+    seen_during_close = []
+
+    async def close(reaped_id, session):
+        await asyncio.sleep(0)
+        # A Step arriving now must not find the session being closed.
+        seen_during_close.append(manager.get(reaped_id))
+
+    reaper = SessionReaper(manager, close, idle_ttl_s=60)
+    assert await reaper.sweep() == 1
+    assert seen_during_close == [None]
+
+
+def test_budget_evicts_highest_cost_first():
+    manager, (small, large, medium) = _manager(10, 1000, 100)
+    reaper = SessionReaper(manager, None, idle_ttl_s=0, max_kv_bytes=200)
+    assert reaper.select() == [(large, "kv")]
+
+    reaper = SessionReaper(manager, None, idle_ttl_s=0, max_sessions=1)
+    assert reaper.select() == [(large, "sessions"), (medium, "sessions")]
+    assert small in manager.sessions
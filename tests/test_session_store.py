@@ -0,0 +1,137 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from rl_client.session_manager import SessionManager
+from rl_client.session_store import RedisSessionStore, SessionLeased
+from server.session_sync import SessionStoreSync
+
+
+def _replica(server, owner, lease_ms=10_000):
+    store = RedisSessionStore(fakeredis.FakeRedis(server=server), owner, lease_ms=lease_ms)
+    manager = SessionManager(journal=True)
+    return manager, SessionStoreSync(manager, store)
+
+
+@pytest.mark.asyncio
+async def test_sessions_survive_a_restart():
+    server = fakeredis.FakeServer()
+    manager, sync = _replica(server, "a:1")
+    session_id = manager.start("env", "m", node_id="node-a", prompt="Q:")
+    manager.bind_engine(session_id, "eng-1")
+    manager.record_tokens(session_id, [" a", " b"], [True, False], obs=" x", token_ids=[1, 2])
+    await sync.flush()
+    manager.record_tokens(session_id, [" c"], [True], obs=" y", logprobs=[-0.5])
+    await sync.stop()
+
+    restarted, sync = _replica(server, "a:1")
+    record = await sync.load(session_id)
+    assert record.engine_session_id == "eng-1" and record.node_id == "node-a"
+    assert record.conversation.text() == "Q: x a y c"
+    assert record.token_texts() == [" a", " b", " c"]
+    assert list(record.token_ids) == [1, 2, -1]
+    assert record.accepted.tolist() == [True, False, True]
+    assert record.steps == 2
+
+
+@pytest.mark.asyncio
+async def test_leases_keep_other_replicas_out_until_they_lapse():
+    server = fakeredis.FakeServer()
+    owner, owner_sync = _replica(server, "a:1", lease_ms=50)
+    session_id = owner.start("env", "m")
+    await owner_sync.flush()
+
+    _, other_sync = _replica(server, "b:1", lease_ms=50)
+    with pytest.raises(SessionLeased) as exc:
+        await other_sync.load(session_id)
+    assert exc.value.owner == "a:1"
+
+    await asyncio.sleep(0.06)
+    assert (await other_sync.load(session_id)).model == "m"
+    # The previous owner notices on its next renewal and lets go of the session.
+    owner_sync.renew_s = 0
+    await owner_sync.flush()
+    assert owner.get(session_id) is None
+
+
+@pytest.mark.asyncio
+async def test_ended_sessions_are_deleted():
+    server = fakeredis.FakeServer()
+    manager, sync = _replica(server, "a:1")
+    session_id = manager.start("env", "m")
+    await sync.flush()
+    manager.end(session_id)
+    await sync.flush()
+    assert fakeredis.FakeRedis(server=server).keys("primerl:session*") == []
+
+
+@pytest.mark.asyncio
+async def test_flushes_write_prompt_and_meta_only_when_they_change():
+    server = fakeredis.FakeServer()
+    manager, sync = _replica(server, "a:1")
+    written = []
+    write = sync.store.write
+    sync.store.write = lambda updates, *args: write(written.extend(updates) or updates, *args)
+    session_id = manager.start("env", "m", prompt="Q:" * 1000)
+    await sync.flush()
+    assert {"prompt", "tools", "meta"} <= set(written[-1][1])
+
+    manager.record_tokens(session_id, [" a"], [True], obs=" x")
+    await sync.flush()
+    assert not {"prompt", "tools", "meta"} & set(written[-1][1])
+    assert any(name.startswith("step:") for name in written[-1][1])
+
+    manager.set_meta(session_id, reward=1.0)
+    await sync.flush()
+    assert "meta" in written[-1][1] and "prompt" not in written[-1][1]
+    await sync.stop()
+
+    record = await _replica(server, "a:1")[1].load(session_id)
+    assert record.conversation.text() == "Q:" * 1000 + " x a"
+    assert record.meta["reward"] == 1.0
+
+
+def _race_lease_check(store, rival, session_id):
+    """Have ``rival`` take ``session_id``'s lease right after the store's next lease read."""
+    pipeline = store.redis.pipeline
+    raced = []
+
+    def racing_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        for name in ("get", "mget"):
+
+            def read(*args, _read=getattr(pipe, name)):
+                result = _read(*args)
+                if not raced:
+                    raced.append(True)
+                    rival.redis.set(rival._lease(session_id), rival.owner)
+                return result
+
+            setattr(pipe, name, read)
+        return pipe
+
+    store.redis.pipeline = racing_pipeline
+
+
+def test_a_lease_taken_during_the_check_fails_the_write():
+    server = fakeredis.FakeServer()
+    owner = RedisSessionStore(fakeredis.FakeRedis(server=server), "a:1")
+    rival = RedisSessionStore(fakeredis.FakeRedis(server=server), "b:1")
+    owner.write([("s1", {"model": b'"m"'})])
+    _race_lease_check(owner, rival, "s1")
+    assert owner.write([("s1", {"model": b'"stale"'})]) == ["s1"]
+    assert rival.redis.hget(f"{rival.prefix}:s1", "model") == b'"m"'
+    assert rival.redis.get(f"{rival.prefix}-lease:s1") == b"b:1"
+
+
+def test_a_lease_taken_during_acquire_is_not_overwritten():
+    server = fakeredis.FakeServer()
+    owner = RedisSessionStore(fakeredis.FakeRedis(server=server), "a:1")
+    rival = RedisSessionStore(fakeredis.FakeRedis(server=server), "b:1")
+    owner.write([("s1", {"model": b'"m"'})])
+    owner.redis.delete(owner._lease("s1"))
+    _race_lease_check(rival, owner, "s1")
+    with pytest.raises(SessionLeased) as exc:
+        rival.acquire("s1")
+    assert exc.value.owner == "a:1"
@@ -0,0 +1,81 @@
+import asyncio
+
+import httpx
+import pytest
+
+from server.verification import VerificationQueue
+
+
+def _client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_traces_are_posted_in_batches():
+    calls = []
+
+    def handler(request: httpx.Request):
+        traces = httpx.Response(200, content=request.content).json()
+        calls.append((request.url.path, len(traces)))
+        return httpx.Response(200, json=[{"reward": t["n"]} for t in traces])
+
+    queue = VerificationQueue(_client(handler), "http://verifier", workers=1, batch_wait_s=0.01)
+    for n in range(3):
+        assert queue.submit(f"ep{n}", {"n": n})
+    assert queue.result("ep0") == {"status": "pending"}
+    await queue.stop()
+    assert calls == [("/verify_batch", 3)]
+    assert queue.result("ep2") == {"status": "done", "result": {"reward": 2}}
+
+
+@pytest.mark.asyncio
+async def test_retries_then_falls_back_to_single_verify():
+    attempts = {"/verify": 0}
+
+    def handler(request: httpx.Request):
+        if request.url.path == "/verify_batch":
+            return httpx.Response(404)
+        attempts["/verify"] += 1
+        if attempts["/verify"] == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"reward": 1.0})
+
+    queue = VerificationQueue(
+        _client(handler), "http://verifier", workers=1, batch_wait_s=0, backoff_s=0
+    )
+    queue.submit("ep", {})
+    await queue.stop()
+    assert attempts["/verify"] == 2
+    assert queue.result("ep")["status"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_without_blocking():
+    queue = VerificationQueue(_client(lambda r: httpx.Response(500)), "http://v", max_queue=1, workers=0)
+    assert queue.submit("a", {})
+    assert not queue.submit("b", {})
+    assert queue.result("b") == {"status": "dropped"}
+
+
+@pytest.mark.asyncio
+async def test_malformed_replies_fail_the_batch_and_keep_the_worker():
+    replies = iter(
+        [
+            httpx.Response(200, content=b"not json"),
+            httpx.Response(200, json=[{"reward": 1.0}]),
+            httpx.Response(200, json=[{"reward": 2.0}]),
+        ]
+    )
+    queue = VerificationQueue(
+        _client(lambda request: next(replies)), "http://v", workers=1, batch_wait_s=0.01
+    )
+    queue.submit("bad-json", {})
+    await asyncio.sleep(0.05)
+    queue.submit("short-a", {})
+    queue.submit("short-b", {})
+    await asyncio.sleep(0.05)
+    queue.submit("ok", {})
+    await queue.stop()
+    assert queue.result("bad-json")["status"] == "failed"
+    assert queue.result("short-a")["status"] == queue.result("short-b")["status"] == "failed"
+    assert queue.result("ok") == {"status": "done", "result": {"reward": 2.0}}
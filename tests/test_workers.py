@@ -0,0 +1,14 @@
+from rl_client.session_manager import SessionManager
+from server.workers import owned_session_id, session_owner
+
+
+def test_owned_session_ids_hash_to_their_worker():
+    for worker in range(4):
+        for _ in range(20):
+            assert session_owner(owned_session_id(worker, 4), 4) == worker
+
+
+def test_session_manager_uses_owned_ids():
+    manager = SessionManager(new_id=lambda: owned_session_id(2, 3))
+    session_id = manager.start("env", "m")
+    assert session_owner(session_id, 3) == 2